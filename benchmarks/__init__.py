@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  __init__.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+# Performance benchmarks for chemhelper
+#
+# Usage:
+#   python -m benchmarks.run -o results.json
+#   python -m benchmarks.compare baseline.json results.json
+#   python -m benchmarks.memory -o memory.json
+#   python -m benchmarks.compare baseline_memory.json memory.json --stat peak
+#   python -m benchmarks.rss --count 1000000 --disable-gc
+#
+# With pytest-benchmark installed, the same cases can also be run with:
+#   py.test benchmarks/bench_pytest.py
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  bench_pytest.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+# Runs the benchmark cases with pytest-benchmark, if it is installed
+# Usage: py.test benchmarks/bench_pytest.py
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from benchmarks import cases
+
+CASES = cases.getCases()
+
+@pytest.mark.parametrize("case",CASES,ids=[case.name for case in CASES])
+def test_benchmark(benchmark,case):
+    benchmark.pedantic(case.run,setup=lambda:((case.setup(),),{}),rounds=20)
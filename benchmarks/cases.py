@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  cases.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+# Benchmark cases
+# Each case has a setup function returning the state for a single call, and a run function that is timed
+# Setup is never timed, so stages can be measured on their own by running all previous stages in setup
+
+import time
+import statistics
+import collections
+
+from chemhelper.notations import structural, iupac
+
+from . import corpus
+
+# name: unique name of the case, including the corpus size
+# group: name of the case without the size
+# n: corpus size
+Case = collections.namedtuple("Case",["name","group","n","setup","run"])
+
+S2I_STAGES = structural.S2I_STAGES
+I2S_STAGES = iupac.I2S_STAGES
+
+def _stageSetup(start,stage,prefix):
+    # Returns a setup function that runs stages 1 to stage-1 on fresh data
+    def setup():
+        obj,data = start()
+        for i in range(1,stage):
+            getattr(obj,"%s_stage%s"%(prefix,i))(data)
+        return obj,data
+    return setup
+def _stageRun(stage,prefix):
+    def run(state):
+        obj,data = state
+        getattr(obj,"%s_stage%s"%(prefix,stage))(data)
+    return run
+
+def getCases(sizes=None):
+    # Returns a list of all cases for the given corpus sizes
+    if sizes is None:
+        sizes = corpus.SIZES
+    
+    out = []
+    for n in sizes:
+        out.extend(_getCorpusCases(corpus.getCorpus(n)))
+    return out
+
+def _getCorpusCases(c):
+    out = []
+    def add(group,setup,run):
+        out.append(Case("%s[%s]"%(group,c.n),group,c.n,setup,run))
+    
+    # Whole conversions, caching is always bypassed
+    add("iupac2structural",c.getIUPAC,lambda name:name.asStructuralFormula(cache=False))
+    add("structural2iupac",lambda:c.struct,lambda struct:struct.asIUPACName())
+    add("smiles_parse",lambda:c.smiles,lambda smiles:structural.StructuralNotation.loadsFromSMILES(smiles,cache=False))
+    add("smiles_dump",lambda:c.struct,lambda struct:struct.dumpAsSMILES())
+    add("condensed2structural",c.getCondensed,lambda formula:formula.asStructuralFormula(cache=False))
+    
+    # Single pipeline stages
+    for stage in range(1,S2I_STAGES+1):
+        add("s2i_stage%s"%stage,_stageSetup(lambda:(c.struct,{"analysis":None}),stage,"s2i"),_stageRun(stage,"s2i"))
+    for stage in range(1,I2S_STAGES+1):
+        add("i2s_stage%s"%stage,_stageSetup(lambda:(c.getIUPAC(),{"implicit_hydrogen":False}),stage,"i2s"),_stageRun(stage,"i2s"))
+    return out
+
+def timeCase(case,number=None,repeat=5,min_time=0.05,max_time=0.2):
+    # Times a case, returns a dict with the per-call times in seconds
+    # number is the amount of calls per repetition, by default it is chosen so that the calls take about min_time
+    # Cases with an expensive setup use fewer calls, so that a repetition including setup takes at most max_time
+    if number is None:
+        run_time,total_time = _timeOnce(case,1)
+        number = max(1,min(int(min_time/max(run_time,1e-7)),int(max_time/total_time),10000))
+    
+    times = [_timeOnce(case,number)[0]/number for i in range(repeat)]
+    return {
+        "min":min(times),
+        "median":statistics.median(times),
+        "max":max(times),
+        "number":number,
+        "repeat":repeat,
+        }
+
+def _timeOnce(case,number):
+    # Returns the time of number calls, and the time including setup
+    start = time.perf_counter()
+    states = [case.setup() for i in range(number)]
+    run_start = time.perf_counter()
+    for state in states:
+        case.run(state)
+    end = time.perf_counter()
+    return end-run_start,end-start
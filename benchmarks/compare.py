@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  compare.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+# Compares benchmark results against a saved baseline
+# Usage: python -m benchmarks.compare baseline.json results.json [--threshold 0.1]
+# Exits with status 1 if any case got slower by more than the threshold
+
+import sys
+import json
+import argparse
+
+# Statistics written by benchmarks.run, all others are byte counts from benchmarks.memory
+TIME_STATS = ["min","median","max"]
+
+def compareResults(baseline,current,threshold=0.1,stat="min"):
+    # Returns a list of (name,baseline time,current time,ratio,status) for all cases
+    # status is "regression", "improvement", "ok", "new" or "missing"
+    # Cases without the given statistic, e.g. memory footprints when comparing times, are skipped
+    out = []
+    base = {name:result for name,result in baseline["results"].items() if stat in result}
+    cur = {name:result for name,result in current["results"].items() if stat in result}
+    for name in sorted(set(base)|set(cur)):
+        if name not in base:
+            out.append((name,None,cur[name][stat],None,"new"))
+        elif name not in cur:
+            out.append((name,base[name][stat],None,None,"missing"))
+        else:
+            ratio = cur[name][stat]/base[name][stat]
+            if ratio>1+threshold:
+                status = "regression"
+            elif ratio<1/(1+threshold):
+                status = "improvement"
+            else:
+                status = "ok"
+            out.append((name,base[name][stat],cur[name][stat],ratio,status))
+    return out
+
+def _fmt(value,stat):
+    if value is None:
+        return " "*15
+    elif stat in TIME_STATS:
+        return "%12.3f us"%(value*1e6)
+    else:
+        return "%13d B"%value
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Compare chemhelper benchmark results against a baseline")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold",type=float,default=0.1,help="allowed relative slowdown, 0.1 is 10%%")
+    parser.add_argument("--stat",default="min",help="statistic to compare, one of min, median, max, or peak, retained, total for memory results")
+    args = parser.parse_args(args)
+    
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    
+    rows = compareResults(baseline,current,args.threshold,args.stat)
+    for name,b,c,ratio,status in rows:
+        ratio = "%6.2fx"%ratio if ratio is not None else " "*7
+        print("%-32s %s %s %s %s"%(name,_fmt(b,args.stat),_fmt(c,args.stat),ratio,status.upper() if status=="regression" else status))
+    
+    regressions = [row for row in rows if row[4]=="regression"]
+    if regressions:
+        print("%s regression(s) above %s%%"%(len(regressions),args.threshold*100))
+        return 1
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  corpus.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+# Generated inputs of increasing size
+# Structures are built with branched_alkane() from the test fixtures
+
+import os
+import sys
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),"tests"))
+from conftest import branched_alkane
+
+from chemhelper.notations import iupac, condensed
+
+# Number of carbons in the main chain of the generated inputs
+SIZES = [4,16,64,256]
+
+class Corpus(object):
+    # All inputs for a single size
+    def __init__(self,n):
+        self.n = n
+        
+        self.struct = branched_alkane(n)
+        self.name = self.struct.asIUPACName().name
+        self.smiles = self.struct.dumpAsSMILES()
+        self.condensed = "CH3(CH2)%sCH3"%(n-2) if n>2 else "CH3CH3"
+    
+    def getIUPAC(self):
+        return iupac.IUPACNotation(self.name)
+    def getCondensed(self):
+        return condensed.CondensedMolecularNotation(self.condensed)
+
+_corpora = {}
+
+def getCorpus(n):
+    # Corpora are cached, since creating the large ones takes a while
+    if n not in _corpora:
+        _corpora[n] = Corpus(n)
+    return _corpora[n]
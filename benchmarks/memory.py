@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  memory.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+# Measures the memory allocated by conversions with tracemalloc
+# Usage: python -m benchmarks.memory [-o memory.json] [--sizes 4,16]
+#
+# For every conversion, peak is the highest amount of memory allocated during the conversion
+# and retained is the memory still allocated afterwards while the result is kept alive, both in bytes
+# The results can be compared with: python -m benchmarks.compare baseline.json memory.json --stat peak
+
+import sys
+import gc
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+
+import chemhelper
+from chemhelper.notations import structural
+
+from . import corpus
+
+# name: (setup,run), see cases.Case
+def getConversions(c):
+    return {
+        "iupac2structural":(c.getIUPAC,lambda name:name.asStructuralFormula(cache=False)),
+        "smiles2structural":(lambda:c.smiles,lambda smiles:structural.StructuralNotation.loadsFromSMILES(smiles,cache=False)),
+        "structural2iupac":(lambda:c.struct,lambda struct:struct.asIUPACName()),
+        }
+
+def measureAllocations(setup,run):
+    # Returns a dict with the peak and retained allocations of run()
+    state = setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = run(state)
+        current,peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return {"peak":peak-before,"retained":current-before}
+
+def runMemoryBenchmarks(sizes=None,out=None):
+    # Returns a dict with the environment and the allocations of all conversions, and the footprint of the structures
+    if sizes is None:
+        sizes = corpus.SIZES
+    
+    results = {}
+    for n in sizes:
+        c = corpus.getCorpus(n)
+        for name,(setup,run) in sorted(getConversions(c).items()):
+            key = "%s[%s]"%(name,n)
+            results[key] = measureAllocations(setup,run)
+            if out is not None:
+                out.write("%-32s peak %10s B retained %10s B\n"%(key,results[key]["peak"],results[key]["retained"]))
+        
+        results["footprint[%s]"%n] = chemhelper.memory.memoryReport(c.struct)
+        results["footprint_frozen[%s]"%n] = chemhelper.memory.memoryReport(c.struct.freeze())
+    
+    return {
+        "meta":{
+            "chemhelper":chemhelper.version.VERSION,
+            "python":platform.python_version(),
+            "implementation":platform.python_implementation(),
+            "platform":platform.platform(),
+            "time":time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+        "results":results,
+        }
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Measure the memory allocated by chemhelper conversions")
+    parser.add_argument("-o","--output",help="JSON file to write the results to, defaults to stdout")
+    parser.add_argument("--sizes",help="comma-separated corpus sizes")
+    args = parser.parse_args(args)
+    
+    sizes = [int(n) for n in args.sizes.split(",")] if args.sizes else None
+    data = runMemoryBenchmarks(sizes,sys.stderr)
+    
+    if args.output:
+        with open(args.output,"w") as f:
+            json.dump(data,f,indent=2,sort_keys=True)
+    else:
+        json.dump(data,sys.stdout,indent=2,sort_keys=True)
+        sys.stdout.write("\n")
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  rss.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+# Checks that memory stays flat over many conversions
+# Usage: python -m benchmarks.rss [-o rss.json] [--count 1000000] [--disable-gc]
+#
+# Runs name->structure->SMILES->structure->name round trips and samples the resident set size
+# With --disable-gc, memory only stays flat if molecules are freed by reference counting alone,
+# which requires calling release() on every structure once it is no longer needed
+# Results contain the peak RSS and the growth after the warm-up, in bytes, and can be compared with benchmarks.compare
+
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import argparse
+
+import chemhelper
+from chemhelper.notations import iupac, structural
+
+from . import corpus
+
+# Main chain lengths of the molecules that are converted in turn
+INPUT_SIZES = list(range(4,21))
+
+def getRSS():
+    # Returns the current resident set size in bytes
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1])*os.sysconf("SC_PAGE_SIZE")
+    except (IOError,OSError):
+        # Not on Linux, the peak is the best available approximation
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform=="darwin" else rss*1024
+
+def roundTrip(name):
+    struct = iupac.IUPACNotation(name).asStructuralFormula(cache=False)
+    smiles = struct.dumpAsSMILES()
+    struct.release()
+    struct = structural.StructuralNotation.loadsFromSMILES(smiles,cache=False)
+    out = struct.asIUPACName().name
+    struct.release()
+    return out
+
+def runRSSBenchmark(count=1000000,samples=20,disable_gc=False,out=None):
+    # Returns a dict with the environment, RSS samples as [conversions,bytes] and the results
+    names = [corpus.getCorpus(n).name for n in INPUT_SIZES]
+    interval = max(1,count//samples)
+    
+    # Warm-up, fills caches like the prefix tables
+    for name in names:
+        roundTrip(name)
+    
+    gc.collect()
+    if disable_gc:
+        gc.disable()
+    try:
+        start = getRSS()
+        data = [[0,start]]
+        for i in range(1,count+1):
+            roundTrip(names[i%len(names)])
+            if i%interval==0 or i==count:
+                data.append([i,getRSS()])
+                if out is not None:
+                    out.write("%10d conversions %10d KiB\n"%(i,data[-1][1]//1024))
+                    out.flush()
+        collected = gc.collect()
+    finally:
+        gc.enable()
+    
+    rss = [value for i,value in data]
+    return {
+        "meta":{
+            "chemhelper":chemhelper.version.VERSION,
+            "python":platform.python_version(),
+            "implementation":platform.python_implementation(),
+            "platform":platform.platform(),
+            "time":time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "count":count,
+            "gc_disabled":disable_gc,
+            },
+        "samples":data,
+        "results":{
+            "rss":{
+                "peak":max(rss),
+                "retained":rss[-1]-rss[0],
+                # Objects only the cyclic garbage collector could free, should be 0
+                "cycles":collected,
+                },
+            },
+        }
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Measure the memory of chemhelper over many conversions")
+    parser.add_argument("-o","--output",help="JSON file to write the results to, defaults to stdout")
+    parser.add_argument("--count",type=int,default=1000000,help="number of round trips")
+    parser.add_argument("--samples",type=int,default=20,help="number of RSS samples")
+    parser.add_argument("--disable-gc",action="store_true",help="disable the cyclic garbage collector")
+    args = parser.parse_args(args)
+    
+    data = runRSSBenchmark(args.count,args.samples,args.disable_gc,sys.stderr)
+    
+    if args.output:
+        with open(args.output,"w") as f:
+            json.dump(data,f,indent=2,sort_keys=True)
+    else:
+        json.dump(data,sys.stdout,indent=2,sort_keys=True)
+        sys.stdout.write("\n")
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  run.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+# Runs the benchmarks and writes the results as JSON
+# Usage: python -m benchmarks.run [-o results.json] [-k filter] [--sizes 4,16]
+
+import sys
+import json
+import time
+import platform
+import argparse
+
+import chemhelper
+
+from . import cases
+
+def runBenchmarks(sizes=None,filter=None,repeat=5,min_time=0.05,max_time=0.2,out=None):
+    # Returns a dict with the environment and the results of all cases matching filter
+    results = {}
+    for case in cases.getCases(sizes):
+        if filter is not None and filter not in case.name:
+            continue
+        results[case.name] = cases.timeCase(case,repeat=repeat,min_time=min_time,max_time=max_time)
+        if out is not None:
+            out.write("%-32s %12.3f us\n"%(case.name,results[case.name]["min"]*1e6))
+            out.flush()
+    
+    return {
+        "meta":{
+            "chemhelper":chemhelper.version.VERSION,
+            "python":platform.python_version(),
+            "implementation":platform.python_implementation(),
+            "platform":platform.platform(),
+            "time":time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+        "results":results,
+        }
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Run the chemhelper benchmarks")
+    parser.add_argument("-o","--output",help="JSON file to write the results to, defaults to stdout")
+    parser.add_argument("-k","--filter",help="only run cases containing this string")
+    parser.add_argument("--sizes",help="comma-separated corpus sizes")
+    parser.add_argument("--repeat",type=int,default=5)
+    parser.add_argument("--min-time",type=float,default=0.05,help="minimum seconds of timed calls per repetition")
+    parser.add_argument("--max-time",type=float,default=0.2,help="maximum seconds per repetition, including setup")
+    args = parser.parse_args(args)
+    
+    sizes = [int(n) for n in args.sizes.split(",")] if args.sizes else None
+    data = runBenchmarks(sizes,args.filter,args.repeat,args.min_time,args.max_time,sys.stderr)
+    
+    if args.output:
+        with open(args.output,"w") as f:
+            json.dump(data,f,indent=2,sort_keys=True)
+    else:
+        json.dump(data,sys.stdout,indent=2,sort_keys=True)
+        sys.stdout.write("\n")
+
+if __name__=="__main__":
+    main()
@@ -25,3 +25,9 @@
 from . import notations
 from . import errors
 from . import version
+from . import batch
+from . import cache
+from . import store
+from . import instrumentation
+from . import tracing
+from . import memory
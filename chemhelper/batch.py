@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  batch.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+
+import atexit
+import itertools
+import threading
+import collections
+import concurrent.futures
+import concurrent.futures.process
+
+from .notations import structural, iupac, condensed
+from . import cache
+from . import tracing
+
+log = tracing.getLogger("batch")
+
+# Result of the conversion of a single input
+# index: position of the input in the inputs given to convertMany()
+# input: the input itself
+# output: the converted output, None if the conversion failed
+# error: the exception raised during conversion, None if it succeeded
+BatchResult = collections.namedtuple("BatchResult",["index","input","output","error"])
+
+# Functions to create a notation from an input string
+def _fromIUPAC(data):
+    return iupac.IUPACNotation(data)
+def _fromSMILES(data):
+    return structural.StructuralNotation.loadsFromSMILES(data)
+def _fromCondensed(data):
+    return condensed.CondensedMolecularNotation(data)
+
+# Functions to convert a notation to the output
+# Outputs are strings or compact structures, both can be cheaply sent back from worker processes
+def _toIUPAC(notation):
+    return notation.asIUPACName().name
+def _toSMILES(notation):
+    return notation.dumpAsSMILES()
+def _toFormula(notation):
+    return notation.asStructuralFormula().getSumFormula()
+def _toStructural(notation):
+    return notation.asStructuralFormula().asCompact()
+
+SOURCES = {
+    "iupac":_fromIUPAC,
+    "smiles":_fromSMILES,
+    "condensed":_fromCondensed,
+    }
+
+# Functions to get the cache key of the result converted from an input to a target
+def _keyIUPAC(data,target):
+    return iupac.IUPACNotation(data).getCacheKey(target=target)
+def _keySMILES(data,target):
+    return structural.StructuralNotation.getSMILESCacheKey(data,target=target)
+def _keyCondensed(data,target):
+    return condensed.CondensedMolecularNotation(data).getCacheKey(target)
+
+CACHE_KEYS = {
+    "iupac":_keyIUPAC,
+    "smiles":_keySMILES,
+    "condensed":_keyCondensed,
+    }
+
+TARGETS = {
+    "iupac":_toIUPAC,
+    "smiles":_toSMILES,
+    "formula":_toFormula,
+    "structural":_toStructural,
+    }
+
+# Conversions that do not need a notation of the input, see convertOne()
+def _smilesToIUPAC(data):
+    return iupac.IUPACNotation.loadsFromSMILES(data).name
+
+DIRECT = {
+    ("smiles","iupac"):_smilesToIUPAC,
+    }
+
+# Targets whose outputs are cached as strings when converting from another notation
+# All other conversions start with the cached structure of the input
+CACHED_TARGETS = ("iupac","smiles")
+
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+def getPool(workers=None,broken=None):
+    # Returns the shared process pool, creating it if needed
+    # The pool is kept warm between calls and only re-created if a different number of workers is requested
+    # broken is a pool that raised BrokenProcessPool, e.g. because a worker died, it is replaced if still in use
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None and (_pool_workers!=workers or _pool is broken):
+            _pool.shutdown()
+            _pool = None
+        if _pool is None:
+            _pool = concurrent.futures.ProcessPoolExecutor(workers)
+            _pool_workers = workers
+        return _pool
+
+def shutdownPool():
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = None
+        _pool_workers = None
+
+atexit.register(shutdownPool)
+
+def convertOne(data,source,target):
+    # Converts a single input, raises the exception of a failed conversion
+    with tracing.conversion(log,"%s2%s"%(source,target),data):
+        if (source,target) in DIRECT:
+            return DIRECT[source,target](data)
+        return TARGETS[target](SOURCES[source](data))
+
+def getCacheKey(data,source,target):
+    # Returns the key of the first cached result that convertOne() looks up
+    if source==target or target not in CACHED_TARGETS:
+        target = "structural"
+    return CACHE_KEYS[source](data,target)
+
+def _convertChunk(source,target,start,chunk,settings=None):
+    # Runs in the worker processes
+    # settings are the cache settings of the calling process, workers may have been started before they were changed
+    if settings is not None:
+        cache.applySettings(settings)
+    if cache.isEnabled() and cache.getStore() is not None:
+        # Reads all stored results of the chunk at once
+        cache.prefetch([getCacheKey(data,source,target) for data in chunk])
+    out = []
+    for i,data in enumerate(chunk):
+        try:
+            out.append(BatchResult(start+i,data,convertOne(data,source,target),None))
+        except Exception as e:
+            out.append(BatchResult(start+i,data,None,e))
+    return out
+
+def _chunks(inputs,chunksize):
+    it = iter(inputs)
+    start = 0
+    while True:
+        chunk = list(itertools.islice(it,chunksize))
+        if len(chunk)==0:
+            return
+        yield start,chunk
+        start+=len(chunk)
+
+def _collect(future,start,chunk):
+    # Turns a finished future into results
+    # If the whole chunk failed, e.g. because a result could not be sent back, every input is marked as failed
+    e = future.exception()
+    if e is not None:
+        return [BatchResult(start+i,data,None,e) for i,data in enumerate(chunk)]
+    return future.result()
+
+def iterConvertMany(inputs,source,target,workers=None,chunksize=64,ordered=True):
+    # Converts all inputs from the source format to the target format and yields a BatchResult for each of them
+    # source may be "iupac", "smiles" or "condensed"
+    # target may be "iupac", "smiles", "formula" or "structural"
+    # workers is the number of worker processes, None uses one per CPU and 0 converts in this process
+    # Inputs are sent to the workers in chunks of chunksize
+    # If ordered is False, results are yielded as soon as their chunk is finished instead of in input order
+    # Failed conversions do not abort the batch, their exception is stored in the result instead
+    if source not in SOURCES:
+        raise ValueError("Invalid source format '%s'"%source)
+    elif target not in TARGETS:
+        raise ValueError("Invalid target format '%s'"%target)
+    
+    if workers==0:
+        for start,chunk in _chunks(inputs,chunksize):
+            for result in _convertChunk(source,target,start,chunk):
+                yield result
+        return
+    
+    pool = getPool(workers)
+    settings = cache.getSettings()
+    # Limits the amount of chunks in flight, so that long input iterators are not read into memory at once
+    max_pending = (workers or 4)*4
+    
+    pending = collections.OrderedDict() # future:(start,chunk)
+    for start,chunk in _chunks(inputs,chunksize):
+        try:
+            future = pool.submit(_convertChunk,source,target,start,chunk,settings)
+        except concurrent.futures.process.BrokenProcessPool:
+            # Chunks that were running when the pool broke fail, the remaining ones use a new pool
+            pool = getPool(workers,pool)
+            future = pool.submit(_convertChunk,source,target,start,chunk,settings)
+        pending[future] = start,chunk
+        
+        while len(pending)>=max_pending:
+            for result in _nextDone(pending,ordered):
+                yield result
+    while len(pending)>0:
+        for result in _nextDone(pending,ordered):
+            yield result
+
+def _nextDone(pending,ordered):
+    if ordered:
+        # Waits for the oldest chunk
+        future = next(iter(pending))
+    else:
+        # Waits for any chunk
+        future = next(concurrent.futures.as_completed(pending))
+    start,chunk = pending.pop(future)
+    return _collect(future,start,chunk)
+
+def convertMany(inputs,source,target,workers=None,chunksize=64,ordered=True):
+    # Same as iterConvertMany(), but returns a list of all results
+    return list(iterConvertMany(inputs,source,target,workers,chunksize,ordered))
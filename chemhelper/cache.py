@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  cache.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+
+# Opt-in memoization of conversions
+# Results are stored in a size-bounded LRU cache, keyed on (notation class,normalized input,target,options)
+#
+# Usage:
+#   chemhelper.cache.enable()
+#   chemhelper.notations.iupac.IUPACNotation("Butane").asStructuralFormula() # converted
+#   chemhelper.notations.iupac.IUPACNotation("butane").asStructuralFormula() # cached
+#   chemhelper.cache.getStats()
+#
+# Structures are cached as FrozenStructuralNotation, so callers cannot modify the cached copy
+# Names and SMILES converted from other notations are cached as strings
+# Use thaw() on the result to get a modifiable copy
+# Every converting method that uses the cache also accepts cache=False to bypass it, or cache=True to use it while disabled
+#
+# A persistent store, see chemhelper.store, can be added with setStore()
+# Results missing from the in-memory cache are then looked up in the store, and new results are written to it
+
+import json
+import array
+import threading
+import collections
+
+DEFAULT_MAXSIZE = 4096
+
+# Statistics of a cache
+# hits, misses: number of lookups that did or did not find a result
+# evictions: number of results removed to make room for newer ones
+# size, maxsize: current and maximum number of stored results
+CacheStats = collections.namedtuple("CacheStats",["hits","misses","evictions","size","maxsize"])
+
+# Settings of the cache, see getSettings()
+# enabled: whether the cache is enabled, see enable()
+# maxsize: maximum number of stored results
+# store: the persistent store, see setStore()
+CacheSettings = collections.namedtuple("CacheSettings",["enabled","maxsize","store"])
+
+class LRUCache(object):
+    # Thread-safe cache that evicts the least recently used result once maxsize is reached
+    def __init__(self,maxsize=DEFAULT_MAXSIZE):
+        if maxsize<1:
+            raise ValueError("Cache size must be at least 1")
+        self.maxsize = maxsize
+        
+        self.data = collections.OrderedDict()
+        self.lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self,key,func):
+        # Returns the result stored for key, calling func to create it if needed
+        # func is called without holding the lock, so two threads may compute the same result at once
+        with self.lock:
+            if key in self.data:
+                self.data.move_to_end(key)
+                self.hits+=1
+                return self.data[key]
+            self.misses+=1
+        
+        value = func()
+        self.put(key,value)
+        return value
+    def put(self,key,value):
+        with self.lock:
+            self.data[key]=value
+            self.data.move_to_end(key)
+            while len(self.data)>self.maxsize:
+                self.data.popitem(last=False)
+                self.evictions+=1
+    
+    def resize(self,maxsize):
+        if maxsize<1:
+            raise ValueError("Cache size must be at least 1")
+        with self.lock:
+            self.maxsize = maxsize
+            while len(self.data)>self.maxsize:
+                self.data.popitem(last=False)
+                self.evictions+=1
+    def clear(self):
+        # Removes all results and resets the statistics
+        with self.lock:
+            self.data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+    
+    def getStats(self):
+        with self.lock:
+            return CacheStats(self.hits,self.misses,self.evictions,len(self.data),self.maxsize)
+    
+    def __len__(self):
+        return len(self.data)
+
+_cache = LRUCache()
+_enabled = False
+
+def enable(maxsize=None):
+    # Enables the cache, optionally changing its size
+    global _enabled
+    if maxsize is not None:
+        _cache.resize(maxsize)
+    _enabled = True
+def disable():
+    # Disables the cache, stored results are kept until clear() is called
+    global _enabled
+    _enabled = False
+def isEnabled():
+    return _enabled
+
+def useCache(cache=None):
+    # Returns whether a call should use the cache
+    # cache is the per-call override, None follows the global switch
+    if cache is None:
+        return _enabled
+    return bool(cache)
+
+def getCache():
+    return _cache
+def getStats():
+    return _cache.getStats()
+def clear():
+    _cache.clear()
+
+# Functions to turn results into strings for the persistent store and back, by target
+# Names and SMILES are stored as they are
+# Structures are stored as the arrays of their compact form, so that they can be loaded without parsing
+def _encodeString(key,value):
+    return value
+def _decodeString(key,data):
+    return data
+
+def _encodeStructure(key,struct):
+    struct = struct.asCompact()
+    return json.dumps([
+        struct.element_codes.tolist(),
+        struct.offsets.tolist(),
+        struct.neighbours.tolist(),
+        struct.bond_orders.tolist(),
+        list(struct.names) if struct.names is not None else None,
+        struct.hydrogen_counts.tolist() if struct.hydrogen_counts is not None else None,
+        struct.implicit_hydrogen,
+        ],separators=(",",":"))
+def _decodeStructure(key,data):
+    from .notations import frozen
+    element_codes,offsets,neighbours,bond_orders,names,hydrogen_counts,implicit_hydrogen = json.loads(data)
+    # Same types as in CompactStructuralNotation.fromStructure()
+    return frozen.FrozenStructuralNotation(
+        array.array("B",element_codes),
+        array.array("l",offsets),
+        array.array("l",neighbours),
+        array.array("B",bond_orders),
+        names,
+        array.array("B",hydrogen_counts) if hydrogen_counts is not None else None,
+        implicit_hydrogen,
+        )
+
+CODECS = {
+    "structural":(_encodeStructure,_decodeStructure),
+    "iupac":(_encodeString,_decodeString),
+    "smiles":(_encodeString,_decodeString),
+    }
+
+_store = None
+
+def setStore(store):
+    # Sets the persistent store used behind the cache, None removes it
+    global _store
+    _store = store
+def getStore():
+    return _store
+
+def getSettings():
+    # Returns the current settings, used to send them to worker processes
+    return CacheSettings(_enabled,_cache.maxsize,_store)
+def applySettings(settings):
+    # Applies settings returned by getSettings(), usually of another process
+    global _enabled
+    _enabled = settings.enabled
+    if _cache.maxsize!=settings.maxsize:
+        _cache.resize(settings.maxsize)
+    setStore(settings.store)
+
+def _encode(key,value):
+    # Returns the string to store for a result, or None if it cannot be stored
+    try:
+        return CODECS[key[2]][0](key,value)
+    except Exception:
+        return None
+def _decode(key,data):
+    return CODECS[key[2]][1](key,data)
+
+def _loadPersistent(key,func):
+    # Called on a miss of the in-memory cache
+    store = _store
+    if store is None or key[2] not in CODECS:
+        return func()
+    
+    data = store.get(key)
+    if data is not None:
+        return _decode(key,data)
+    
+    value = func()
+    data = _encode(key,value)
+    if data is not None:
+        store.put(key,data)
+    return value
+
+def lookup(key,func):
+    # Returns the cached result for key, see LRUCache.get()
+    return _cache.get(key,lambda:_loadPersistent(key,func))
+
+def prefetch(keys):
+    # Loads the results for all keys from the persistent store into the in-memory cache with a single bulk read
+    # Keys already in the in-memory cache are skipped, returns the number of loaded results
+    store = _store
+    if store is None:
+        return 0
+    keys = [key for key in keys if key[2] in CODECS and key not in _cache.data]
+    loaded = store.prefetch(keys)
+    for key,data in loaded.items():
+        _cache.put(key,_decode(key,data))
+    return len(loaded)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  canonical.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+
+# Canonical keys of molecule graphs
+# Two structures have the same key exactly if they describe the same molecule, regardless of atom order and names
+# Hydrogen atoms bound to a single heavy atom are folded into a hydrogen count, explicit and implicit hydrogen give the same key
+#
+# Acyclic molecules, which includes everything the converters produce, are encoded as a tree rooted at its center
+# Other molecules use Weisfeiler-Lehman colour refinement with individualisation-refinement for tie-breaking
+# Every atom of the smallest ambiguous class is given its own colour in turn and the smallest resulting key is used,
+# so the key never depends on the atom order, at the cost of a search that grows with the symmetry of the molecule
+
+import collections
+
+BOND_SYMBOLS = {1:"",2:"=",3:"#"}
+
+def getGraph(atoms):
+    # Converts atoms into the graph used for canonical keys
+    # atoms may be any iterable of objects with symbol, bindings and implicit_hydrogen attributes
+    # Returns labels,adjacency
+    # labels: list of atom labels, e.g. "CH3"
+    # adjacency: list of lists of (neighbour index,bond order)
+    atoms = list(atoms)
+    heavy = []
+    hydrogen = {}
+    for atom in atoms:
+        if atom.symbol=="H" and len(atom.bindings)==1:
+            other = next(iter(atom.bindings))
+            if other.symbol!="H":
+                # Folded into the count of the other atom
+                continue
+        heavy.append(atom)
+        hydrogen[atom] = atom.implicit_hydrogen
+    
+    index = {atom:i for i,atom in enumerate(heavy)}
+    labels = []
+    adjacency = []
+    for atom in heavy:
+        h = hydrogen[atom]
+        neighbours = []
+        for other,n in atom.bindings.items():
+            if other in index:
+                neighbours.append((index[other],n))
+            else:
+                h+=1
+        labels.append(getLabel(atom.symbol,h))
+        adjacency.append(neighbours)
+    return labels,adjacency
+
+def getLabel(symbol,h):
+    if h==0:
+        return symbol
+    elif h==1:
+        return symbol+"H"
+    return "%sH%s"%(symbol,h)
+
+def getBondSymbol(n):
+    return BOND_SYMBOLS.get(n,"~%s"%n)
+
+def canonicalKey(labels,adjacency):
+    # Returns the canonical key of the given graph, see getGraph()
+    components = getComponents(adjacency)
+    nedges = sum(len(neighbours) for neighbours in adjacency)//2
+    if nedges==len(labels)-len(components):
+        # Forest, every component is a tree
+        keys = [treeKey(labels,adjacency,component) for component in components]
+        return ".".join(sorted(keys))
+    return graphKey(labels,adjacency)
+
+def getComponents(adjacency):
+    seen = [False]*len(adjacency)
+    components = []
+    for start in range(len(adjacency)):
+        if seen[start]:
+            continue
+        seen[start] = True
+        component = [start]
+        stack = [start]
+        while len(stack)>0:
+            i = stack.pop()
+            for j,n in adjacency[i]:
+                if not seen[j]:
+                    seen[j] = True
+                    component.append(j)
+                    stack.append(j)
+        components.append(component)
+    return components
+
+def treeKey(labels,adjacency,component):
+    # Finds the center of the tree by repeatedly removing all leaves
+    degree = {i:len(adjacency[i]) for i in component}
+    leaves = [i for i in component if degree[i]<=1]
+    remaining = len(component)
+    while remaining>2:
+        remaining-=len(leaves)
+        new_leaves = []
+        for i in leaves:
+            for j,n in adjacency[i]:
+                degree[j]-=1
+                if degree[j]==1:
+                    new_leaves.append(j)
+        leaves = new_leaves
+    
+    # With two centers, the smaller of both encodings is used
+    return min(rootedKey(labels,adjacency,root) for root in leaves)
+
+def rootedKey(labels,adjacency,root):
+    # Encodes the tree rooted at root, children are sorted by their own encoding
+    # Works iteratively to support long chains
+    parent = {root:None}
+    order = [root]
+    for i in order:
+        for j,n in adjacency[i]:
+            if j not in parent:
+                parent[j] = i
+                order.append(j)
+    
+    encoded = {}
+    for i in reversed(order):
+        children = []
+        for j,n in adjacency[i]:
+            if j!=parent[i]:
+                children.append(getBondSymbol(n)+encoded.pop(j))
+        if len(children)==0:
+            encoded[i] = labels[i]
+        else:
+            children.sort()
+            encoded[i] = labels[i]+"("+")(".join(children)+")"
+    return encoded[root]
+
+def graphKey(labels,adjacency):
+    n = len(labels)
+    
+    # Initial colours are based on the labels only
+    table = {label:c for c,label in enumerate(sorted(set(labels)))}
+    
+    # Individualisation-refinement
+    # Each atom of the smallest ambiguous colour gets its own colour in turn, until all colours are unique
+    # The choice of the colour only depends on the colours themselves, so the set of keys found is the same
+    # for every atom order and the smallest of them is canonical
+    best = None
+    stack = [refine([table[label] for label in labels],adjacency)]
+    while len(stack)>0:
+        colors = stack.pop()
+        if len(set(colors))<n:
+            counts = collections.Counter(colors)
+            ambiguous = min(c for c,k in counts.items() if k>1)
+            for chosen in range(n):
+                if colors[chosen]==ambiguous:
+                    new_colors = [c*2 for c in colors]
+                    new_colors[chosen]+=1
+                    stack.append(refine(new_colors,adjacency))
+            continue
+        key = encodeGraph(labels,adjacency,colors)
+        if best is None or key<best:
+            best = key
+    return best
+
+def encodeGraph(labels,adjacency,colors):
+    # Encodes the graph with atoms ordered by their colours, which must be a permutation of range(n)
+    n = len(labels)
+    atoms = [None]*n
+    for i,c in enumerate(colors):
+        atoms[c] = labels[i]
+    bonds = sorted(
+        (colors[i],colors[j],order)
+        for i in range(n) for j,order in adjacency[i]
+        if colors[i]<colors[j]
+        )
+    return "%s|%s"%(
+        ",".join(atoms),
+        ",".join("%s-%s%s"%(i,j,getBondSymbol(order)) for i,j,order in bonds),
+        )
+
+def refine(colors,adjacency):
+    # Refines the colours until the number of colours stops growing
+    # New colours are ordered by the old colour first, so existing ties are only ever split
+    ncolors = len(set(colors))
+    while True:
+        signatures = [
+            (colors[i],tuple(sorted((n,colors[j]) for j,n in adjacency[i])))
+            for i in range(len(colors))
+            ]
+        table = {sig:c for c,sig in enumerate(sorted(set(signatures)))}
+        colors = [table[sig] for sig in signatures]
+        if len(table)==ncolors:
+            return colors
+        ncolors = len(table)
@@ -22,8 +22,24 @@
 #  
 #  
 
+import types
+
 from . import errors
 
+# Shared read-only bond data, used for bonds without metadata
+EMPTY_BOND_DATA = types.MappingProxyType({})
+
+class LazyLabel(object):
+    # Atom name that is only formatted when it is first read, see Atom.name
+    __slots__ = ("fmt","args")
+    def __init__(self,fmt,args):
+        self.fmt = fmt
+        self.args = args
+    def __str__(self):
+        return self.fmt%self.args
+    def __repr__(self):
+        return "<LazyLabel(%r)>"%str(self)
+
 class Atom(object):
     atomtype = "Atom"
     symbol = "-"
@@ -31,18 +47,55 @@ class Atom(object):
     isotope = None # Only specify if needed
     erase_hydrogen = False # Useful for some Elements
     
+    # Atoms are stored in large numbers, slots avoid a dict per instance and speed up attribute access
+    # The constants above stay class attributes, subclasses only need to define __slots__ = ()
+    __slots__ = ("structure","id","pos","_name","bindings","bonddata","num_bindings","fill_hydrogen","_implicit_hydrogen")
+    
     def __init__(self,structure,pos=None,name=""):
         self.structure = structure
         
+        # Dense integer id, assigned by StructuralNotation.addAtom() in insertion order
+        # Used instead of the name to order atoms, -1 until the atom is added to a structure
+        self.id = -1
+        
         self.pos = pos
         
-        self.name = name
+        # May be a LazyLabel, which is replaced by the formatted string on first access
+        self._name = name
         
         self.bindings = {} # map of Atom:int (bond count)
         self.bonddata = {} # map of Atom:dict (bond data)
         
         self.num_bindings = 0
         self.fill_hydrogen = True
+        
+        # Number of hydrogen atoms bound to this atom without being stored as Hydrogen objects
+        # Only used if the structure is in implicit hydrogen mode, see StructuralNotation
+        self._implicit_hydrogen = 0
+    
+    @property
+    def name(self):
+        name = self._name
+        if name.__class__ is LazyLabel:
+            name = self._name = str(name)
+        return name
+    @name.setter
+    def name(self,value):
+        self._name = value
+    
+    @property
+    def implicit_hydrogen(self):
+        return self._implicit_hydrogen
+    @implicit_hydrogen.setter
+    def implicit_hydrogen(self,value):
+        delta = value-self._implicit_hydrogen
+        self._implicit_hydrogen = value
+        self._notifyStructure(delta)
+    
+    def _notifyStructure(self,implicit_delta=0):
+        # Tells the structure to update its counters, see StructuralNotation.atomChanged()
+        if self.structure is not None:
+            self.structure.atomChanged(self,implicit_delta)
     
     def bindToAtom(self,other,bindings=1,sdata=None,odata=None):
         if not isinstance(other,Atom):
@@ -55,14 +108,19 @@ class Atom(object):
             # Already bound, prevents weird bindings
             # TODO: merge bindings instead
             raise errors.AlreadyBoundError("Atoms are already bound to each other")
-        elif self.num_bindings+bindings>self.max_bindings:
+        elif self.num_bindings+self.implicit_hydrogen+bindings>self.max_bindings:
             # Not enough bindings are available to bind to this (self) atom
             raise errors.NotEnoughBindingsError("Not enough bindings available to bind from this atom")
-        elif other.num_bindings+bindings>other.max_bindings:
+        elif other.num_bindings+other.implicit_hydrogen+bindings>other.max_bindings:
             # Not enough bindings are available to bind to this (other) atom
             raise errors.NotEnoughBindingsError("Not enough bindings available to bind to this atom")
         
-        sdata = sdata if sdata is not None else {}
+        if sdata is None:
+            # Bonds without metadata share a single read-only dict, unless full metadata is requested
+            if getattr(self.structure,"bond_metadata","full")=="full":
+                sdata = {}
+            else:
+                sdata = EMPTY_BOND_DATA
         
         self.bindings[other]=bindings
         self.bonddata[other]=sdata
@@ -70,6 +128,8 @@ class Atom(object):
         other.bonddata[self]=odata if odata is not None else sdata
         self.num_bindings+=bindings
         other.num_bindings+=bindings
+        self._notifyStructure()
+        other._notifyStructure()
     def unbindFromAtom(self,other):
         if not isinstance(other,Atom):
             raise errors.NotAnAtomError("Cannot unbind from non-atom")
@@ -87,6 +147,8 @@ class Atom(object):
         del other.bindings[self]
         self.num_bindings-=n
         other.num_bindings-=n
+        self._notifyStructure()
+        other._notifyStructure()
     
     def getBondData(self,other):
         if other not in self.bonddata:
@@ -94,6 +156,7 @@ class Atom(object):
         return self.bonddata[other],other.bonddata[self]
     
     def erase(self,erase_hydrogen=None):
+        self._checkStructure()
         if erase_hydrogen is None:
             erase_hydrogen = self.erase_hydrogen
         if erase_hydrogen:
@@ -104,17 +167,51 @@ class Atom(object):
         for other in list(self.bindings.keys()):
             self.unbindFromAtom(other)
         
-        self.structure.atoms.discard(self)
+        self.structure.removeAtom(self)
+    
+    def _checkStructure(self):
+        # Atoms lose their structure when it is released, see StructuralNotation.release()
+        if self.structure is None:
+            raise errors.DetachedAtomError("Atom does not belong to a structure")
     
     def fillWithHydrogen(self):
         if not self.fill_hydrogen:
             return
+        self._checkStructure()
+        if self.structure.implicit_hydrogen:
+            # Only count the hydrogen, makeHydrogenExplicit() creates the atoms if needed
+            self.implicit_hydrogen += max(self.max_bindings-self.num_bindings-self.implicit_hydrogen,0)
+            return
         # TODO: Add some smart positioning for hydrogen "childs"
         while self.num_bindings<self.max_bindings:
             h = Hydrogen(self.structure)
             self.structure.addAtom(h)
             self.bindToAtom(h)
     
+    def makeHydrogenExplicit(self):
+        # Replaces the implicit hydrogen count with actual Hydrogen atoms
+        self._checkStructure()
+        n = self.implicit_hydrogen
+        self.implicit_hydrogen = 0
+        for i in range(n):
+            h = Hydrogen(self.structure)
+            self.structure.addAtom(h)
+            self.bindToAtom(h)
+    
+    def countHydrogen(self):
+        # Counts both bound Hydrogen atoms and implicit hydrogen
+        h = self.implicit_hydrogen
+        for other in self.bindings:
+            if other.symbol=="H":
+                h+=1
+        return h
+    
+    # Atoms have no __dict__, their state is stored as a tuple
+    def __getstate__(self):
+        return (self.structure,self.id,self.pos,self._name,self.bindings,self.bonddata,self.num_bindings,self.fill_hydrogen,self._implicit_hydrogen)
+    def __setstate__(self,state):
+        self.structure,self.id,self.pos,self._name,self.bindings,self.bonddata,self.num_bindings,self.fill_hydrogen,self._implicit_hydrogen = state
+    
     def __repr__(self):
         if self.name != "":
             return "<Atom(symbol='%s',bindings=%s,name='%s')>"%(self.symbol,self.num_bindings,self.name)
@@ -123,20 +220,22 @@ class Atom(object):
     
     def __lt__(self,other):
         if isinstance(other,Atom):
-            return self.name<other.name # Allows for sorting
+            return self.id<other.id # Allows for sorting in insertion order
         raise TypeError("Cannot compare %s to %s"%(self.__class__.__name__,other.__class__.__name__))
     def __gt__(self,other):
         if isinstance(other,Atom):
-            return self.name>other.name # Allows for sorting
+            return self.id>other.id # Allows for sorting in insertion order
         raise TypeError("Cannot compare %s to %s"%(self.__class__.__name__,other.__class__.__name__))
 
 class Carbon(Atom):
+    __slots__ = ()
     atomtype = "Carbon"
     symbol = "C"
     max_bindings = 4
     erase_hydrogen = True
 
 class Hydrogen(Atom):
+    __slots__ = ()
     #def fillWithHydrogen(self):
     #    raise TypeError("Cannot fill Hydrogen with Hydrogen")
     atomtype = "Hydrogen"
@@ -144,6 +243,7 @@ class Hydrogen(Atom):
     max_bindings = 1
 
 class Oxygen(Atom):
+    __slots__ = ()
     atomtype = "Oxygen"
     symbol = "O"
     max_bindings = 2
@@ -151,42 +251,50 @@ class Oxygen(Atom):
     # TODO: implement special render with "shields" for oxygen only
 
 class Nitrogen(Atom):
+    __slots__ = ()
     atomtype = "Nitrogen"
     symbol = "N"
     max_bindings = 3
     erase_hydrogen = True
 
 class Sulfur(Atom):
+    __slots__ = ()
     atomtype = "Sulfur"
     symbol = "S"
     max_bindings = 2
 
 class Phosphorus(Atom):
+    __slots__ = ()
     atomtype = "Phosporus"
     symbol = "P"
     max_bindings = 3
 
 class Fluorine(Atom):
+    __slots__ = ()
     atomtype = "Fluorine"
     symbol = "F"
     max_bindings = 1
 
 class Chlorine(Atom):
+    __slots__ = ()
     atomtype = "Chlorine"
     symbol = "Cl"
     max_bindings = 1
 
 class Bromine(Atom):
+    __slots__ = ()
     atomtype = "Bromine"
     symbol = "Br"
     max_bindings = 1
 
 class Iodine(Atom):
+    __slots__ = ()
     atomtype = "Iodine"
     symbol = "I"
     max_bindings = 1
 
 class Boron(Atom):
+    __slots__ = ()
     atomtype = "Boron"
     symbol = "B"
     max_bindings = 3
@@ -22,36 +22,40 @@
 #  
 #  
 
+# Base class of all errors below, allows catching every error raised by chemhelper at once
 class ChemError(Exception):pass
 
-class IncompleteFormulaError(Exception):pass
-class InvalidFormulaError(Exception):pass
-class InvalidMultiplier(Exception):pass
-class MultipleMoleculesError(Exception):pass
-class BaseAtomOutOfRangeError(Exception):pass
-class FormulaTooLargeError(Exception):pass
+class IncompleteFormulaError(ChemError):pass
+class InvalidFormulaError(ChemError):pass
+class InvalidMultiplier(ChemError):pass
+class MultipleMoleculesError(ChemError):pass
+class BaseAtomOutOfRangeError(ChemError):pass
+class FormulaTooLargeError(ChemError):pass
 
-class NotAnAtomError(Exception):pass
+class NotAnAtomError(ChemError):pass
 
-class BindingError(Exception):pass
+class BindingError(ChemError):pass
 class AlreadyBoundError(BindingError):pass
 class NotEnoughBindingsError(BindingError):pass
 class NotBoundError(BindingError):pass
 
-class InvalidPrefixError(Exception):pass
-class InvalidSuffixError(Exception):pass
+class InvalidPrefixError(ChemError):pass
+class InvalidSuffixError(ChemError):pass
 
-class CyclicMoleculeError(Exception):pass
-class InvalidGroupError(Exception):pass
+class CyclicMoleculeError(ChemError):pass
+class InvalidGroupError(ChemError):pass
 
-class UnsupportedFeatureError(NotImplementedError):pass
-class UnsupportedElementError(NotImplementedError):pass
-class UnsupportedGroupError(NotImplementedError):pass
-class UnsupportedFormulaTypeError(NotImplementedError):pass
-class UnsupportedBindingError(NotImplementedError):pass
+class UnsupportedFeatureError(ChemError,NotImplementedError):pass
+class UnsupportedElementError(ChemError,NotImplementedError):pass
+class UnsupportedGroupError(ChemError,NotImplementedError):pass
+class UnsupportedFormulaTypeError(ChemError,NotImplementedError):pass
+class UnsupportedBindingError(ChemError,NotImplementedError):pass
 
-class InternalError(Exception):pass
+class InternalError(ChemError):pass
 
-class SMILESError(Exception):pass
+class ImmutableStructureError(ChemError):pass
+class DetachedAtomError(ChemError):pass
+
+class SMILESError(ChemError):pass
 class SMILESSyntaxError(SMILESError):pass
-class UnsupportedSMILESFeatureError(NotImplementedError):pass
+class UnsupportedSMILESFeatureError(ChemError,NotImplementedError):pass
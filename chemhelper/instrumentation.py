@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  instrumentation.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+# Opt-in timing and counters for the conversion pipelines
+# Records the cumulative time, number of calls and exceptions of every stage of StructuralNotation.asIUPACName()
+# and IUPACNotation.asStructuralFormula(), as well as of the whole pipelines
+#
+# Usage:
+#   chemhelper.instrumentation.enable()
+#   chemhelper.notations.iupac.IUPACNotation("Butane").asStructuralFormula()
+#   chemhelper.instrumentation.getSnapshot()
+#   # {"i2s":{"calls":1,"time":...,"errors":{}},"i2s_stage1":{...},...}
+#
+# While disabled, the pipelines only check isEnabled() once per conversion
+
+import time
+import json
+import threading
+
+class StageStats(object):
+    # Statistics of a single stage or pipeline
+    __slots__ = ["calls","time","errors"]
+    def __init__(self):
+        self.calls = 0
+        self.time = 0.0
+        self.errors = {} # map of error class name:count
+    
+    def asDict(self):
+        return {"calls":self.calls,"time":self.time,"errors":dict(self.errors)}
+
+_enabled = False
+_stats = {}
+_callbacks = []
+_lock = threading.Lock()
+
+def enable():
+    global _enabled
+    _enabled = True
+def disable():
+    # Disables recording, the recorded statistics are kept until reset() is called
+    global _enabled
+    _enabled = False
+def isEnabled():
+    return _enabled
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+def addCallback(func):
+    # Registers a function that is called after every recorded stage
+    # It is called as func(name,elapsed,error), with error being the exception raised by the stage or None
+    _callbacks.append(func)
+def removeCallback(func):
+    _callbacks.remove(func)
+
+def record(name,elapsed,error=None):
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = StageStats()
+        stats.calls+=1
+        stats.time+=elapsed
+        if error is not None:
+            errname = error.__class__.__name__
+            stats.errors[errname]=stats.errors.get(errname,0)+1
+    for func in list(_callbacks):
+        func(name,elapsed,error)
+
+def runStages(obj,prefix,count,data):
+    # Runs the stages prefix_stage1 to prefix_stageN of obj on data, recording every stage and the whole pipeline
+    # Exceptions are recorded for both the failing stage and the pipeline, then re-raised
+    start = time.perf_counter()
+    try:
+        for i in range(1,count+1):
+            name = "%s_stage%s"%(prefix,i)
+            stage_start = time.perf_counter()
+            try:
+                getattr(obj,name)(data)
+            except Exception as e:
+                record(name,time.perf_counter()-stage_start,e)
+                raise
+            record(name,time.perf_counter()-stage_start)
+    except Exception as e:
+        record(prefix,time.perf_counter()-start,e)
+        raise
+    record(prefix,time.perf_counter()-start)
+
+def getSnapshot():
+    # Returns a dict of stage name:dict with calls, cumulative time in seconds and errors by class name
+    with _lock:
+        return {name:stats.asDict() for name,stats in _stats.items()}
+def dumpSnapshot():
+    # Returns the snapshot as a JSON string
+    return json.dumps(getSnapshot(),indent=2,sort_keys=True)
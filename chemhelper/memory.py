@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  memory.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+# Memory footprint accounting for structures
+#
+# Usage:
+#   chemhelper.memory.memoryReport(struct)
+#   # {"structure":..,"atom_set":..,"atoms":..,"bindings":..,"bonddata":..,"names":..,"counters":..,"total":..}
+#
+# Sizes are in bytes, as reported by sys.getsizeof()
+# Objects shared between several components, e.g. interned strings, are only counted once
+
+import sys
+
+from .notations import structural, compact
+
+def _sizeof(obj,seen):
+    # Returns the size of obj if it has not been counted yet
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    return sys.getsizeof(obj)
+
+def _instanceSize(obj,seen):
+    # Size of an object including its instance dict, if it has one
+    size = _sizeof(obj,seen)
+    d = getattr(obj,"__dict__",None)
+    if d is not None:
+        size+=_sizeof(d,seen)
+    return size
+
+def _bufferSize(buf,seen):
+    # Size of an array, or of a read-only memoryview and the array behind it
+    if buf is None:
+        return 0
+    size = _sizeof(buf,seen)
+    if isinstance(buf,memoryview):
+        size+=_sizeof(buf.obj,seen)
+    return size
+
+def memoryReport(struct):
+    # Returns a dict of component:bytes used by the structure, and the total
+    if isinstance(struct,compact.CompactStructuralNotation):
+        return _compactReport(struct)
+    elif isinstance(struct,structural.StructuralNotation):
+        return _structuralReport(struct)
+    else:
+        raise TypeError("Cannot create memory report of %s"%struct.__class__.__name__)
+
+def _structuralReport(struct):
+    seen = set()
+    out = {}
+    out["structure"] = _instanceSize(struct,seen)
+    out["atom_set"] = _sizeof(struct.atoms,seen)
+    out["counters"] = _sizeof(struct.atom_counts,seen)+_sizeof(struct.invalid_atoms,seen)
+    
+    atoms = bindings = bonddata = names = 0
+    for atom in struct.atoms:
+        atoms+=_instanceSize(atom,seen)
+        bindings+=_sizeof(atom.bindings,seen)
+        # Bond data dicts and their values, atoms are counted separately
+        bonddata+=_sizeof(atom.bonddata,seen)
+        for data in atom.bonddata.values():
+            bonddata+=_sizeof(data,seen)
+            for key,value in data.items():
+                bonddata+=_sizeof(key,seen)+_sizeof(value,seen)
+        # Reads the stored name, so that lazy labels are not formatted
+        names+=_sizeof(atom._name,seen)
+    out["atoms"] = atoms
+    out["bindings"] = bindings
+    out["bonddata"] = bonddata
+    out["names"] = names
+    
+    out["total"] = sum(out.values())
+    return out
+
+def _compactReport(struct):
+    seen = set()
+    out = {}
+    out["structure"] = _instanceSize(struct,seen)
+    out["arrays"] = sum(_bufferSize(buf,seen) for buf in [
+        struct.element_codes,struct.offsets,struct.neighbours,struct.bond_orders,struct.hydrogen_counts,
+        ])
+    
+    names = 0
+    if struct.names is not None:
+        names+=_sizeof(struct.names,seen)
+        for name in struct.names:
+            names+=_sizeof(name,seen)
+    out["names"] = names
+    
+    # Results cached by frozen structures
+    cache = getattr(struct,"_cache",None)
+    out["cache"] = _sizeof(cache,seen) if cache is not None else 0
+    
+    out["total"] = sum(out.values())
+    return out
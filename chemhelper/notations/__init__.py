@@ -22,7 +22,20 @@
 #  
 #  
 
+import contextlib
+
+@contextlib.contextmanager
+def openFile(f,mode="r"):
+    # Opens the given path, or passes an already opened file object through without closing it
+    if hasattr(f,"read") or hasattr(f,"write"):
+        yield f
+    else:
+        with open(f,mode) as fobj:
+            yield fobj
+
 class BaseNotation(object):
+    __slots__ = ()
+    
     def checkValid(self):
         raise NotImplementedError("%s cannot be checked for validity"%self.__class__.__name__)
     def countAtoms(self):
@@ -54,6 +67,35 @@ class BaseNotation(object):
             f.write(data)
         return data
     
+    @staticmethod
+    def saveManyAsSMILES(f,notations,buffer_size=1000):
+        # Writes a multi-record SMILES file with one "SMILES name" line per notation
+        # notations may contain notations or (name,notation) tuples and may be a generator
+        # f may be a filename or an opened file object
+        # Lines are written in batches of buffer_size to reduce the amount of write calls
+        # Returns the number of records written
+        count = 0
+        with openFile(f,"w") as fobj:
+            buf = []
+            for item in notations:
+                if isinstance(item,tuple):
+                    name,notation = item
+                else:
+                    name,notation = "",item
+                
+                line = notation.dumpAsSMILES()
+                if name:
+                    line+=" "+name
+                buf.append(line)
+                count+=1
+                
+                if len(buf)>=buffer_size:
+                    fobj.write("\n".join(buf)+"\n")
+                    buf = []
+            if len(buf)>0:
+                fobj.write("\n".join(buf)+"\n")
+        return count
+    
     # Save to String Methods
     def dumpAsSMILES(self):
         raise NotImplementedError("%s cannot be exported as a SMILES File"%self.__class__.__name__)
@@ -68,6 +110,21 @@ class BaseNotation(object):
             data = f.read()
         return cls.loadsFromSMILES(data)
     
+    @classmethod
+    def iterFromSMILES(cls,f):
+        # Lazily loads a multi-record SMILES file, one "SMILES<whitespace>name" record per line
+        # Yields (name,notation) tuples, name is an empty string if the record has no name
+        # f may be a filename or an opened file object
+        # Only a single line is held in memory at a time
+        with openFile(f,"r") as fobj:
+            for line in fobj:
+                parts = line.split(None,1)
+                if len(parts)==0:
+                    continue # Skips empty lines
+                smiles = parts[0]
+                name = parts[1].strip() if len(parts)>1 else ""
+                yield name,cls.loadsFromSMILES(smiles)
+    
     @classmethod
     def loadFromInChI(cls,fname):
         with open(fname,"r") as f:
@@ -139,6 +196,8 @@ class BaseNotation(object):
     
 
 from . import structural
+from . import compact
+from . import frozen
 #from . import molecular
 from . import iupac
 from . import condensed
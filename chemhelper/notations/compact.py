@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  compact.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+
+import sys
+import array
+import collections
+import collections.abc
+
+from . import structural
+from .. import errors
+from .. import elements
+
+structural.compact = sys.modules["chemhelper.notations.compact"] # to avoid circular dependency
+
+# Element codes are the index of the element in elements.ALL_ELEMENTS
+ELEMENT_CODES = {symbol:i for i,symbol in enumerate(elements.ALL_ELEMENTS)}
+
+# List of code:Atom class, None if the element is not supported
+ELEMENT_CLASSES = [elements.ELEMENTS.get(symbol,None) for symbol in elements.ALL_ELEMENTS]
+
+class AtomView(object):
+    # Read-only stand-in for elements.Atom, backed by the arrays of a CompactStructuralNotation
+    # Views are created on demand and compare equal if they point to the same atom of the same structure
+    __slots__ = ("structure","index")
+    
+    pos = None
+    fill_hydrogen = False
+    
+    def __init__(self,structure,index):
+        self.structure = structure
+        self.index = index
+    
+    @property
+    def id(self):
+        # Same as Atom.id, atoms are stored in the order of their ids
+        return self.index
+    
+    @property
+    def element(self):
+        return ELEMENT_CLASSES[self.structure.element_codes[self.index]]
+    
+    @property
+    def symbol(self):
+        return elements.ALL_ELEMENTS[self.structure.element_codes[self.index]]
+    @property
+    def atomtype(self):
+        return self.element.atomtype
+    @property
+    def max_bindings(self):
+        return self.element.max_bindings
+    @property
+    def isotope(self):
+        return self.element.isotope
+    
+    @property
+    def name(self):
+        if self.structure.names is None:
+            return ""
+        return self.structure.names[self.index]
+    
+    @property
+    def implicit_hydrogen(self):
+        if self.structure.hydrogen_counts is None:
+            return 0
+        return self.structure.hydrogen_counts[self.index]
+    
+    @property
+    def bindings(self):
+        return BindingsView(self.structure,self.index)
+    @property
+    def num_bindings(self):
+        s = self.structure
+        return sum(s.bond_orders[s.offsets[self.index]:s.offsets[self.index+1]])
+    
+    def countHydrogen(self):
+        h = self.implicit_hydrogen
+        for other in self.bindings:
+            if other.symbol=="H":
+                h+=1
+        return h
+    
+    def __repr__(self):
+        if self.name != "":
+            return "<AtomView(symbol='%s',bindings=%s,name='%s')>"%(self.symbol,self.num_bindings,self.name)
+        else:
+            return "<AtomView(symbol='%s',bindings=%s) at index %s>"%(self.symbol,self.num_bindings,self.index)
+    
+    def __eq__(self,other):
+        return isinstance(other,AtomView) and \
+               self.index==other.index and \
+               self.structure is other.structure
+    def __ne__(self,other):
+        return not self.__eq__(other)
+    def __hash__(self):
+        return hash(self.index)
+    
+    def __lt__(self,other):
+        if isinstance(other,AtomView):
+            return self.index<other.index # Allows for sorting in insertion order
+        raise TypeError("Cannot compare %s to %s"%(self.__class__.__name__,other.__class__.__name__))
+    def __gt__(self,other):
+        if isinstance(other,AtomView):
+            return self.index>other.index # Allows for sorting in insertion order
+        raise TypeError("Cannot compare %s to %s"%(self.__class__.__name__,other.__class__.__name__))
+
+class BindingsView(collections.abc.Mapping):
+    # Read-only stand-in for Atom.bindings, maps AtomView:int (bond count)
+    __slots__ = ("structure","index")
+    
+    def __init__(self,structure,index):
+        self.structure = structure
+        self.index = index
+    
+    def __getitem__(self,other):
+        if isinstance(other,AtomView) and other.structure is self.structure:
+            s = self.structure
+            for k in range(s.offsets[self.index],s.offsets[self.index+1]):
+                if s.neighbours[k]==other.index:
+                    return s.bond_orders[k]
+        raise KeyError(other)
+    def __iter__(self):
+        s = self.structure
+        for k in range(s.offsets[self.index],s.offsets[self.index+1]):
+            yield AtomView(s,s.neighbours[k])
+    def __len__(self):
+        return self.structure.offsets[self.index+1]-self.structure.offsets[self.index]
+    
+    # Faster than the generic Mapping implementations
+    def __contains__(self,other):
+        try:
+            self[other]
+        except KeyError:
+            return False
+        return True
+    def items(self):
+        s = self.structure
+        return [(AtomView(s,s.neighbours[k]),s.bond_orders[k]) for k in range(s.offsets[self.index],s.offsets[self.index+1])]
+    def values(self):
+        s = self.structure
+        return s.bond_orders[s.offsets[self.index]:s.offsets[self.index+1]].tolist()
+
+class AtomsView(collections.abc.Set):
+    # Read-only stand-in for StructuralNotation.atoms
+    __slots__ = ("structure",)
+    
+    def __init__(self,structure):
+        self.structure = structure
+    
+    def __iter__(self):
+        s = self.structure
+        for i in range(len(s.element_codes)):
+            yield AtomView(s,i)
+    def __len__(self):
+        return len(self.structure.element_codes)
+    def __contains__(self,atom):
+        return isinstance(atom,AtomView) and \
+               atom.structure is self.structure and \
+               0<=atom.index<len(self.structure.element_codes)
+
+class CompactStructuralNotation(structural.StructuralNotation):
+    # Read-only structural formula stored in flat arrays instead of Atom objects
+    # Atoms are identified by their index
+    # element_codes: array of element codes, see ELEMENT_CODES
+    # offsets: array of len(atoms)+1 indices, the neighbours of atom i are neighbours[offsets[i]:offsets[i+1]]
+    # neighbours: array of atom indices (CSR adjacency)
+    # bond_orders: array of bond counts, parallel to neighbours
+    # names: list of atom names, or None if no atom has a name
+    # hydrogen_counts: array of implicit hydrogen counts, or None if there is no implicit hydrogen
+    def __init__(self,element_codes,offsets,neighbours,bond_orders,names=None,hydrogen_counts=None,implicit_hydrogen=False):
+        self.element_codes = element_codes
+        self.offsets = offsets
+        self.neighbours = neighbours
+        self.bond_orders = bond_orders
+        self.names = names
+        self.hydrogen_counts = hydrogen_counts
+        
+        self.implicit_hydrogen = implicit_hydrogen
+    
+    @classmethod
+    def fromStructure(cls,struct):
+        atoms = list(struct.atoms)
+        index = {atom:i for i,atom in enumerate(atoms)}
+        
+        element_codes = array.array("B")
+        offsets = array.array("l",[0])
+        neighbours = array.array("l")
+        bond_orders = array.array("B")
+        names = []
+        hydrogen_counts = array.array("B")
+        
+        for atom in atoms:
+            if atom.symbol not in elements.ELEMENTS:
+                raise errors.UnsupportedElementError("Element '%s' (%s) is not currently supported"%(atom.symbol,atom.atomtype))
+            element_codes.append(ELEMENT_CODES[atom.symbol])
+            for other,n in atom.bindings.items():
+                if other not in index:
+                    raise errors.InvalidFormulaError("Atom %s is bound to an atom outside of the structure"%atom)
+                neighbours.append(index[other])
+                bond_orders.append(n)
+            offsets.append(len(neighbours))
+            names.append(atom.name)
+            hydrogen_counts.append(atom.implicit_hydrogen)
+        
+        # Saves memory if no atom has a name or implicit hydrogen
+        if not any(names):
+            names = None
+        if not any(hydrogen_counts):
+            hydrogen_counts = None
+        
+        return cls(element_codes,offsets,neighbours,bond_orders,names,hydrogen_counts,struct.implicit_hydrogen)
+    
+    def thaw(self):
+        # Converts back into a StructuralNotation with regular Atom objects
+        struct = structural.StructuralNotation(self.implicit_hydrogen)
+        
+        atoms = []
+        for i,code in enumerate(self.element_codes):
+            atom = ELEMENT_CLASSES[code](struct,name=self.names[i] if self.names is not None else "")
+            if self.hydrogen_counts is not None:
+                atom.implicit_hydrogen = self.hydrogen_counts[i]
+            struct.addAtom(atom)
+            atoms.append(atom)
+        
+        for i,atom in enumerate(atoms):
+            for k in range(self.offsets[i],self.offsets[i+1]):
+                j = self.neighbours[k]
+                if j>i: # Every bond is stored in both directions, only bind once
+                    atom.bindToAtom(atoms[j],self.bond_orders[k])
+        
+        return struct
+    
+    @property
+    def atoms(self):
+        return AtomsView(self)
+    
+    def atom(self,index):
+        return AtomView(self,index)
+    
+    # Structure Modification Methods
+    def addAtom(self,atom):
+        raise errors.ImmutableStructureError("Cannot add atoms to a %s"%self.__class__.__name__)
+    def removeAtom(self,atom):
+        raise errors.ImmutableStructureError("Cannot remove atoms from a %s"%self.__class__.__name__)
+    def addHydrogenTo(self,atom,name="",sdata=None):
+        raise errors.ImmutableStructureError("Cannot add hydrogen to a %s"%self.__class__.__name__)
+    def release(self):
+        # Atoms are stored by index, there are no references between them to break
+        pass
+    
+    def fillWithHydrogen(self):
+        if self.checkValid()!=[]:
+            raise errors.ImmutableStructureError("Cannot fill a %s with hydrogen"%self.__class__.__name__)
+    def makeHydrogenExplicit(self):
+        if self.hydrogen_counts is not None and any(self.hydrogen_counts):
+            raise errors.ImmutableStructureError("Cannot make hydrogen of a %s explicit"%self.__class__.__name__)
+    
+    def countAtoms(self):
+        count = {}
+        for code,n in collections.Counter(self.element_codes).items():
+            count[elements.ALL_ELEMENTS[code]]=n
+        if self.hydrogen_counts is not None:
+            count["H"]=count.get("H",0)+sum(self.hydrogen_counts)
+        return count
+    
+    def checkValid(self):
+        out = []
+        for i,code in enumerate(self.element_codes):
+            totbinds = sum(self.bond_orders[self.offsets[i]:self.offsets[i+1]])
+            if self.hydrogen_counts is not None:
+                totbinds+=self.hydrogen_counts[i]
+            max_bindings = ELEMENT_CLASSES[code].max_bindings
+            if totbinds>max_bindings:
+                out.append((AtomView(self,i),">"))
+            elif totbinds<max_bindings:
+                out.append((AtomView(self,i),"<"))
+        return out
+    
+    def checkConnected(self,raise_error=False):
+        n = len(self.element_codes)
+        if n==0:
+            return True # Prevents crashes when trying to find a starting node
+        
+        # Walks the graph of all reachable atoms, starting with the first
+        visited = bytearray(n)
+        visited[0] = 1
+        reached = 1
+        stack = [0]
+        while len(stack)>0:
+            i = stack.pop()
+            for k in range(self.offsets[i],self.offsets[i+1]):
+                j = self.neighbours[k]
+                if not visited[j]:
+                    visited[j] = 1
+                    reached+=1
+                    stack.append(j)
+        
+        if reached!=n:
+            if raise_error:
+                raise errors.MultipleMoleculesError("Multiple molecules in one formula detected")
+            else:
+                return False
+        else:
+            return True
+    
+    def _longestChainDiameter(self):
+        # Same algorithm as StructuralNotation._longestChainDiameter(), but working on atom indices
+        carbon = ELEMENT_CODES["C"]
+        codes = self.element_codes
+        
+        longest_chain = []
+        
+        visited = bytearray(len(codes))
+        for i,code in enumerate(codes):
+            if code!=carbon or visited[i]:
+                continue
+            end,pred = self._carbonBFS(i)
+            for j in pred:
+                visited[j] = 1
+            
+            other_end,pred = self._carbonBFS(end)
+            
+            chain = []
+            node = other_end
+            while node is not None:
+                chain.append(node)
+                node = pred[node]
+            
+            if len(chain)>len(longest_chain):
+                longest_chain = chain
+        
+        return self._bestChain([AtomView(self,i) for i in longest_chain])
+    
+    def _carbonBFS(self,start):
+        carbon = ELEMENT_CODES["C"]
+        codes = self.element_codes
+        offsets = self.offsets
+        neighbours = self.neighbours
+        bond_orders = self.bond_orders
+        
+        pred = {start:None}
+        queue = collections.deque([start])
+        node = start
+        while len(queue)>0:
+            node = queue.popleft()
+            for k in range(offsets[node],offsets[node+1]):
+                neighbour = neighbours[k]
+                if bond_orders[k]!=1:
+                    raise errors.UnsupportedBindingError("%s-Binds are currently not supported"%bond_orders[k])
+                elif codes[neighbour]!=carbon:
+                    continue
+                elif neighbour in pred:
+                    if neighbour!=pred[node]:
+                        raise errors.CyclicMoleculeError("Molecule is not acyclic")
+                    continue
+                pred[neighbour]=node
+                queue.append(neighbour)
+        return node,pred
+    
+    # Conversion Methods
+    def asCompact(self):
+        return self
+    
+    def freeze(self):
+        return frozen.FrozenStructuralNotation(
+            self.element_codes,self.offsets,self.neighbours,self.bond_orders,
+            self.names,self.hydrogen_counts,self.implicit_hydrogen,
+            )
+    
+    # Load from String Methods
+    @classmethod
+    def loadsFromSMILES(cls,data,implicit_hydrogen=False,cache=None):
+        return structural.StructuralNotation.loadsFromSMILES(data,implicit_hydrogen,cache).asCompact()
+    
+    # Magic Methods
+    def __repr__(self):
+        return "<%s(atoms=%s)>"%(self.__class__.__name__,len(self.element_codes))
@@ -39,6 +39,10 @@ RE_SIMPLE_FORMULA = re.compile(r"""
 from . import BaseNotation
 from . import structural, iupac
 from .. import errors
+from .. import cache as conversion_cache
+from .. import tracing
+
+log = tracing.getLogger("condensed")
 
 class CondensedMolecularNotation(BaseNotation):
     # Formula of the form CH3(CH2)3CH3 for Pentane
@@ -49,7 +53,18 @@ class CondensedMolecularNotation(BaseNotation):
     def asCondensedFormula(self):
         return self
     
-    def asStructuralFormula(self):
+    def getCacheKey(self,target="structural"):
+        # Key of the result converted to target in chemhelper.cache
+        return self.__class__,self.formula,target,False
+    
+    def asStructuralFormula(self,cache=None):
+        if conversion_cache.useCache(cache):
+            return conversion_cache.lookup(self.getCacheKey(),lambda:self.asStructuralFormula(False).freezeTemporary())
+        
+        with tracing.conversion(log,"condensed2structural",self.formula):
+            return self.parseStructuralFormula()
+    def parseStructuralFormula(self):
+        # Converts without caching or tracing, use asStructuralFormula() instead
         struct = structural.StructuralNotation()
         
         c_amount = 0
@@ -62,14 +77,13 @@ class CondensedMolecularNotation(BaseNotation):
             
             # Extracts number from the end of the molecule
             n_s = ""
-            print("Looping %s"%f)
             while f[-1] in "0123456789":
                 if len(f[:-1])<3:
                     break # prevents the 2 from CH2 from being parsed
                 n_s = f[-1]+n_s
                 f = f[:-1]
             
-            print("Parsing %s"%n_s)
+            tracing.debug(log,"Simple formula %r, chain length %r",self.formula,n_s)
             # Parse number
             if n_s == "":
                 # For Propane, e.g. CH2-CH3-CH2
@@ -82,13 +96,11 @@ class CondensedMolecularNotation(BaseNotation):
             # Add base carbons to struct
             carbons = []
             for i in range(n):
-                carbons.append(struct.addCarbon(name="C%s"%(i+1)))
+                carbons.append(struct.addCarbon(name=struct.makeLabel("C%s",i+1)))
             
             # Bind them together
-            for c in carbons:
-                if carbons.index(c)==0:
-                    continue
-                c.bindToAtom(carbons[carbons.index(c)-1])
+            for prev,c in zip(carbons,carbons[1:]):
+                c.bindToAtom(prev)
         elif self.formula.startswith("CH3") and self.formula.endswith("CH3"):
             # Most other formula types
             raise errors.UnsupportedFormulaTypeError("Cannot convert between non-simple condensed formulas and structural formulas")
@@ -104,24 +116,36 @@ class CondensedMolecularNotation(BaseNotation):
         struct.fillWithHydrogen()
         return struct
     
-    def asIUPACName(self):
-        return self.asStructuralFormula().asIUPACName()
+    def asIUPACName(self,cache=None):
+        if conversion_cache.useCache(cache):
+            return iupac.IUPACNotation(conversion_cache.lookup(self.getCacheKey("iupac"),lambda:self.asIUPACName(False).name))
+        
+        with tracing.conversion(log,"condensed2iupac",self.formula):
+            with self.asStructuralFormula(cache) as struct:
+                return struct.asIUPACName()
     
     # Save to String Methods
-    def dumpAsSMILES(self):
-        return self.asStructuralFormula().dumpAsSMILES()
+    def dumpAsSMILES(self,cache=None):
+        if conversion_cache.useCache(cache):
+            return conversion_cache.lookup(self.getCacheKey("smiles"),lambda:self.dumpAsSMILES(False))
+        
+        with self.asStructuralFormula(cache) as struct:
+            return struct.dumpAsSMILES()
     
     def dumpAsInChI(self):
-        return self.asStructuralFormula().dumpAsInChI()
+        with self.asStructuralFormula() as struct:
+            return struct.dumpAsInChI()
     
     # Load from String Methods
     @classmethod
     def loadsFromSMILES(cls,data):
-        return structural.StructuralNotation.loadsFromSMILES(data).asCondensedFormula()
+        with structural.StructuralNotation.loadsFromSMILES(data) as struct:
+            return struct.asCondensedFormula()
     
     @classmethod
     def loadsFromInChI(cls,data):
-        return structural.StructuralNotation.loadsFromInChI(data).asCondensedFormula()
+        with structural.StructuralNotation.loadsFromInChI(data) as struct:
+            return struct.asCondensedFormula()
     
     # Magic Methods
     def __repr__(self):
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  frozen.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+
+import sys
+import array
+
+from . import structural
+from . import compact
+from . import iupac
+from .. import errors
+
+structural.frozen = sys.modules["chemhelper.notations.frozen"] # to avoid circular dependency
+compact.frozen = sys.modules["chemhelper.notations.frozen"]
+
+def _readOnly(arr):
+    # Returns a read-only copy of the array that can still be indexed and sliced like the array
+    if arr is None:
+        return None
+    return memoryview(arr.tobytes()).cast(arr.typecode)
+
+def _toArray(view):
+    if view is None:
+        return None
+    return array.array(view.format,view)
+
+# Cache keys of the outputs of convert()
+_CONVERT_CACHE_KEYS = {
+    "iupac":"name",
+    "smiles":"smiles",
+    "formula":("formula","{element}<sub>{count}</sub>",None),
+    "canonical":"key",
+    }
+
+class FrozenStructuralNotation(compact.CompactStructuralNotation):
+    # Immutable structural formula that caches all derived properties
+    # Can be safely shared between threads and used as a dict key, equality is based on canonicalKey()
+    # Results are computed on first use and cached, see _cached()
+    # The cache only stores atom indices and strings, never AtomView objects, to avoid reference cycles
+    def __init__(self,element_codes,offsets,neighbours,bond_orders,names=None,hydrogen_counts=None,implicit_hydrogen=False):
+        super(FrozenStructuralNotation,self).__init__(
+            _readOnly(element_codes),
+            _readOnly(offsets),
+            _readOnly(neighbours),
+            _readOnly(bond_orders),
+            tuple(names) if names is not None else None,
+            _readOnly(hydrogen_counts),
+            implicit_hydrogen,
+            )
+        
+        # Map of key:result
+        self._cache = {}
+        
+        self._frozen = True
+    
+    def _cached(self,key,func):
+        # Returns the cached result for key, calling func to compute it if needed
+        # If two threads compute the same result at once, both get the one that was stored first
+        try:
+            return self._cache[key]
+        except KeyError:
+            return self._cache.setdefault(key,func())
+    
+    def __setattr__(self,name,value):
+        if getattr(self,"_frozen",False):
+            raise errors.ImmutableStructureError("Cannot modify a %s"%self.__class__.__name__)
+        super(FrozenStructuralNotation,self).__setattr__(name,value)
+    
+    # Cached Methods
+    def countAtoms(self):
+        return dict(self._cached("count",super(FrozenStructuralNotation,self).countAtoms))
+    
+    def checkValid(self):
+        invalid = self._cached("valid",lambda:tuple((atom.index,r) for atom,r in super(FrozenStructuralNotation,self).checkValid()))
+        return [(compact.AtomView(self,i),r) for i,r in invalid]
+    
+    def checkConnected(self,raise_error=False):
+        connected = self._cached("connected",super(FrozenStructuralNotation,self).checkConnected)
+        if not connected and raise_error:
+            raise errors.MultipleMoleculesError("Multiple molecules in one formula detected")
+        return connected
+    
+    def getCarbonBackbone(self,legacy=None):
+        if legacy is None:
+            legacy = self.legacy_backbone
+        backbone = self._cached(("backbone",legacy),lambda:tuple(atom.index for atom in super(FrozenStructuralNotation,self).getCarbonBackbone(legacy)))
+        return [compact.AtomView(self,i) for i in backbone]
+    
+    def getFunctionalGroups(self):
+        # Returns a list of (position,grouptype) for all groups attached to the backbone
+        # Positions are 1-based and follow the backbone, before any flipping done for the IUPAC name
+        return list(self._cached("groups",self._getFunctionalGroups))
+    def _getFunctionalGroups(self):
+        if self.countAtoms().get("C",0)==0:
+            return ()
+        data = {}
+        self.s2i_stage1(data)
+        self.s2i_stage2(data)
+        self.s2i_stage3(data)
+        return tuple((n,grouptype) for n,grouptype,extradata in data["f_groups"])
+    
+    def getSumFormula(self,element_str="{element}<sub>{count}</sub>",atomOrder=None):
+        key = "formula",element_str,tuple(atomOrder) if atomOrder is not None else None
+        return self._cached(key,lambda:super(FrozenStructuralNotation,self).getSumFormula(element_str,atomOrder))
+    
+    def asIUPACName(self,advanced=False,analysis=None):
+        if advanced:
+            # The data dict contains AtomViews and is not cached
+            return super(FrozenStructuralNotation,self).asIUPACName(True,analysis)
+        return iupac.IUPACNotation(self._cached("name",lambda:super(FrozenStructuralNotation,self).asIUPACName(analysis=analysis).name))
+    
+    def dumpAsSMILES(self,analysis=None):
+        return self._cached("smiles",lambda:super(FrozenStructuralNotation,self).dumpAsSMILES(analysis))
+    
+    def convert(self,outputs=("iupac","smiles","formula")):
+        # Outputs that have already been cached are not converted again
+        # The analysis is only run if the name or SMILES are missing
+        missing = [output for output in outputs if _CONVERT_CACHE_KEYS.get(output) not in self._cache]
+        out = super(FrozenStructuralNotation,self).convert(missing)
+        for output in outputs:
+            if output not in out:
+                out[output] = self._cache[_CONVERT_CACHE_KEYS[output]]
+        return out
+    
+    # Conversion Methods
+    def freeze(self):
+        return self
+    
+    def canonicalKey(self):
+        return self._cached("key",super(FrozenStructuralNotation,self).canonicalKey)
+    
+    # Magic Methods
+    def __hash__(self):
+        return self._cached("hash",lambda:hash(self.canonicalKey()))
+    
+    def __reduce__(self):
+        # memoryviews cannot be pickled, they are converted back to arrays
+        return self.__class__,(
+            _toArray(self.element_codes),
+            _toArray(self.offsets),
+            _toArray(self.neighbours),
+            _toArray(self.bond_orders),
+            self.names,
+            _toArray(self.hydrogen_counts),
+            self.implicit_hydrogen,
+            )
@@ -22,12 +22,17 @@
 #  
 #  
 
+import re
+import types
 import collections
 
 import bidict
 
 from . import BaseNotation
 from .. import errors
+from .. import cache as conversion_cache
+from .. import instrumentation
+from .. import tracing
 
 SPECIAL_ALKANE_PREFIXES = bidict.bidict({
     1   :"meth",
@@ -99,122 +104,93 @@ BASE_PREFIXES_1000 = {
     9:"nonalia",
     }
 
+# Token of a split IUPAC name, see IUPACNotation.tokenize()
+# kind: "prefix", "parent" or "suffix"
+# locants: tuple of int positions, None if not given
+# head: text in front of the stem, e.g. the multiplying prefix "di"
+# stem: recognized end of the token, e.g. "amino", "yl" or "ol", or the alkane prefix of the parent, e.g. "hept"
+# value: length of the main chain for the parent, None otherwise
+NameToken = collections.namedtuple("NameToken",["kind","locants","head","stem","value"])
+
+# Suffixes that can be recognized
+SUFFIXES = ("ol","al","one","amine")
+
+log = tracing.getLogger("iupac")
+
+# Number of stages of IUPACNotation.asStructuralFormula()
+I2S_STAGES = 6
+
+_ITEM_RE = re.compile(r"[^-]+")
+_LOCANT_CHARS_RE = re.compile(r"[0-9,]")
+_LOCANTS_RE = re.compile(r"[0-9,]*")
+
 class IUPACNotation(BaseNotation):
+    # _key caches (name,key) for the comparison key of the name, see _getKey()
+    __slots__ = ("name","_key")
+    
+    # Registry of functional groups, shared by all instances
+    # Read-only mapping of type:constructor function
+    # Constructors are called as func(notation,fg,data)
+    fgroups = types.MappingProxyType({})
+    # Registry of prefixes, shared by all instances
+    # Read-only mapping of prefix:data, in the order the prefixes are checked
+    # data is a read-only mapping:
+    # {
+    #   "type": either "notsupported", "simple" or "custom"
+    #   For "notsupported":
+    #   "msg":<error message>
+    #   For "simple":
+    #   "ftype": functional group type
+    #   For "custom":
+    #   "func":function(notation,positions,prefixname,data)
+    # }
+    prefixes = types.MappingProxyType(collections.OrderedDict())
+    # Cached prefixes,trie pair, see getPrefixTrie()
+    _prefix_trie = None
+    
     def __init__(self,name=""):
         self.name = name
-        
-        # Dict of type:constructor function
-        self.fgroups = {}
-        # Dict of prefix:data
-        # data is a dict:
-        # {
-        #   "type": either "notsupported", "simple" or "custom"
-        #   For "notsupported":
-        #   "msg":<error message>
-        #   For "simple":
-        #   "ftype": functional group type
-        #   For "custom":
-        #   "func":function(positions,prefixname,data)
-        # }
-        self.prefixes = collections.OrderedDict()
-        
-        self.init_fgroups()
-        self.init_prefixes()
-    def init_fgroups(self):
-        self.fgroups["alkyl"]=self.fg_alkyl
-        self.fgroups["hydroxyl"]=self.fg_hydroxyl
-        self.fgroups["amino"]=self.fg_amino
-        self.fgroups["hydroxyamino"]=self.fg_hydroxyamino
-        self.fgroups["fluoro"]=self.fg_fluoro
-        self.fgroups["chloro"]=self.fg_chloro
-        self.fgroups["bromo"]=self.fg_bromo
-        self.fgroups["iodo"]=self.fg_iodo
-    def init_prefixes(self):
-        # Hydroxyl Groups
-        self.prefixes["hydroxy"]={
-                #"type":"notsupported",
-                #"msg":"Hydroxyl groups are currently not supported in prefixes",
-                "type":"simple",
-                "ftype":"hydroxyl",
-                }
-        
-        # Aldehydes
-        self.prefixes["formyl"]={
-                "type":"notsupported",
-                "msg":"Aldehydes are currently not supported",
-                }
-        
-        # Ketones
-        self.prefixes["oxo"]={
-                "type":"notsupported",
-                "msg":"Ketones are currently not supported",
-                }
-        
-        # Carboxylic Acids
-        self.prefixes["carboxy"]={
-                "type":"notsupported",
-                "msg":"Carboxylic Acids are currently not supported",
-                }
-        
-        # Nitro Groups
-        self.prefixes["nitro"]={
-                "type":"notsupported",
-                "msg":"Nitro groups are currently not supported",
-                }
-        
-        # Nitroso Groups
-        self.prefixes["nitroso"]={
-                "type":"notsupported",
-                "msg":"Nitroso groups are currently not supported",
-                }
-        
-        # Hydroxyamino Group
-        # Based on rule C-841.3
-        self.prefixes["hydroxyamino"]={
-                "type":"simple",
-                "ftype":"hydroxyamino",
-                }
-        
-        # Amino Group
-        # Based on rule C-811.3
-        self.prefixes["amino"]={
-                "type":"simple",
-                "ftype":"amino",
-                }
-        
-        # Fluoro Group
-        # Based on rule C-102.1
-        self.prefixes["fluoro"]={
-                "type":"simple",
-                "ftype":"fluoro",
-                }
-        
-        # Chloro Group
-        # Based on rule C-102.1
-        self.prefixes["chloro"]={
-                "type":"simple",
-                "ftype":"chloro",
-                }
-        
-        # Bromo Group
-        # Based on rule C-102.1
-        self.prefixes["bromo"]={
-                "type":"simple",
-                "ftype":"bromo",
-                }
-        
-        # Iodo Group
-        # Based on rule C-102.1
-        self.prefixes["iodo"]={
-                "type":"simple",
-                "ftype":"iodo",
-                }
-        
-        # Alkyl Group
-        self.prefixes["yl"]={
-                "type":"custom",
-                "func":self.pr_alkyl,
-                }
+        self._key = None
+    
+    # Registry Methods
+    # The registries are never modified in place, registering creates a new mapping
+    # Registering on a subclass only affects that subclass
+    @classmethod
+    def registerFunctionalGroup(cls,ftype,func):
+        fgroups = dict(cls.fgroups)
+        fgroups[ftype]=func
+        cls.fgroups = types.MappingProxyType(fgroups)
+    @classmethod
+    def registerPrefix(cls,prefix,ptype,**kwargs):
+        if ptype=="notsupported":
+            required = "msg"
+        elif ptype=="simple":
+            required = "ftype"
+        elif ptype=="custom":
+            required = "func"
+        else:
+            raise errors.InternalError("Invalid prefix type '%s' for '%s'"%(ptype,prefix))
+        if required not in kwargs:
+            raise errors.InternalError("Prefix '%s' of type %s requires %s"%(prefix,ptype,required))
+        dat = {"type":ptype}
+        dat.update(kwargs)
+        prefixes = collections.OrderedDict(cls.prefixes)
+        prefixes[prefix]=types.MappingProxyType(dat)
+        cls.prefixes = types.MappingProxyType(prefixes)
+    @classmethod
+    def unregisterPrefix(cls,prefix):
+        prefixes = collections.OrderedDict(cls.prefixes)
+        del prefixes[prefix]
+        cls.prefixes = types.MappingProxyType(prefixes)
+    @classmethod
+    def getPrefixTrie(cls):
+        # Returns the reverse-suffix trie of all registered prefixes, see buildSuffixTrie()
+        # The trie is built on first use and rebuilt whenever the registry has been replaced
+        cached = cls._prefix_trie
+        if cached is None or cached[0] is not cls.prefixes:
+            cached = cls.prefixes,buildSuffixTrie(cls.prefixes)
+            cls._prefix_trie = cached
+        return cached[1]
     
     # Conversion Methods
     def asIUPACName(self):
@@ -398,7 +374,11 @@ class IUPACNotation(BaseNotation):
         struct.fillWithHydrogen()
         return struct
     """
-    def asStructuralFormula(self):
+    def getCacheKey(self,implicit_hydrogen=False,target="structural"):
+        # Key of the result converted to target in chemhelper.cache, names are case-insensitive
+        return self.__class__,self.name.lower(),target,implicit_hydrogen
+    
+    def asStructuralFormula(self,implicit_hydrogen=False,cache=None):
         # Parsing is done in multiple stages
         # 1. Split the main name in prefixes, main chain and suffix
         # 2. Parse Prefixes and Suffixes into functional groups
@@ -442,157 +422,107 @@ class IUPACNotation(BaseNotation):
         # 811.4: Amine Radicals and trivial names
         # 812.1: Monoamines using -amine and trivial names
         
+        if conversion_cache.useCache(cache):
+            return conversion_cache.lookup(self.getCacheKey(implicit_hydrogen),lambda:self.asStructuralFormula(implicit_hydrogen,False).freezeTemporary())
+        
         data = {}
-        self.i2s_stage1(data)
-        self.i2s_stage2(data)
-        self.i2s_stage3(data)
-        self.i2s_stage4(data)
-        self.i2s_stage5(data)
-        self.i2s_stage6(data)
+        data["implicit_hydrogen"] = implicit_hydrogen
+        with tracing.conversion(log,"iupac2structural",self.name):
+            if instrumentation.isEnabled():
+                instrumentation.runStages(self,"i2s",I2S_STAGES,data)
+            else:
+                self.i2s_stage1(data)
+                self.i2s_stage2(data)
+                self.i2s_stage3(data)
+                self.i2s_stage4(data)
+                self.i2s_stage5(data)
+                self.i2s_stage6(data)
         
         return data["struct"]
     
-    def i2s_stage1(self,data):
-        # Stage 1
-        # Split the main name in prefixes, main chain and suffix
+    def tokenize(self):
+        # Splits the name into a list of NameToken objects in a single pass
         # Name format:
         # 2,2-dimethyl-3,3,4,5-tetraethyl-4,5-dihydroxyheptan-6-ol
-        # Output data:
-        # prefixes: list of 2-tuples: [[(2,2),"dimethyl"],[(3,3,4,5),"tetraethyl"],[(4,5),"dihydroxy"]]
-        # main_chain_length: int of main chain length: 7
-        # suffixes: list of strings: [[(6,),"ol"]]
+        # Output:
+        # [
+        #   NameToken("prefix",(2,2),"dimeth","yl",None),
+        #   NameToken("prefix",(3,3,4,5),"tetraeth","yl",None),
+        #   NameToken("prefix",(4,5),"di","hydroxy",None),
+        #   NameToken("parent",None,"","hept",7),
+        #   NameToken("suffix",(6,),"","ol",None),
+        # ]
+        # Prefixes and suffixes that could not be recognized have a stem of None, errors are raised by i2s_stage2
+        name = self.name.lower()
         
-        # First, split by "an" from the right
-        # Will potentially leave an extra e at the start
-        
-        if "an" not in self.name.lower():
+        # The main chain ends at the last "an"
+        # Will potentially leave an extra e at the start of the suffix
+        split = name.rfind("an")
+        if split==-1:
             # Check to make sure we are actually dealing with an alkane
             raise errors.UnsupportedFormulaTypeError("Cannot convert non alkane-based names")
-        pre_main,suffix = self.name.lower().rsplit("an",maxsplit=1)
+        pre_main,suffix = name[:split],name[split+2:]
         # Remove the extra e and dash at the start of the suffix, if any
-        #print(suffix)
-        suffix = suffix.lstrip("e")
-        suffix = suffix.lstrip("-")
-        print("Suffix: %s"%suffix)
+        suffix = suffix.lstrip("e").lstrip("-")
         
         # Parse main chain length out of the remaining string
-        # Note that parseAlkanePrefix will automatically lower-case all outputs
-        data["main_chain_length"],prefix = parseAlkanePrefix(pre_main,True)
-        
-        # Now, we parse the prefix
-        # Create the output prefix list
-        data["prefixes"] = []
+        main_chain_length,prefix = parseAlkanePrefix(pre_main,True)
         
-        print("Prefix: %s"%prefix)
+        tokens = []
         
-        run = True
-        i = 0 # Next index
-        n1 = None # Lower temp value
-        n2 = None # Higher temp value
-        # Example with 1,2 and dimethyl
-        # Prefixes: ["1,2","dimethyl"]
-        # n1 = "1,2"
-        # n2 = "dimethyl"
-        # Example with just Amino
-        # Prefixes: ["Amino"]
-        # n1 = None
-        # n2 = "amino"
-        prefixes = prefix.split("-")
-        prefixes = list(filter(lambda p:p!="",prefixes))
-        # Fills n1 and n2
-        # Then checks if they make a pair of positions,prefixname
-        # If yes, then parse it as a pair
-        # If not, then substitute positions with None
-        while run:
-            if n2 is None and i<len(prefixes):
-                # Get a new prefix and increase the pointer
-                n2 = prefixes[i]
-                i+=1
-            
-            if n1 is None and n2 is not None:
-                # Move n2 into n1
-                n1 = n2
-                n2 = None
-                continue # Iterate again to re-fill n2 if something is available
-            if n1 is None and n2 is None:
-                run = False
-                continue
-                # exhausted and parsed everything
-            
-            if (n1 is None or len(n1)==0) and n2 is not None:
-                # Not a pair
-                # Only happens if there is a single prefix
-                # positions is None, prefixname in n2
-                data["prefixes"].append([None,n2])
-                
-                # Clear the values, will be refilled in next iteration
-                n1 = None
-                n2 = None
-                continue
-            elif any([x in n1 for x in ",0123456789"]):
-                # A pair
-                # positions in n1, prefixname in n2
-                try:
-                    positions = [int(j) for j in n1.split(",")]
-                except ValueError:
-                    # may happen if there is a trailing comma or non-integer number
-                    n = None
-                    for j in n1.split(","):
-                        try:
-                            int(j)
-                        except ValueError:
-                            n = j
-                            break
-                    else:
-                        raise # Some other ValueError
-                    raise errors.InvalidPrefixError("Invalid locant '%s', must be an integer"%n)
-                data["prefixes"].append([positions,n2])
-                
-                # Clear the values, will be refilled in next iteration
-                n1 = None
-                n2 = None
-                continue
-            elif not any([x in n1 for x in ",0123456789"]):
-                # Not a pair, n2 is ignored
-                # positions is None, prefixname in n1
-                data["prefixes"].append([None,n1])
-                
-                # Clear only n1, will be refilled from n2 in next iteration
-                n1 = None
+        # Prefixes are separated by dashes, locants belong to the prefix after them
+        trie = self.getPrefixTrie()
+        locants = None
+        for item in _ITEM_RE.findall(prefix):
+            if locants is None and _LOCANT_CHARS_RE.search(item):
+                locants = parseLocants(item,errors.InvalidPrefixError)
                 continue
+            end = matchSuffixTrie(trie,item)
+            if end is None:
+                tokens.append(NameToken("prefix",locants,item,None,None))
             else:
-                raise errors.InternalError("Invalid Prefix: n1=%s n2=%s"%(n1,n2))
+                tokens.append(NameToken("prefix",locants,item[:-len(end)],end,None))
+            locants = None
+        if locants is not None:
+            raise errors.InvalidPrefixError("Expected prefix after locants '%s'"%",".join(str(i) for i in locants))
         
-        # Lastly, the suffix is parsed
-        # The suffix can be similar to the prefix, but positions are not required
+        tokens.append(NameToken("parent",None,"",pre_main[len(prefix):],main_chain_length))
         
-        # Create the output suffix list
-        data["suffixes"] = []
+        # The suffix is similar to the prefix, but empty parts are not skipped
+        # Locants at the end of the name are ignored
+        locants = None
+        for item in suffix.split("-") if suffix!="" else []:
+            if locants is None and _LOCANTS_RE.fullmatch(item):
+                locants = parseLocants(item,errors.InvalidSuffixError)
+                continue
+            end = matchSuffixTrie(_SUFFIX_TRIE,item)
+            if end is None:
+                tokens.append(NameToken("suffix",locants,item,None,None))
+            else:
+                tokens.append(NameToken("suffix",locants,item[:-len(end)],end,None))
+            locants = None
         
-        if suffix=="":
-            return # skip
-        s_suffix = iter(suffix.split("-"))
-        for _i in s_suffix:
-            if _i.strip("1234567890,")=="":
-                # Suffix with explicit positions
-                try:
-                    num_suffix,suffixname = _i,next(s_suffix)
-                except StopIteration:
-                    # May occur if there is an odd number of dashes
-                    #raise errors.InvalidSuffixError("Invalid suffix with an odd number of dashes")
-                    break
-                
-                # TODO: support suffixes without positions
-                #print("Suffix: %s|%s"%(num_suffix,suffixname))
-                #print()
-                #print(num_suffix.split(","))
-                positions = [int(i) for i in num_suffix.split(",")]
-                data["suffixes"].append([positions,suffixname])
+        return tokens
+    
+    def i2s_stage1(self,data):
+        # Stage 1
+        # Split the main name in prefixes, main chain and suffix
+        # Output data:
+        # tokens: list of all NameToken objects, see tokenize()
+        # prefixes: list of the prefix tokens
+        # main_chain_length: int of main chain length
+        # suffixes: list of the suffix tokens
+        data["tokens"] = self.tokenize()
+        data["prefixes"] = []
+        data["suffixes"] = []
+        for token in data["tokens"]:
+            if token.kind=="prefix":
+                data["prefixes"].append(token)
+            elif token.kind=="parent":
+                data["main_chain_length"] = token.value
             else:
-                # Suffix without explicit positions, only multipliers
-                positions = None
-                suffixname = _i
-                data["suffixes"].append([positions,suffixname])
+                data["suffixes"].append(token)
+        tracing.debug(log,"Prefixes: %s main chain: %s suffixes: %s",data["prefixes"],data.get("main_chain_length"),data["suffixes"])
     def i2s_stage2(self,data):
         # Stage 2
         # Parse Prefixes and Suffixes into functional groups
@@ -605,63 +535,68 @@ class IUPACNotation(BaseNotation):
         # Rest of dict is dependent on type
         
         # Convert the prefix to functional groups
-        for positions,prefixname in data["prefixes"]:
-            for end,dat in self.prefixes.items():
-                if prefixname.endswith(end):
-                    if dat["type"]=="notsupported":
-                        raise errors.UnsupportedFeatureError(dat["msg"])
-                    elif dat["type"]=="simple":
-                        # Simple prefix
-                        multprefix = prefixname[:-len(end)] # removes the prefix end from the end
-                        multiplier = parseAlkylMultiplierPrefix(multprefix)
-                        
-                        # Checks if positions were given, if not then generate them
-                        if positions is None:
-                            if multiplier>(data["main_chain_length"]*2+2):
-                                raise errors.InvalidMultiplier("Multiplier %s of %s Group announces %s positions, but only %s available"%(
-                                        multprefix,end,multiplier,data["main_chain_length"],
-                                        ))
-                            #raise errors.UnsupportedFeatureError("Auto-placement of %s-Groups is currently not supported"%end)
-                            positions = []
-                            # positions were not specified, need to be generated
-                            # Alternating from both ends and at opposite ends
-                            # Note that this may not always be chemically correct
-                            # TODO: make the placement smarter
-                            # When the first/last atom are already specified "away" and are full, this algorithm may cause a NotEnoughBindingsError
-                            for i in range(multiplier):
-                                if i%2==0: # left
-                                    positions.append(max(min(int(i/2)+1,data["main_chain_length"]),0))
-                                else: # right
-                                    positions.append(max(min(data["main_chain_length"]-(int(i/2)),data["main_chain_length"]),0))
-                        
-                        # Validates the multiplier
-                        if multiplier!=len(positions):
-                            raise errors.InvalidMultiplier("Multiplier %s announces %s positions, but %s found in %s group %s"%(
-                                    multprefix,multiplier,len(positions),",".join([str(i) for i in positions])+"-"+prefixname,end,
-                                    ))
-                        
-                        # Go through every functional group specified by this suffix
-                        for position in positions:
-                            # Store the result
-                            fg = {
-                                "type":dat["ftype"],
-                                "base":position,
-                            }
-                            data["fgroups"].append(fg)
-                    elif dat["type"]=="custom":
-                        f = dat["func"]
-                        f(positions,prefixname,data)
-                    else:
-                        raise errors.InternalError("Invalid prefix type detected for '%s'"%end)
-                    break
-            else:
+        for token in data["prefixes"]:
+            # The stem is the longest registered prefix the name ends with
+            end = token.stem
+            prefixname = token.head+(end or "")
+            positions = list(token.locants) if token.locants is not None else None
+            if end is None:
                 raise errors.InvalidPrefixError("Prefix '%s' could not be recognized"%prefixname)
+            dat = self.prefixes[end]
+            
+            if dat["type"]=="notsupported":
+                raise errors.UnsupportedFeatureError(dat["msg"])
+            elif dat["type"]=="simple":
+                # Simple prefix
+                multprefix = token.head
+                multiplier = parseAlkylMultiplierPrefix(multprefix)
+                
+                # Checks if positions were given, if not then generate them
+                if positions is None:
+                    if multiplier>(data["main_chain_length"]*2+2):
+                        raise errors.InvalidMultiplier("Multiplier %s of %s Group announces %s positions, but only %s available"%(
+                                multprefix,end,multiplier,data["main_chain_length"],
+                                ))
+                    #raise errors.UnsupportedFeatureError("Auto-placement of %s-Groups is currently not supported"%end)
+                    positions = []
+                    # positions were not specified, need to be generated
+                    # Alternating from both ends and at opposite ends
+                    # Note that this may not always be chemically correct
+                    # TODO: make the placement smarter
+                    # When the first/last atom are already specified "away" and are full, this algorithm may cause a NotEnoughBindingsError
+                    for i in range(multiplier):
+                        if i%2==0: # left
+                            positions.append(max(min(int(i/2)+1,data["main_chain_length"]),0))
+                        else: # right
+                            positions.append(max(min(data["main_chain_length"]-(int(i/2)),data["main_chain_length"]),0))
+                
+                # Validates the multiplier
+                if multiplier!=len(positions):
+                    raise errors.InvalidMultiplier("Multiplier %s announces %s positions, but %s found in %s group %s"%(
+                            multprefix,multiplier,len(positions),",".join([str(i) for i in positions])+"-"+prefixname,end,
+                            ))
+                
+                # Go through every functional group specified by this suffix
+                for position in positions:
+                    # Store the result
+                    fg = {
+                        "type":dat["ftype"],
+                        "base":position,
+                    }
+                    data["fgroups"].append(fg)
+            elif dat["type"]=="custom":
+                f = dat["func"]
+                f(self,positions,prefixname,data)
+            else:
+                raise errors.InternalError("Invalid prefix type detected for '%s'"%end)
         
         # Convert the suffix to functional groups
-        for positions,suffixname in data["suffixes"]:
-            if suffixname.endswith("ol"):
+        for token in data["suffixes"]:
+            suffixname = token.head+(token.stem or "")
+            positions = list(token.locants) if token.locants is not None else None
+            if token.stem=="ol":
                 # TODO: support a larger variety of syntaxes
-                multprefix = suffixname[:-2] # removes the -ol from the end
+                multprefix = token.head
                 multiplier = parseAlkylMultiplierPrefix(multprefix)
                 
                 if positions is None:
@@ -691,11 +626,11 @@ class IUPACNotation(BaseNotation):
                         "base":position,
                         }
                     data["fgroups"].append(fg)
-            elif suffixname.endswith("al"):
+            elif token.stem=="al":
                 raise errors.UnsupportedFeatureError("Aldehydes are currently not supported")
-            elif suffixname.endswith("one"):
+            elif token.stem=="one":
                 raise errors.UnsupportedFeatureError("Ketones are currently not supported")
-            elif suffixname.endswith("amine"):
+            elif token.stem=="amine":
                 raise errors.UnsupportedFeatureError("Amines are currently not supported in suffixes")
             else:
                 if suffixname=="":
@@ -706,7 +641,7 @@ class IUPACNotation(BaseNotation):
         # Create the functional groups, but leave them disconnected from the main chain
         
         #  First stage that needs the structural formula object
-        data["struct"] = structural.StructuralNotation()
+        data["struct"] = structural.StructuralNotation(data.get("implicit_hydrogen",False))
         
         # Iterate through all functional groups and call the appropriate constructor
         # The constructors do not return anything, but they will modify the fg dict and add the bondinfo key
@@ -714,7 +649,7 @@ class IUPACNotation(BaseNotation):
             if fg["type"] in self.fgroups:
                 f = self.fgroups[fg["type"]]
                 # TODO: add exception catching to functional group creation
-                f(fg,data)
+                f(self,fg,data)
             else:
                 raise errors.UnsupportedGroupError("Functional groups of type '%s' cannot be converted to structures yet"%fg["type"])
     def i2s_stage4(self,data):
@@ -724,13 +659,11 @@ class IUPACNotation(BaseNotation):
         # Add carbons to struct
         carbons = []
         for i in range(data["main_chain_length"]):
-            carbons.append(data["struct"].addCarbon(name="C%s"%(i+1)))
+            carbons.append(data["struct"].addCarbon(name=data["struct"].makeLabel("C%s",i+1)))
         
         # Connect them together, from left to right
-        for c in carbons:
-            if carbons.index(c)==0:
-                continue
-            c.bindToAtom(carbons[carbons.index(c)-1])
+        for prev,c in zip(carbons,carbons[1:]):
+            c.bindToAtom(prev)
         
         data["carbons"]=carbons
     def i2s_stage5(self,data):
@@ -755,7 +688,7 @@ class IUPACNotation(BaseNotation):
             raise errors.UnsupportedFeatureError("Alkyl groups cannot yet be automatically placed")
         if multiplier!=len(positions):
             raise errors.InvalidMultiplier("Multiplier %s announces %s positions, but %s found in alkyl group %s"%(
-                    multprefix,multiplier,len(positions),",".join(positions)+"-"+prefixname+"yl"
+                    multprefix,multiplier,len(positions),",".join(map(str,positions))+"-"+prefixname+"yl"
                     ))
         
         # Go through every functional group specified by this prefix
@@ -778,10 +711,10 @@ class IUPACNotation(BaseNotation):
         prev = None
         first = None
         for i in range(fg["alkyl_length"]):
-            name = "C %s-%s #%s"%(fg["base"],fg["alkyl_name"],i+1)
+            name = data["struct"].makeLabel("C %s-%s #%s",fg["base"],fg["alkyl_name"],i+1)
             c = data["struct"].addCarbon(name=name)
             if prev is not None:
-                c.bindToAtom(prev,sdata={"reason":"%s Group generated from IUPAC Name"%fg["alkyl_name"]})
+                c.bindToAtom(prev,sdata=data["struct"].makeBondData("%s Group generated from IUPAC Name",fg["alkyl_name"]))
             else:
                 first = c
             prev = c
@@ -790,134 +723,163 @@ class IUPACNotation(BaseNotation):
         base = fg["base"]
         conn = first
         n = 1
-        bdata = {"reason":"%s Group generated from IUPAC Name "%fg["alkyl_name"]}
+        bdata = data["struct"].makeBondData("%s Group generated from IUPAC Name",fg["alkyl_name"])
         cdata = bdata
         fg["bondinfo"] = base,conn,n,bdata,cdata
     def fg_hydroxyl(self,fg,data):
         # Creates an hydroxyl group, but does not yet connect it with the main chain
         # Create oxygen
-        o = data["struct"].addOxygen(name="O@%s"%fg["base"])
+        o = data["struct"].addOxygen(name=data["struct"].makeLabel("O@%s",fg["base"]))
         # Create Hydrogen
-        h = data["struct"].addHydrogen(name="H@%s"%fg["base"])
-        o.bindToAtom(h,sdata={"reason":"Hydroxyl Group generated from IUPAC Name"})
+        data["struct"].addHydrogenTo(o,name=data["struct"].makeLabel("H@%s",fg["base"]),sdata=data["struct"].makeBondData("Hydroxyl Group generated from IUPAC Name"))
         
         # Create bondinfo
         base = fg["base"]
         conn = o
         n = 1
-        bdata = {"reason":"Hydroxyl Group generated from IUPAC Name"}
+        bdata = data["struct"].makeBondData("Hydroxyl Group generated from IUPAC Name")
         cdata = bdata
         fg["bondinfo"] = base,conn,n,bdata,cdata
     def fg_amino(self,fg,data):
         # Creates an amino group, but does not yet connect it with the main chain
         
         # Create Nitrogen
-        n = data["struct"].addNitrogen(name="N@%s"%fg["base"])
+        n = data["struct"].addNitrogen(name=data["struct"].makeLabel("N@%s",fg["base"]))
         
         # Create Hydrogen 1
-        h1 = data["struct"].addHydrogen(name="H1@%s"%fg["base"])
-        n.bindToAtom(h1,sdata={"reason":"Amino Group generated from IUPAC Name"})
+        data["struct"].addHydrogenTo(n,name=data["struct"].makeLabel("H1@%s",fg["base"]),sdata=data["struct"].makeBondData("Amino Group generated from IUPAC Name"))
         
         # Create Hydrogen 2
-        h2 = data["struct"].addHydrogen(name="H2@%s"%fg["base"])
-        n.bindToAtom(h2,sdata={"reason":"Amino Group generated from IUPAC Name"})
+        data["struct"].addHydrogenTo(n,name=data["struct"].makeLabel("H2@%s",fg["base"]),sdata=data["struct"].makeBondData("Amino Group generated from IUPAC Name"))
         
         # Create bondinfo
         base = fg["base"]
         conn = n
         n = 1
-        bdata = {"reason":"Amino Group generated from IUPAC Name"}
+        bdata = data["struct"].makeBondData("Amino Group generated from IUPAC Name")
         cdata = bdata
         fg["bondinfo"] = base,conn,n,bdata,cdata
     def fg_hydroxyamino(self,fg,data):
         # Creates an hydroxyamino group, but does not yet connect it with the main chain
         
         # Create Nitrogen
-        n = data["struct"].addNitrogen(name="N@%s"%fg["base"])
+        n = data["struct"].addNitrogen(name=data["struct"].makeLabel("N@%s",fg["base"]))
         
         # Create Oxygen
-        o = data["struct"].addOxygen(name="O@%s"%fg["base"])
-        n.bindToAtom(o,sdata={"reason":"Hydroxyamino Group generated from IUPAC Name"})
+        o = data["struct"].addOxygen(name=data["struct"].makeLabel("O@%s",fg["base"]))
+        n.bindToAtom(o,sdata=data["struct"].makeBondData("Hydroxyamino Group generated from IUPAC Name"))
         
         # Create Hydrogen 1 - connected with Oxygen
-        h1 = data["struct"].addHydrogen(name="H1@%s"%fg["base"])
-        o.bindToAtom(h1,sdata={"reason":"Hydroxyamino Group generated from IUPAC Name"})
+        data["struct"].addHydrogenTo(o,name=data["struct"].makeLabel("H1@%s",fg["base"]),sdata=data["struct"].makeBondData("Hydroxyamino Group generated from IUPAC Name"))
         
         # Create Hydrogen 2 - connected directly with Nitrogen
-        h2 = data["struct"].addHydrogen(name="H2@%s"%fg["base"])
-        n.bindToAtom(h2,sdata={"reason":"Hydroxyamino Group generated from IUPAC Name"})
+        data["struct"].addHydrogenTo(n,name=data["struct"].makeLabel("H2@%s",fg["base"]),sdata=data["struct"].makeBondData("Hydroxyamino Group generated from IUPAC Name"))
         
         # Create bondinfo
         base = fg["base"]
         conn = n
         n = 1
-        bdata = {"reason":"Hydroxyamino Group generated from IUPAC Name"}
+        bdata = data["struct"].makeBondData("Hydroxyamino Group generated from IUPAC Name")
         cdata = bdata
         fg["bondinfo"] = base,conn,n,bdata,cdata
     def fg_fluoro(self,fg,data):
         # Creates a fluoro group, but does not yet connect it with the main chain
         # Create Fluorine
-        f = data["struct"].addFluorine(name="F@%s"%fg["base"])
+        f = data["struct"].addFluorine(name=data["struct"].makeLabel("F@%s",fg["base"]))
         
         # Create bondinfo
         base = fg["base"]
         conn = f
         n = 1
-        bdata = {"reason":"Fluoro Group generated from IUPAC Name"}
+        bdata = data["struct"].makeBondData("Fluoro Group generated from IUPAC Name")
         cdata = bdata
         fg["bondinfo"] = base,conn,n,bdata,cdata
     def fg_chloro(self,fg,data):
         # Creates a chloro group, but does not yet connect it with the main chain
         # Create Chlorine
-        c = data["struct"].addChlorine(name="Cl@%s"%fg["base"])
+        c = data["struct"].addChlorine(name=data["struct"].makeLabel("Cl@%s",fg["base"]))
         
         # Create bondinfo
         base = fg["base"]
         conn = c
         n = 1
-        bdata = {"reason":"Chloro Group generated from IUPAC Name"}
+        bdata = data["struct"].makeBondData("Chloro Group generated from IUPAC Name")
         cdata = bdata
         fg["bondinfo"] = base,conn,n,bdata,cdata
     def fg_bromo(self,fg,data):
         # Creates a bromo group, but does not yet connect it with the main chain
         # Create Bromine
-        b = data["struct"].addBromine(name="Br@%s"%fg["base"])
+        b = data["struct"].addBromine(name=data["struct"].makeLabel("Br@%s",fg["base"]))
         
         # Create bondinfo
         base = fg["base"]
         conn = b
         n = 1
-        bdata = {"reason":"Bromo Group generated from IUPAC Name"}
+        bdata = data["struct"].makeBondData("Bromo Group generated from IUPAC Name")
         cdata = bdata
         fg["bondinfo"] = base,conn,n,bdata,cdata
     def fg_iodo(self,fg,data):
         # Creates a iodo group, but does not yet connect it with the main chain
         # Create Iodine
-        i = data["struct"].addIodine(name="I@%s"%fg["base"])
+        i = data["struct"].addIodine(name=data["struct"].makeLabel("I@%s",fg["base"]))
         
         # Create bondinfo
         base = fg["base"]
         conn = i
         n = 1
-        bdata = {"reason":"Iodo Group generated from IUPAC Name"}
+        bdata = data["struct"].makeBondData("Iodo Group generated from IUPAC Name")
         cdata = bdata
         fg["bondinfo"] = base,conn,n,bdata,cdata
     
     # Save to String Methods
-    def dumpAsSMILES(self):
-        return self.asStructuralFormula().dumpAsSMILES()
+    def dumpAsSMILES(self,cache=None):
+        if conversion_cache.useCache(cache):
+            return conversion_cache.lookup(self.getCacheKey(target="smiles"),lambda:self.dumpAsSMILES(False))
+        
+        with self.asStructuralFormula(cache=cache) as struct:
+            return struct.dumpAsSMILES()
     
     def dumpAsInChI(self):
-        return self.asStructuralFormula().dumpAsInChI()
+        with self.asStructuralFormula() as struct:
+            return struct.dumpAsInChI()
     
     # Load from String Methods
     @classmethod
-    def loadsFromSMILES(cls,data):
-        return structural.StructuralNotation.loadsFromSMILES(data).asIUPACName()
+    def loadsFromSMILES(cls,data,cache=None):
+        if conversion_cache.useCache(cache):
+            return cls(conversion_cache.lookup(structural.StructuralNotation.getSMILESCacheKey(data,target="iupac"),lambda:cls.loadsFromSMILES(data,False).name))
+        
+        with structural.StructuralNotation.loadsFromSMILES(data,cache=cache) as struct:
+            return struct.asIUPACName()
     
     @classmethod
     def loadsFromInChI(cls,data):
-        return structural.StructuralNotation.loadsFromInChI(data).asIUPACName()
+        with structural.StructuralNotation.loadsFromInChI(data) as struct:
+            return struct.asIUPACName()
+    
+    # Comparison Methods
+    def canonicalKey(self):
+        # Returns the canonical key of the named molecule, see StructuralNotation.canonicalKey()
+        # The key is cached until the name is changed
+        key = self._getKey()
+        if key.__class__ is tuple:
+            # The conversion failed, converting again raises the error
+            with self.asStructuralFormula(True) as struct:
+                return struct.canonicalKey()
+        return key
+    def _getKey(self):
+        # Returns the canonical key, or ("name",name) if the name cannot be converted
+        # Names that cannot be converted thus only equal identically spelled names
+        cached = self._key
+        if cached is not None and cached[0]==self.name:
+            return cached[1]
+        try:
+            with self.asStructuralFormula(True) as struct:
+                key = struct.canonicalKey()
+        except errors.ChemError:
+            key = "name",self.name
+        self._key = self.name,key
+        return key
     
     # Magic Methods
     def __repr__(self):
@@ -925,17 +887,68 @@ class IUPACNotation(BaseNotation):
     def __str__(self):
         return self.name
     
+    # Names are equal if they are spelled the same or describe the same molecule
+    # Names are unhashable, since changing the name would change their hash
     def __eq__(self,other):
-        return self.__class__==other.__class__ and \
-               self.name==other.name
+        if self.__class__!=other.__class__:
+            return False
+        elif self.name==other.name:
+            return True
+        return self._getKey()==other._getKey()
+    def __ne__(self,other):
+        return not self==other
+    __hash__ = None
 
-def getNumericalPrefix(n):
-    # Returns the numerical prefix associated with the given number
+# Default functional groups
+IUPACNotation.registerFunctionalGroup("alkyl",IUPACNotation.fg_alkyl)
+IUPACNotation.registerFunctionalGroup("hydroxyl",IUPACNotation.fg_hydroxyl)
+IUPACNotation.registerFunctionalGroup("amino",IUPACNotation.fg_amino)
+IUPACNotation.registerFunctionalGroup("hydroxyamino",IUPACNotation.fg_hydroxyamino)
+IUPACNotation.registerFunctionalGroup("fluoro",IUPACNotation.fg_fluoro)
+IUPACNotation.registerFunctionalGroup("chloro",IUPACNotation.fg_chloro)
+IUPACNotation.registerFunctionalGroup("bromo",IUPACNotation.fg_bromo)
+IUPACNotation.registerFunctionalGroup("iodo",IUPACNotation.fg_iodo)
+
+# Default prefixes
+# Hydroxyl Groups
+IUPACNotation.registerPrefix("hydroxy","simple",ftype="hydroxyl")
+# Aldehydes
+IUPACNotation.registerPrefix("formyl","notsupported",msg="Aldehydes are currently not supported")
+# Ketones
+IUPACNotation.registerPrefix("oxo","notsupported",msg="Ketones are currently not supported")
+# Carboxylic Acids
+IUPACNotation.registerPrefix("carboxy","notsupported",msg="Carboxylic Acids are currently not supported")
+# Nitro Groups
+IUPACNotation.registerPrefix("nitro","notsupported",msg="Nitro groups are currently not supported")
+# Nitroso Groups
+IUPACNotation.registerPrefix("nitroso","notsupported",msg="Nitroso groups are currently not supported")
+# Hydroxyamino Group
+# Based on rule C-841.3
+IUPACNotation.registerPrefix("hydroxyamino","simple",ftype="hydroxyamino")
+# Amino Group
+# Based on rule C-811.3
+IUPACNotation.registerPrefix("amino","simple",ftype="amino")
+# Halogen Groups
+# Based on rule C-102.1
+IUPACNotation.registerPrefix("fluoro","simple",ftype="fluoro")
+IUPACNotation.registerPrefix("chloro","simple",ftype="chloro")
+IUPACNotation.registerPrefix("bromo","simple",ftype="bromo")
+IUPACNotation.registerPrefix("iodo","simple",ftype="iodo")
+# Alkyl Group
+IUPACNotation.registerPrefix("yl","custom",func=IUPACNotation.pr_alkyl)
+
+def buildNumericalPrefix(n):
+    # Builds the numerical prefix associated with the given number from the digit tables
     # Note that this function was designed for use with alkane, this may influence some prefixes, e.g. 1=meth etc.
+    # Use getNumericalPrefix() instead, it looks up the precomputed prefix
     
     if n in SPECIAL_PREFIXES:
         return SPECIAL_PREFIXES[n]
-    elif n<10:
+    return _buildDigitPrefix(n)
+
+def _buildDigitPrefix(n):
+    # Builds the prefix of n purely from the digit tables, ignoring SPECIAL_PREFIXES
+    if n<10:
         # Single digit
         prefix = BASE_PREFIXES_1[n]#.rstrip("a")
         return prefix
@@ -944,13 +957,13 @@ def getNumericalPrefix(n):
         
         # last digit
         # multiplier 1, ones
-        digit1 = int(str(n)[-1])
+        digit1 = n%10
         pre1 = BASE_PREFIXES_1[digit1]
         out+=pre1
         
         # 2nd digit from the right
         # multiplier 10, tens
-        digit2 = int(str(n)[-2])
+        digit2 = n//10%10
         pre2 = BASE_PREFIXES_10[digit2]
         if digit2==2 and len(out)>0 and out[-1] in ["a","e","i","o","y"]: # ends with a vowel
             pre2 = pre2.lstrip("i")
@@ -959,14 +972,14 @@ def getNumericalPrefix(n):
         # 3rd digit from the right
         # multiplier 100, hundreds
         if n>=100:
-            digit3 = int(str(n)[-3])
+            digit3 = n//100%10
             pre3 = BASE_PREFIXES_100[digit3]
             out+=pre3
         
         # 4th digit from the right
         # multiplier 1000, thousands
         if n>=1000:
-            digit4 = int(str(n)[-4])
+            digit4 = n//1000%10
             pre4 = BASE_PREFIXES_1000[digit4]
             out+=pre4
         
@@ -974,63 +987,93 @@ def getNumericalPrefix(n):
     else:
         raise NotImplementedError("Numerical Prefixes for numbers higher than 9999 are not implemented")
 
+# Highest number with a precomputed prefix
+MAX_NUMERICAL_PREFIX = 9999
+
+# Precomputed prefixes, indexed by number
+# NUMERICAL_PREFIXES[0] is the empty string
+NUMERICAL_PREFIXES = tuple(buildNumericalPrefix(n) for n in range(MAX_NUMERICAL_PREFIX+1))
+ALKANE_PREFIXES = tuple(
+    SPECIAL_ALKANE_PREFIXES[n] if n in SPECIAL_ALKANE_PREFIXES else prefix.rstrip("a")
+    for n,prefix in enumerate(NUMERICAL_PREFIXES)
+    )
+
+# Reverse table of prefix:number
+# Also contains the regular spelling of numbers with a special prefix, e.g. hen for 1 or hendeca for 11
+NUMERICAL_PREFIXES_INV = {_buildDigitPrefix(n):n for n in range(1,MAX_NUMERICAL_PREFIX+1)}
+NUMERICAL_PREFIXES_INV.update(SPECIAL_PREFIXES.inv)
+MAX_NUMERICAL_PREFIX_LENGTH = max(map(len,NUMERICAL_PREFIXES_INV))
+
+def matchLongestSuffix(s,table,maxlen):
+    # Returns the value and length of the longest suffix of s contained in table
+    # If no suffix matches, None,0 is returned
+    for i in range(max(0,len(s)-maxlen),len(s)):
+        if s[i:] in table:
+            return table[s[i:]],len(s)-i
+    return None,0
+
+def buildSuffixTrie(keys):
+    # Builds a trie of the given strings, read from right to left
+    # Each node is a dict of character:node, the key ending at a node is stored under None
+    trie = {}
+    for key in keys:
+        node = trie
+        for c in reversed(key):
+            node = node.setdefault(c,{})
+        node[None]=key
+    return trie
+
+def matchSuffixTrie(trie,s):
+    # Returns the longest key of the trie that s ends with, or None if there is none
+    # Takes at most one step per character of the matched key
+    node = trie
+    match = None
+    for i in range(len(s)-1,-1,-1):
+        node = node.get(s[i])
+        if node is None:
+            break
+        match = node.get(None,match)
+    return match
+
+_SUFFIX_TRIE = buildSuffixTrie(SUFFIXES)
+
+def parseLocants(s,exc=errors.InvalidPrefixError):
+    # Parses a comma-separated list of locants into a tuple of ints
+    out = []
+    for n in s.split(","):
+        try:
+            out.append(int(n))
+        except ValueError:
+            raise exc("Invalid locant '%s', must be an integer"%n)
+    return tuple(out)
+
+def getNumericalPrefix(n):
+    # Returns the numerical prefix associated with the given number
+    # Note that this function was designed for use with alkane, this may influence some prefixes, e.g. 1=meth etc.
+    if 0<=n<=MAX_NUMERICAL_PREFIX:
+        return NUMERICAL_PREFIXES[n]
+    return buildNumericalPrefix(n)
+
 def parseNumericalPrefix(s_in,return_leftover=False):
     s_in = s_in.lower()
-    if not return_leftover:
-        if s_in in SPECIAL_PREFIXES.inv:
-            return SPECIAL_PREFIXES.inv[s_in]
-    elif return_leftover:
-        for n,prefix in SPECIAL_PREFIXES.items():
-            if s_in.endswith(prefix) and prefix!="":
-                s_in = s_in[:-len(prefix)]
-                return n,s_in
-    
     if s_in=="":
         raise errors.InvalidPrefixError("Prefix cannot be an empty string")
     
-    n = 0
-    
-    # Thousands
-    if s_in.endswith("lia"): # suffix for thousands
-        for val,prefix in BASE_PREFIXES_1000.items():
-            if s_in.endswith(prefix) and prefix!="":
-                n+=val*1000
-                s_in = s_in[:-len(prefix)] # cuts off the thousands
-    
-    # Hundreds
-    if s_in.endswith("cta"):
-        for val,prefix in BASE_PREFIXES_100.items():
-            if s_in.endswith(prefix) and prefix!="":
-                n+=val*100
-                s_in = s_in[:-len(prefix)] # cuts off the hundreds
-    
-    # Tens
-    if s_in.endswith("aconta") or s_in.endswith("deca") or s_in.endswith("icosa"):
-        for val,prefix in BASE_PREFIXES_10.items():
-            if s_in.endswith(prefix) and prefix!="":
-                n+=val*10
-                s_in = s_in[:-len(prefix)] # cuts off the tens
-    if s_in.endswith("cosa"):
-        n+=20
-        s_in = s_in[:-4]
-    if s_in.endswith("tr"): # fix for tricosa
-        s_in+="i"
-    
-    # Ones
-    for val,prefix in BASE_PREFIXES_1.items():
-        if s_in.endswith(prefix) and prefix!="":
-            n+=val
-            s_in = s_in[:-len(prefix)] # cuts off the ones
-    
-    if not return_leftover and s_in!="":
-        raise errors.InvalidPrefixError("Prefix could not be fully parsed, %s remained"%s_in)
-    
     if not return_leftover:
-        return n
-    elif return_leftover:
-        return n,s_in
+        if s_in in NUMERICAL_PREFIXES_INV:
+            return NUMERICAL_PREFIXES_INV[s_in]
+        # Cut off the longest known prefix to report the remainder
+        n,length = matchLongestSuffix(s_in,NUMERICAL_PREFIXES_INV,MAX_NUMERICAL_PREFIX_LENGTH)
+        raise errors.InvalidPrefixError("Prefix could not be fully parsed, %s remained"%s_in[:len(s_in)-length])
+    
+    n,length = matchLongestSuffix(s_in,NUMERICAL_PREFIXES_INV,MAX_NUMERICAL_PREFIX_LENGTH)
+    if n is None:
+        return 0,s_in
+    return n,s_in[:len(s_in)-length]
 
 def getAlkanePrefix(n):
+    if 0<=n<=MAX_NUMERICAL_PREFIX:
+        return ALKANE_PREFIXES[n]
     if n in SPECIAL_ALKANE_PREFIXES:
         return SPECIAL_ALKANE_PREFIXES[n]
     return getNumericalPrefix(n).rstrip("a")
@@ -1051,8 +1094,11 @@ def getAlkylMultiplierPrefix(n,n2=0):
     if n==1:
         return ""
     out = getNumericalPrefix(n)
-    if n2 != 0:
-        if parseAlkanePrefix(out+getAlkanePrefix(n2),True)[0]!=n2:
+    if n2!=0 and n2 not in SPECIAL_ALKANE_PREFIXES:
+        # The special alkane prefixes cannot be extended, all others are the numerical prefix without the last a
+        # Checks whether the end of the multiplier and the alkane prefix together form a longer numerical prefix
+        prefix = getAlkanePrefix(n2)+"a"
+        if NUMERICAL_PREFIXES_INV.get(prefix)!=n2 or any(out[i:]+prefix in NUMERICAL_PREFIXES_INV for i in range(len(out))):
             # Happens e.g. with n=3 and n2=10
             # tri- and dec- may not be able to be distinguished, so -kis is added to the end
             # Exceptions apply for bis/tris
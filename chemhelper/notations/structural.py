@@ -24,77 +24,299 @@
 
 import sys
 import time
+import types
+import itertools
+import collections.abc
 
-from collections import defaultdict
+from collections import defaultdict, deque
 from functools import reduce
 
 from . import BaseNotation
 from . import iupac
 from .. import errors
 from .. import elements
-from ..elements import Atom, Carbon, Hydrogen, Oxygen, Nitrogen, Sulfur, Phosphorus, Fluorine, Chlorine, Bromine, Iodine, Boron
+from .. import canonical
+from .. import cache as conversion_cache
+from .. import instrumentation
+from .. import tracing
+from ..elements import EMPTY_BOND_DATA, LazyLabel, Atom, Carbon, Hydrogen, Oxygen, Nitrogen, Sulfur, Phosphorus, Fluorine, Chlorine, Bromine, Iodine, Boron
 
 iupac.structural = sys.modules["chemhelper.notations.structural"] # to avoid circular dependency
 
+log = tracing.getLogger("structural")
+
+# Set of all element symbols that may appear within brackets in SMILES
+SMILES_ELEMENTS = frozenset(elements.ALL_ELEMENTS)
+
+# SMILES of all groups except alkyl groups, used by dumpAsSMILES()
+GROUP_SMILES = {
+    "hydroxyl":"O",
+    "amino":"N",
+    "hydroxyamino":"NO",
+    "fluoro":"F",
+    "chloro":"Cl",
+    "bromo":"Br",
+    "iodo":"I",
+    }
+
+# Outputs supported by StructuralNotation.convert()
+CONVERT_OUTPUTS = ("iupac","smiles","formula","canonical")
+
+BOND_METADATA_MODES = ("full","interned","lazy","off")
+
+# Number of stages of asIUPACName()
+S2I_STAGES = 9
+
+def isFlipped(groups,length):
+    # Returns True if numbering the backbone of the given length from the other end gives lower locants
+    # groups is a list of [base_n,type,data], like StructureAnalysis.groups
+    # TODO: implement properly using rule 2.4
+    max_n = length+1 # needed for an off-by-one bug
+    unflip_sum = sum([group[0] for group in groups])
+    flip_sum = sum([max_n-group[0] for group in groups])
+    if unflip_sum!=flip_sum:
+        return flip_sum<unflip_sum
+    
+    # If both are equal, the principal group, which is always the hydroxyl group, gets the lowest locants
+    # Then the locants of all groups are compared at the first point of difference
+    unflipped = sorted(n for n,grouptype,extradata in groups if grouptype=="hydroxyl")
+    flipped = sorted(max_n-n for n,grouptype,extradata in groups if grouptype=="hydroxyl")
+    if unflipped!=flipped:
+        return flipped<unflipped
+    return sorted(max_n-group[0] for group in groups)<sorted(group[0] for group in groups)
+
+class StructureAnalysis(object):
+    # Result of StructuralNotation.analyze()
+    # backbone: list of the backbone carbons, in order
+    # backbone_set: frozenset of the backbone carbons, for fast membership checks
+    # groups: list of [base_n,type,data] of all groups attached to the backbone, see StructuralNotation.findGroups()
+    def __init__(self,backbone,backbone_set,groups):
+        self.backbone = backbone
+        self.backbone_set = backbone_set
+        self.groups = groups
+    
+    def isFlipped(self):
+        # Returns True if numbering from the other end gives lower locants, see isFlipped()
+        return isFlipped(self.groups,len(self.backbone))
+    
+    def getGroups(self):
+        # Returns the groups with the locants that are used for naming
+        if not self.isFlipped():
+            return list(self.groups)
+        max_n = len(self.backbone)+1
+        return [[max_n-n,grouptype,extradata] for n,grouptype,extradata in self.groups]
+
+class AtomSet(collections.abc.MutableSet):
+    # Set of atoms that iterates in insertion order, used for StructuralNotation.atoms
+    # Traversals that start at or go through all atoms therefore visit them in the same order on every run
+    __slots__ = ("_atoms",)
+    
+    def __init__(self,atoms=()):
+        self._atoms = dict.fromkeys(atoms) # map of Atom:None, dicts keep insertion order
+    
+    def add(self,atom):
+        self._atoms[atom]=None
+    def discard(self,atom):
+        self._atoms.pop(atom,None)
+    
+    def __contains__(self,atom):
+        return atom in self._atoms
+    def __iter__(self):
+        return iter(self._atoms)
+    def __len__(self):
+        return len(self._atoms)
+    def __sizeof__(self):
+        return object.__sizeof__(self)+sys.getsizeof(self._atoms)
+    def __repr__(self):
+        return "%s(%r)"%(self.__class__.__name__,list(self._atoms))
+
 class StructuralNotation(BaseNotation):
-    def __init__(self):
-        self.atoms = set()
+    # If True, getCarbonBackbone() uses the old DAG-based longest path search instead of the tree diameter
+    # Can be set per instance or on the class, useful to compare the outputs of both algorithms
+    legacy_backbone = False
+    
+    # Controls the names and bond data created by the parsers, see makeLabel() and makeBondData()
+    # full: every atom gets a formatted name and every bond its own data dict
+    # interned: names are interned and equal bond data dicts are shared read-only dicts within each structure
+    # lazy: like interned, but names are only formatted when they are first read
+    # off: no names and bond data are created
+    # Can be set per instance, on the class or with the constructor
+    # Cached conversions keep the names and bond data of the mode they were created with
+    bond_metadata = "full"
+    
+    def __init__(self,implicit_hydrogen=False,bond_metadata=None):
+        self.atoms = AtomSet()
+        # Id of the next atom added, see Atom.id
+        self.next_id = 0
+        
+        # Counters kept up to date by addAtom(), removeAtom() and atomChanged()
+        # Map of element symbol:number of atoms, without implicit hydrogen
+        self.atom_counts = {}
+        # Sum of the implicit hydrogen of all atoms
+        self.implicit_hydrogen_count = 0
+        # Map of atom:"<" or ">" for all atoms with too few or too many bindings
+        self.invalid_atoms = {}
+        
+        # In implicit hydrogen mode, fillWithHydrogen() only stores the number of hydrogen atoms on each atom
+        # instead of creating Hydrogen objects for them
+        self.implicit_hydrogen = implicit_hydrogen
+        
+        # Map of (fmt,args):bond data shared by the bonds of this structure, created on first use by makeBondData()
+        self.shared_bond_data = None
+        
+        if bond_metadata is not None:
+            if bond_metadata not in BOND_METADATA_MODES:
+                raise ValueError("Invalid bond metadata mode '%s'"%bond_metadata)
+            self.bond_metadata = bond_metadata
+    
+    def makeLabel(self,fmt,*args):
+        # Returns the name fmt%args for a new atom, depending on bond_metadata
+        mode = self.bond_metadata
+        if mode=="full":
+            return fmt%args
+        elif mode=="lazy":
+            return LazyLabel(fmt,args)
+        elif mode=="interned":
+            return sys.intern(fmt%args)
+        return ""
+    def makeBondData(self,fmt,*args):
+        # Returns the bond data {"reason":fmt%args} for a new bond, depending on bond_metadata
+        # Except in full mode, equal bond data is shared between all bonds of the structure and cannot be modified
+        # The shared data is freed together with the structure, so it does not grow over many conversions
+        mode = self.bond_metadata
+        if mode=="full":
+            return {"reason":fmt%args}
+        elif mode=="off":
+            return EMPTY_BOND_DATA
+        if self.shared_bond_data is None:
+            self.shared_bond_data = {}
+        key = fmt,args
+        data = self.shared_bond_data.get(key)
+        if data is None:
+            data = self.shared_bond_data[key] = types.MappingProxyType({"reason":fmt%args})
+        return data
     
     # Structure Modification Methods
     def addAtom(self,atom):
+        if atom in self.atoms:
+            return
+        atom.id = self.next_id
+        self.next_id+=1
         self.atoms.add(atom)
+        self.atom_counts[atom.symbol]=self.atom_counts.get(atom.symbol,0)+1
+        self.implicit_hydrogen_count+=atom.implicit_hydrogen
+        self._updateValence(atom)
+    def removeAtom(self,atom):
+        # Removes the atom without unbinding it, use atom.erase() to remove it completely
+        if atom not in self.atoms:
+            return
+        self.atoms.discard(atom)
+        self.atom_counts[atom.symbol]-=1
+        if self.atom_counts[atom.symbol]==0:
+            del self.atom_counts[atom.symbol]
+        self.implicit_hydrogen_count-=atom.implicit_hydrogen
+        self.invalid_atoms.pop(atom,None)
+    def atomChanged(self,atom,implicit_delta=0):
+        # Called by atoms whenever their bindings or implicit hydrogen change
+        if atom not in self.atoms:
+            return
+        self.implicit_hydrogen_count+=implicit_delta
+        self._updateValence(atom)
+    def _updateValence(self,atom):
+        totbinds = atom.num_bindings+atom.implicit_hydrogen
+        if totbinds>atom.max_bindings:
+            # TODO: add support for ions
+            self.invalid_atoms[atom]=">"
+        elif totbinds<atom.max_bindings:
+            self.invalid_atoms[atom]="<"
+        else:
+            self.invalid_atoms.pop(atom,None)
+    
+    def release(self):
+        # Removes all atoms and unbinds them from each other, leaving an empty structure
+        # Atoms and their structure reference each other, so a molecule is normally only freed by the cyclic garbage
+        # collector, calling release() once the structure is no longer needed frees it by reference counting instead
+        # Atoms that are still referenced elsewhere have no bindings and no structure afterwards
+        atoms = self.atoms
+        self.atoms = AtomSet()
+        self.next_id = 0
+        self.atom_counts = {}
+        self.implicit_hydrogen_count = 0
+        self.invalid_atoms = {}
+        self.shared_bond_data = None
+        for atom in atoms:
+            atom.structure = None
+            atom.bindings.clear()
+            atom.bonddata.clear()
+            atom.num_bindings = 0
+    
+    # Structures are released when used as a context manager, for structures that are only needed temporarily
+    def __enter__(self):
+        return self
+    def __exit__(self,exc_type,exc_value,traceback):
+        self.release()
     
     def addCarbon(self,pos=None,name=""):
         a = Carbon(self,pos,name)
-        self.atoms.add(a)
+        self.addAtom(a)
         return a
     def addHydrogen(self,pos=None,name=""):
         a = Hydrogen(self,pos,name)
-        self.atoms.add(a)
+        self.addAtom(a)
         return a
     def addOxygen(self,pos=None,name=""):
         a = Oxygen(self,pos,name)
-        self.atoms.add(a)
+        self.addAtom(a)
         return a
     def addNitrogen(self,pos=None,name=""):
         a = Nitrogen(self,pos,name)
-        self.atoms.add(a)
+        self.addAtom(a)
         return a
     def addSulfur(self,pos=None,name=""):
         a = Sulfur(self,pos,name)
-        self.atoms.add(a)
+        self.addAtom(a)
         return a
     def addPhosphorus(self,pos=None,name=""):
         a = Phosphorus(self,pos,name)
-        self.atoms.add(a)
+        self.addAtom(a)
         return a
     def addFluorine(self,pos=None,name=""):
         a = Fluorine(self,pos,name)
-        self.atoms.add(a)
+        self.addAtom(a)
         return a
     def addChlorine(self,pos=None,name=""):
         a = Chlorine(self,pos,name)
-        self.atoms.add(a)
+        self.addAtom(a)
         return a
     def addBromine(self,pos=None,name=""):
         a = Bromine(self,pos,name)
-        self.atoms.add(a)
+        self.addAtom(a)
         return a
     def addIodine(self,pos=None,name=""):
         a = Iodine(self,pos,name)
-        self.atoms.add(a)
+        self.addAtom(a)
         return a
     def addBoron(self,pos=None,name=""):
         a = Boron(self,pos,name)
-        self.atoms.add(a)
+        self.addAtom(a)
         return a
     
+    def addHydrogenTo(self,atom,name="",sdata=None):
+        # Adds a single hydrogen to the given atom
+        # In implicit hydrogen mode, only the count is increased and name and sdata are ignored
+        if self.implicit_hydrogen:
+            if atom.num_bindings+atom.implicit_hydrogen+1>atom.max_bindings:
+                raise errors.NotEnoughBindingsError("Not enough bindings available to bind from this atom")
+            atom.implicit_hydrogen+=1
+            return None
+        h = self.addHydrogen(name=name)
+        atom.bindToAtom(h,sdata=sdata)
+        return h
+    
     def countAtoms(self):
-        count = {}
-        for atom in self.atoms:
-            if atom.symbol not in count:
-                count[atom.symbol]=0
-            count[atom.symbol]+=1
+        count = dict(self.atom_counts)
+        if self.implicit_hydrogen_count>0:
+            count["H"]=count.get("H",0)+self.implicit_hydrogen_count
         return count
     
     def getSumFormula(self,element_str="{element}<sub>{count}</sub>",atomOrder=None):
@@ -158,37 +380,47 @@ class StructuralNotation(BaseNotation):
         return sum_formula
     
     def fillWithHydrogen(self):
-        for atom in set(self.atoms):
+        # Copied since new hydrogen atoms are added while iterating, they get ids in the order of their parents
+        for atom in list(self.atoms):
             atom.fillWithHydrogen()
+    def makeHydrogenExplicit(self):
+        # Creates Hydrogen atoms for all implicit hydrogen
+        # Note that this does not leave implicit hydrogen mode, fillWithHydrogen() will still only count them
+        for atom in list(self.atoms):
+            atom.makeHydrogenExplicit()
     def checkValid(self):
-        out = []
-        for atom in self.atoms:
-            totbinds = sum(atom.bindings.values())
-            if totbinds>atom.max_bindings:
-                # TODO: add support for ions
-                out.append((atom,">"))
-            elif totbinds<atom.max_bindings:
-                out.append((atom,"<"))
-            else:
-                continue
-        return out
+        # Returns a list of (atom,"<") or (atom,">") for every atom with too few or too many bindings
+        return list(self.invalid_atoms.items())
     
     # Conversion Methods
     def asStructuralFormula(self):
         return self
     
+    def asCompact(self):
+        return compact.CompactStructuralNotation.fromStructure(self)
+    
+    def freeze(self):
+        # Returns an immutable copy that caches its backbone, name, SMILES and other derived properties
+        return frozen.FrozenStructuralNotation.fromStructure(self)
+    def freezeTemporary(self):
+        # Returns an immutable copy and releases this structure, see freeze() and release()
+        with self:
+            return self.freeze()
+    
     # Old version of algorithm
     # Most sub-routines and sub-algorithms have been ported over to the more flexible newer algorithm
     # There is no real reason to use this old algorithm
     """
     def asIUPACName_OLD(self):
-        if self.checkValid()!=[]:
-            raise errors.IncompleteFormulaError("At least %s atoms are invalid, cannot convert if not valid"%len(self.checkValid()))
+        invalid = self.checkValid()
+        if invalid!=[]:
+            raise errors.IncompleteFormulaError("At least %s atoms are invalid, cannot convert if not valid"%len(invalid))
         
         # Check for methane, special
-        if self.countAtoms()=={"C":1,"H":4}:
+        count = self.countAtoms()
+        if count=={"C":1,"H":4}:
             return iupac.IUPACNotation("Methane")
-        elif self.countAtoms().get("C",0)==0:
+        elif count.get("C",0)==0:
             # Prevents bugs further down
             return iupac.IUPACNotation("")
         
@@ -353,7 +585,7 @@ class StructuralNotation(BaseNotation):
         return out
     """
     
-    def asIUPACName(self,advanced=False):
+    def asIUPACName(self,advanced=False,analysis=None):
         # Parsing is done in multiple stages
         # 1. Validate the molecule and check for edge cases
         # 2. Find carbon backbone
@@ -400,16 +632,20 @@ class StructuralNotation(BaseNotation):
         # 811.4: Amine Radicals and trivial names
         # 812.1: Monoamines using -amine and trivial names
         
-        data = {}
-        self.s2i_stage1(data)
-        self.s2i_stage2(data)
-        self.s2i_stage3(data)
-        self.s2i_stage4(data)
-        self.s2i_stage5(data)
-        self.s2i_stage6(data)
-        self.s2i_stage7(data)
-        self.s2i_stage8(data)
-        self.s2i_stage9(data)
+        data = {"analysis":analysis}
+        with tracing.conversion(log,"structural2iupac",self):
+            if instrumentation.isEnabled():
+                instrumentation.runStages(self,"s2i",S2I_STAGES,data)
+            else:
+                self.s2i_stage1(data)
+                self.s2i_stage2(data)
+                self.s2i_stage3(data)
+                self.s2i_stage4(data)
+                self.s2i_stage5(data)
+                self.s2i_stage6(data)
+                self.s2i_stage7(data)
+                self.s2i_stage8(data)
+                self.s2i_stage9(data)
         
         if not advanced:
             return data["out"]
@@ -419,13 +655,15 @@ class StructuralNotation(BaseNotation):
     def s2i_stage1(self,data):
         # Stage 1
         # 1. Validate the molecule and check for edge cases
-        if self.checkValid()!=[]:
-            raise errors.IncompleteFormulaError("At least %s atoms are invalid, cannot convert if not valid"%len(self.checkValid()))
+        invalid = self.checkValid()
+        if invalid!=[]:
+            raise errors.IncompleteFormulaError("At least %s atoms are invalid, cannot convert if not valid"%len(invalid))
         
         # Check for methane, special
-        if self.countAtoms()=={"C":1,"H":4}:
+        count = self.countAtoms()
+        if count=={"C":1,"H":4}:
             return iupac.IUPACNotation("Methane")
-        elif self.countAtoms().get("C",0)==0:
+        elif count.get("C",0)==0:
             # Prevents bugs further down
             return iupac.IUPACNotation("")
         
@@ -436,23 +674,41 @@ class StructuralNotation(BaseNotation):
         # 2. Find carbon backbone
         
         # find longest carbon chain
-        data["backbone"] = self.getCarbonBackbone()
+        # The analysis may have been passed in by convert()
+        if data.get("analysis") is None:
+            data["analysis"] = self.analyze()
+        data["backbone"] = data["analysis"].backbone
         if len(data["backbone"])>9999:
             raise errors.FormulaTooLargeError("Backbone is %s atoms long, only up to 9999 supported"%len(data["backbone"]))
     def s2i_stage3(self,data):
         # Stage 3
         # 3. Parse all branches into functional groups
         
-        # List of [base_n,type,data]
+        # The groups are found by analyze(), the list is copied since later stages may replace groups
+        data["f_groups"] = list(data["analysis"].groups)
+    
+    def analyze(self):
+        # Finds the backbone and all functional groups attached to it
+        # The result can be shared by all conversions, see convert()
+        invalid = self.checkValid()
+        if invalid!=[]:
+            raise errors.IncompleteFormulaError("At least %s atoms are invalid, cannot convert if not valid"%len(invalid))
+        
+        backbone = self.getCarbonBackbone()
+        backbone_set = frozenset(backbone)
+        return StructureAnalysis(backbone,backbone_set,self.findGroups(backbone,backbone_set))
+    def findGroups(self,backbone,backbone_set):
+        # Returns a list of [base_n,type,data] for all groups attached to the backbone
+        # base_n is the 1-based position on the backbone, before any flipping
         groups = []
         
         # Parses branches
         n = 0
-        for c in data["backbone"]:
+        for c in backbone:
             # Go through each atom of the backbone and count the number
             n+=1
             for neighbour in c.bindings:
-                if neighbour in data["backbone"]:
+                if neighbour in backbone_set:
                     # Neighbour is part of the backbone
                     continue
                 elif neighbour.symbol=="H":
@@ -463,7 +719,7 @@ class StructuralNotation(BaseNotation):
                     # Follow it and measure its length
                     if c.bindings[neighbour] == 1:
                         # Alkyl Group
-                        grouptype,extradata = self.analyzeBranch(data["backbone"],c,neighbour)
+                        grouptype,extradata = self.analyzeBranch(backbone_set,c,neighbour)
                         groups.append([n,grouptype,extradata])
                     else:
                         raise errors.UnsupportedGroupError("Only single bonds are supported between carbon atoms")
@@ -472,10 +728,7 @@ class StructuralNotation(BaseNotation):
                     # Check if it is a Hydroxy Group by checking the binding
                     if c.bindings[neighbour] == 1:
                         # Hydroxy Group
-                        h = 0
-                        for n2 in neighbour.bindings:
-                            if n2.symbol=="H":
-                                h+=1
+                        h = neighbour.countHydrogen()
                         if h==1:
                             grouptype = "hydroxyl"
                             extradata = {"c":c,"n":n}
@@ -494,7 +747,7 @@ class StructuralNotation(BaseNotation):
                     # Check if it is an Amino Group by checking the binding to the base atom and child atoms
                     if c.bindings[neighbour] == 1:
                         # Probably amino or hydroxyamino
-                        h = 0
+                        h = neighbour.implicit_hydrogen
                         o = 0
                         o_atom = None
                         for n2 in neighbour.bindings:
@@ -510,10 +763,7 @@ class StructuralNotation(BaseNotation):
                             groups.append([n,grouptype,extradata])
                         elif h==1 and o==1:
                             # Probably hydroxyamino, just check the oxygen
-                            h = 0
-                            for n2 in o_atom.bindings:
-                                if n2.symbol=="H":
-                                    h+=1
+                            h = o_atom.countHydrogen()
                             if h==1:
                                 # Hydroxyamino group
                                 grouptype = "hydroxyamino"
@@ -554,19 +804,14 @@ class StructuralNotation(BaseNotation):
                     # May happen if an unsupported element is loaded via a SMILES File
                     raise errors.UnsupportedElementError("Element '%s' (%s) is not currently supported"%(neighbour.symbol,neighbour.atomtype))
         
-        data["f_groups"] = groups
+        return groups
     def s2i_stage4(self,data):
         # Stage 4
         # 4. Determine if the ordering must be flipped
         
         max_n = len(data["backbone"])+1 # needed for an off-by-one bug
         
-        unflip_sum = sum([group[0] for group in data["f_groups"]])
-        flip_sum = sum([max_n-group[0] for group in data["f_groups"]])
-        
-        if unflip_sum<flip_sum:
-            pass # Do nothing, unflipped yields the lowest numbers
-        elif flip_sum<unflip_sum:
+        if isFlipped(data["f_groups"],len(data["backbone"])):
             n_groups = []
             for n,grouptype,extradata in data["f_groups"]:
                 n_groups.append([max_n-n,grouptype,extradata])
@@ -681,9 +926,8 @@ class StructuralNotation(BaseNotation):
             suffix="ane"
         elif len(suffixes)==1:
             # Just one group, use -ol but no multiplier
-            if suffixes[0]==1 or suffixes[0]==len(data["backbone"]):
-                # at the start or end of the molecule, no need to specify
-                # TODO: verify this
+            if suffixes[0]==1:
+                # at the start of the molecule, no need to specify
                 suffix="anol"
             else:
                 suffix="an-%s-ol"%suffixes[0]
@@ -723,15 +967,16 @@ class StructuralNotation(BaseNotation):
         visited = set()
         
         # Simply walks the graph of all reachable atoms
-        # Stores all reachable atoms
-        stack = set([list(self.atoms)[0]])
+        # Starts at the first atom added to the structure
+        stack = [next(iter(self.atoms))]
+        visited.add(stack[0])
         while len(stack)>0:
             atom = stack.pop()
-            visited.add(atom)
             
             for neighbour in atom.bindings:
                 if neighbour not in visited:
-                    stack.add(neighbour)
+                    visited.add(neighbour)
+                    stack.append(neighbour)
         
         # The number of reachable atoms should equal the number of all atoms
         # If not, there are some unreachable atoms
@@ -744,258 +989,138 @@ class StructuralNotation(BaseNotation):
             return True
     
     # Save to String Methods
-    def dumpAsSMILES(self):
-        if self.checkValid()!=[]:
-            raise errors.IncompleteFormulaError("At least %s atoms are invalid, cannot convert if not valid"%len(self.checkValid()))
-        
-        # Check for methane, special
-        if self.countAtoms()=={"C":1,"H":4}:
-            return "C"
-        
-        # find longest carbon chain
-        backbone = self.getCarbonBackbone()
+    def dumpAsSMILES(self,analysis=None):
+        # analysis may be passed in to reuse the result of analyze()
+        if analysis is None:
+            analysis = self.analyze()
         
         # Dict of position: [(position,type,extradata),*]
         groups = {}
-        
-        # Parse branches
-        n = 0
-        for c in backbone:
-            # Go through each atom of the backbone and count the number
-            n+=1
-            for neighbour in c.bindings:
-                if neighbour in backbone:
-                    # Neighbour is part of the backbone
-                    continue
-                elif neighbour.symbol=="H":
-                    # Hydrogen is (currently) ignored, as it is not relevant
-                    continue
-                elif neighbour.symbol=="C":
-                    # Found a branch
-                    # Follow it and measure its length
-                    grouptype,extradata = self.analyzeBranch(backbone,c,neighbour)
-                    group = [n,grouptype,extradata]
-                    if n not in groups:
-                        groups[n]=[]
-                    groups[n].append(group)
-                elif neighbour.symbol=="O":
-                    # Only hydroxy groups are currently supported
-                    h = 0
-                    for n2 in neighbour.bindings:
-                        if n2.symbol=="H":
-                            h+=1
-                    if h==1:
-                        # Is a hydroxy group
-                        group = [n,"hydroxy",None]
-                        if n not in groups:
-                            groups[n]=[]
-                        groups[n].append(group)
-                    else:
-                        raise errors.UnsupportedGroupError("Ketogroups are currently not supported")
-                elif neighbour.symbol in ["F","Cl","Br","I"]:
-                    # Halogen derivative
-                    group = [n,"halogen",neighbour.symbol]
-                    if n not in groups:
-                        groups[n]=[]
-                    groups[n].append(group)
-                elif neighbour.symbol=="N":
-                    # Nitrogen derivative, only amines and hydroxyamines supported
-                    # Check if it is an Amino Group by checking the binding to the base atom and child atoms
-                    if c.bindings[neighbour] == 1:
-                        # Probably amino or hydroxyamino
-                        h = 0
-                        o = 0
-                        o_atom = None
-                        for n2 in neighbour.bindings:
-                            if n2.symbol=="H":
-                                h+=1
-                            elif n2.symbol=="O":
-                                o+=1
-                                o_atom = n2
-                        if h==2:
-                            # Amino Group
-                            group = [n,"amino",None]
-                            if n not in groups:
-                                groups[n]=[]
-                            groups[n].append(group)
-                        elif h==1 and o==1:
-                            # Probably hydroxyamino, just check the oxygen
-                            h = 0
-                            for n2 in o_atom.bindings:
-                                if n2.symbol=="H":
-                                    h+=1
-                            if h==1:
-                                # Hydroxyamino group
-                                group = [n,"hydroxyamino",None]
-                                if n not in groups:
-                                    groups[n]=[]
-                                groups[n].append(group)
-                            else:
-                                raise errors.UnsupportedGroupError("Only Amino and Hydroxyamino Nitrogen-based groups are supported")
-                        else:
-                            # Probably one of the other dozens of nitrogen-based functional groups
-                            raise errors.UnsupportedGroupError("Only Amino and Hydroxyamino Nitrogen-based groups are supported")
-                    else:
-                        raise errors.UnsupportedGroupError("Nitrogen Atoms using double bonds are currently not supported")
-                else:
-                    raise errors.UnsupportedElementError("Element '%s' is not currently supported"%neighbour.symbol)
-        
-        max_n = len(backbone)+1 # needed for an off-by-one bug
-        
-        g_flip = {}
-        for i in groups.values():
-            for n,grouptype,extradata in i:
-                n = max_n-n
-                if n not in g_flip:
-                    g_flip[n] = []
-                g_flip[n].append([n,grouptype,extradata])
-        
-        unflip_sum = sum([sum([j[0] for j in i]) for i in groups.values()])
-        flip_sum = sum([sum([j[0] for j in i]) for i in g_flip.values()])
-        
-        if unflip_sum<flip_sum:
-            pass # do nothing, unflipped yields lowest locants
-        elif unflip_sum==flip_sum:
-            # special case
-            # TODO: implement properly using rule 2.4
-            # currently, just don't flip it
-            pass
-        else:
-            # flip, for lower locants
-            groups = g_flip
-        
-        # Calculates sum of flipping the molecule numbering versus not flipping it
-        #unflip_sum = sum([sum([g[0] for g in glist]) for glist in groups.values()])
-        #flip_sum = sum([sum([max_n-g[0] for g in glist]) for glist in groups.values()])
-        
-        # Uncomment if problems with flipping code arise
-        #print("Flip Data:")
-        #for kv in groups.items():
-        #    print("%s: %s"%kv)
-        #print("flip: %s unflip: %s"%(flip_sum,unflip_sum))
-        
-        #if unflip_sum<flip_sum:
-        #    pass # Do nothing, unflipped yields the lowest numbers
-        #elif flip_sum<unflip_sum:
-        #    n_groups = {}
-        #    for i in groups.values():
-        #        for n,grouptype,extradata in i:
-        #            new_n = max_n-n
-        #            if new_n not in n_groups:
-        #                n_groups[new_n] = []
-        #            n_groups[new_n].append([new_n,grouptype,extradata])
-        #    groups = n_groups
-        
-        #print("Final Groups:")
-        #for n,g in groups.items():
-        #    print("n=%s:"%n)
-        #    for group in g:
-        #        print("\tGroup with len=%s:"%group[2]["n"])
-        #        print("\t\t%s"%group)
-        #        print("\t\tAtoms:")
-        #        for atom in group[2]["atoms"]:
-        #            print("\t\t\tAtom %s connected to %s"%(atom.name,[a.name for a in atom.bindings if atom.symbol=="C"]))
-        #        print("\t\tEnd Group")
-        #print("End Groups")
+        for group in analysis.getGroups():
+            if group[0] not in groups:
+                groups[group[0]]=[]
+            groups[group[0]].append(group)
         
         # Compile output
         out = ""
         n = 0
-        for c in backbone:
+        for c in analysis.backbone:
             # Add the base carbon
             n+=1
             out += "C"
             
             if n in groups:
                 # If there are side chains
-                
-                #print("Side chains at %s:"%n)
-                
                 groups_sorted = sorted(groups[n],key=(lambda group: (group[2]["n"] if group[1]=="alkyl" else 0)))
                 
-                #for g in groups_sorted:
-                #    print("\t%s"%g)
-                #print("End side chains %s"%n)
-                
                 # Add all groups
                 for _,gtype,gdata in groups_sorted:
                     if gtype == "alkyl":
                         # Add parentheses containing the group
                         out += "("+("C"*gdata["n"])+")"
-                    elif gtype == "hydroxy":
-                        # Add parentheses containing the hydroxy group
-                        out += "(O)"
-                    elif gtype == "halogen":
-                        # Add parentheses containing the halogen group
-                        out += "(%s)"%gdata
-                    elif gtype == "amino":
-                        # Add parentheses containing the amino group
-                        out += "(N)"
-                    elif gtype == "hydroxyamino":
-                        # Add parentheses containing the hydroxyamino group
-                        out += "(NO)"
+                    elif gtype in GROUP_SMILES:
+                        # Add parentheses containing the group
+                        out += "(%s)"%GROUP_SMILES[gtype]
                     else:
                         raise errors.InvalidGroupError("Unknown group type '%s'"%gtype)
         
         return out
     
+    def convert(self,outputs=("iupac","smiles","formula")):
+        # Converts the structure into all given outputs at once
+        # Returns a dict of output:string, see CONVERT_OUTPUTS for the supported outputs
+        # The IUPAC name and SMILES share a single analyze() pass
+        out = {}
+        analysis = None
+        for output in outputs:
+            if output not in CONVERT_OUTPUTS:
+                raise ValueError("Invalid output format '%s'"%output)
+            elif output=="formula":
+                out[output] = self.getSumFormula()
+            elif output=="canonical":
+                out[output] = self.canonicalKey()
+            else:
+                if analysis is None:
+                    analysis = self.analyze()
+                if output=="iupac":
+                    out[output] = self.asIUPACName(analysis=analysis).name
+                elif output=="smiles":
+                    out[output] = self.dumpAsSMILES(analysis=analysis)
+        return out
+    
     # Load from String Methods
     @classmethod
-    def loadsFromSMILES(cls,data):
-        out = cls()
+    def getSMILESCacheKey(cls,data,implicit_hydrogen=False,target="structural"):
+        # Key of the result converted from data to target in chemhelper.cache
+        return cls,data,target,implicit_hydrogen
+    @classmethod
+    def loadsFromSMILES(cls,data,implicit_hydrogen=False,cache=None):
+        if conversion_cache.useCache(cache):
+            return conversion_cache.lookup(cls.getSMILESCacheKey(data,implicit_hydrogen),lambda:cls.loadsFromSMILES(data,implicit_hydrogen,False).freezeTemporary())
         
-        d_list = list(data)
-        c_index = 0
+        with tracing.conversion(log,"smiles2structural",data):
+            return cls.parseSMILES(data,implicit_hydrogen)
+    @classmethod
+    def parseSMILES(cls,data,implicit_hydrogen=False):
+        # Parses SMILES without caching or tracing, use loadsFromSMILES() instead
+        out = cls(implicit_hydrogen)
+        
+        # Single pass over the input, i is the index of the current character
+        # All error messages refer to positions in the original string
+        i = 0
+        end = len(data)
         binding_type = 1
         prev = None
         stack = []
-        while d_list!=[]:
+        while i<end:
             # Parses the token
             # If it is a parentheses, the branch will be started/finished
             # If not, the atom will be parsed and created
-            if d_list[0] in "\n ":
+            char = data[i]
+            if char in "\n ":
                 # Ignores spaces and newlines
-                d_list.pop(0)
-                c_index+=1
+                i+=1
                 continue
-            elif d_list[0] in ">":
+            elif char==">":
                 raise errors.UnsupportedSMILESFeatureError("SMILES Reactions are not supported")
-            elif d_list[0] in "@123456789%/\\.":
+            elif char in "@123456789%/\\.":
                 # Features in order:
                 # Chirality 1x ,Cyclic Structures 10x,Directional Bonds 2x,Disconnected Structures 1x
-                raise errors.UnsupportedSMILESFeatureError("SMILES Feature at %s is not yet supported"%c_index)
-            elif d_list[0] in "-=#:":
+                raise errors.UnsupportedSMILESFeatureError("SMILES Feature at %s is not yet supported"%i)
+            elif char in "-=#:":
                 # Check if we are at the end of a group, no bindings may be specified there
-                if len(d_list)<=1:
+                if i+1>=end:
                     raise errors.SMILESSyntaxError("Dangling binding type at the end of input")
-                elif d_list[1]==")":
+                elif data[i+1]==")":
                     raise errors.SMILESSyntaxError("Tried to specify binding type at the end of a group")
+                elif prev is None:
+                    raise errors.SMILESSyntaxError("Binding type at char %s is not preceded by an atom"%(i+1))
                 elif binding_type!=1:
                     # Does not catch multiple single bond specifications
-                    raise errors.SMILESSyntaxError("Multiple binding specification at char %s"%(c_index+1))
-                if d_list[0]=="-":
+                    raise errors.SMILESSyntaxError("Multiple binding specification at char %s"%(i+1))
+                if char=="-":
                     binding_type=1
-                elif d_list[0]=="=":
+                elif char=="=":
                     binding_type=2
-                elif d_list[0]=="#":
+                elif char=="#":
                     binding_type=3
-                elif d_list[0]==":":
+                elif char==":":
                     raise errors.UnsupportedSMILESFeatureError("Aromatic bindings are not yet supported")
-                d_list.pop(0)
-                c_index+=1
-            elif d_list[0]=="(":
+                
+                # The binding type is used once the next atom is connected
+                i+=1
+                continue
+            elif char=="(":
                 # Start of branch
-                if c_index==0:
+                if i==0:
                     raise errors.SMILESSyntaxError("Cannot start branch at the beginning of the molecule")
                 
                 # Pushes the current prev as a backup to the stack
                 stack.append(prev)
                 
-                # Pop the parenthesis and skip to the next cycle
-                d_list.pop(0)
-                c_index+=1
+                i+=1
                 continue
-            elif d_list[0]==")":
+            elif char==")":
                 # End of branch
                 if stack==[]:
                     raise errors.SMILESSyntaxError("Found closing parenthesis outside of a branch")
@@ -1003,91 +1128,71 @@ class StructuralNotation(BaseNotation):
                 # Retrieves the prev of the parent chain from the stack
                 prev = stack.pop()
                 
-                # Pop the parenthesis and skip to the next cycle
-                d_list.pop(0)
-                c_index+=1
+                i+=1
                 continue
-            elif d_list[0]=="[":
+            elif char=="[":
                 # Bracketized Atom
                 
-                c_start = c_index
+                c_start = i
                 
-                # Collects the entire atom definition within brackets
-                # Note that this might fail if there is a bracket mismatch
-                a = ""
-                d_list.pop(0) # Pops off the starting bracket
-                while True:
-                    if len(d_list)==0:
-                        raise errors.SMILESSyntaxError("Missing closing bracket for bracket starting at char %s"%c_start)
-                    elif d_list[0]=="]":
-                        d_list.pop(0)
-                        c_index+=1
-                        break
-                    elif d_list[0]=="[":
-                        raise errors.SMILESSyntaxError("Doubly-opened bracket at %s for start bracket %s"%(c_index+1,c_start))
-                    
-                    c = d_list.pop(0)
-                    c_index+=1
-                    a+=c
+                # Finds the end of the atom definition within brackets
+                close = data.find("]",i+1)
+                if close==-1:
+                    raise errors.SMILESSyntaxError("Missing closing bracket for bracket starting at char %s"%c_start)
+                nested = data.find("[",i+1,close)
+                if nested!=-1:
+                    raise errors.SMILESSyntaxError("Doubly-opened bracket at %s for start bracket %s"%(nested,c_start))
+                a = data[i+1:close]
+                i = close+1
                 
-                # Gets the element
-                element = None
-                for e in elements.ALL_ELEMENTS:
-                    if a.startswith(e):
-                        element = e
-                if element is None:
+                # Gets the element, two-letter symbols take precedence
+                if a[:2] in SMILES_ELEMENTS:
+                    element = a[:2]
+                elif a[:1] in SMILES_ELEMENTS:
+                    element = a[:1]
+                else:
                     raise errors.SMILESSyntaxError("Unknown element with Symbol '%s' at char %s"%(a[:2],c_start+2))
                 
                 # Creates the atom
-                if element in elements.ELEMENTS.keys():
+                if element in elements.ELEMENTS:
                     # Known element
-                    atom = elements.ELEMENTS[element](out,name="%s from char %s"%(element,c_start))
+                    atom = elements.ELEMENTS[element](out,name=out.makeLabel("%s from char %s",element,c_start))
                 else:
-                    raise errors.UnsupportedElementError("Unsupported element %s")
+                    raise errors.UnsupportedElementError("Unsupported element %s"%element)
                     # TODO: add support for arbitrary elements
                 out.addAtom(atom)
                 
-                # Adds specified hydrogen
-                if a.startswith("H"):
-                    # Assumes that at maximum 9 hydrogen will be added
-                    if len(a)<2:
-                        amount = 1 # If there is no amount specified, the default is one
-                    elif a[1] not in "0123456789":
-                        raise errors.SMILESSyntaxError("H for attached Hydrogen found, but following character was not a number")
-                    else:
-                        amount = int(a[1])
-                    for i in range(amount):
-                        h = Hydrogen(out,name="H #%s of char %s"%(i+1,c_start))
-                        out.addAtom(a)
-                        atom.bindToAtom(h)
+                # Hydrogen specified within the brackets, e.g. [CH3], is currently ignored
+                # The atom is filled with hydrogen like all other atoms
+                # TODO: dont add hydrogen if atom in brackets
                 
                 # TODO: add support for isotopes and charge
-            elif len(d_list)>=2 and d_list[0]+d_list[1] in ["Cl","Br"]:
+            elif data[i:i+2] in ("Cl","Br"):
                 # Double-letter elements
-                element = d_list.pop(0)+d_list.pop(0)
-                c_index+=2
+                element = data[i:i+2]
+                i+=2
                 
-                atom = elements.ELEMENTS[element](out,name="%s from char %s"%(element,c_index))
+                atom = elements.ELEMENTS[element](out,name=out.makeLabel("%s from char %s",element,i))
                 out.addAtom(atom)
-            elif d_list[0] in "BCNOPSFI":
+            elif char in "BCNOPSFI":
                 # Single-letter elements
-                element = d_list.pop(0)
-                c_index+=1
+                element = char
+                i+=1
                 
-                atom = elements.ELEMENTS[element](out,name="%s from char %s"%(element,c_index))
+                atom = elements.ELEMENTS[element](out,name=out.makeLabel("%s from char %s",element,i))
                 out.addAtom(atom)
-            elif d_list[0]=="]":
+            elif char=="]":
                 # Extraneous Closing Bracket
-                raise errors.SMILESSyntaxError("Extraneous closing bracket at char %s"%(c_index+1))
+                raise errors.SMILESSyntaxError("Extraneous closing bracket at char %s"%(i+1))
             else:
-                raise errors.SMILESSyntaxError("Invalid token at char %s"%(c_index+1))
+                raise errors.SMILESSyntaxError("Invalid token at char %s"%(i+1))
             
             # Connect to the previous atom
             if prev is not None:
                 if binding_type!=1:
                     raise errors.UnsupportedSMILESFeatureError("Multiple bindings are currently not supported")
                 prev.bindToAtom(atom,binding_type)
-                binding_type=1
+            binding_type=1
             prev = atom
         if stack != []:
             raise errors.SMILESSyntaxError("%s parentheses have not been closed at the end, starting with %s"%(len(stack),stack[-1]))
@@ -1141,10 +1246,7 @@ class StructuralNotation(BaseNotation):
                         elif neighbour.symbol=="C":
                             if double_branch:
                                 # Triggers if more than one valid carbon to go to is detected on a single side-chain carbon
-                                print("ERROR: Prev:")
-                                print(lc)
-                                print("Cur:")
-                                print(neighbour)
+                                tracing.debug(log,"Double branch at %s, previous: %s, current: %s",atom,lc,neighbour)
                                 raise errors.UnsupportedFeatureError("Double branch detected, not supported")
                             double_branch = True
                             lc = neighbour
@@ -1167,7 +1269,7 @@ class StructuralNotation(BaseNotation):
     
     ## Begin Carbon-Backbone extraction Algorithm
     
-    def getCarbonBackbone(self):
+    def getCarbonBackbone(self,legacy=None):
         # Example
         # Note that the backbone is not the straight line
         #
@@ -1185,6 +1287,9 @@ class StructuralNotation(BaseNotation):
         #
         # This example demonstrates that simply recursively searching from one end will not work
         
+        if legacy is None:
+            legacy = self.legacy_backbone
+        
         # Check for methane, special
         if self.countAtoms()["C"]==1:
             for atom in self.atoms:
@@ -1217,8 +1322,149 @@ class StructuralNotation(BaseNotation):
         if len(ends)<2:
             raise errors.CyclicMoleculeError("Molecule is not acyclic")
         
-        return self._longestChain(ends,)
+        if legacy:
+            return self._longestChain(ends,)
+        return self._longestChainDiameter()
+    
+    def _longestChainDiameter(self):
+        # The carbon skeleton of an acyclic molecule is a tree, and the longest chain of a tree is its diameter
+        # The diameter is found with two breadth-first passes:
+        # The carbon farthest away from any starting carbon is always an end of a longest chain,
+        # and the carbon farthest away from that end is the other end
+        # This visits every carbon twice and is thus O(n), compared to the O(n^3) of the old algorithm
+        
+        longest_chain = []
+        
+        visited = set()
+        for atom in self.atoms:
+            if atom.symbol!="C" or atom in visited:
+                continue
+            # Every disconnected carbon skeleton is searched on its own
+            end,pred = self._carbonBFS(atom)
+            visited.update(pred)
+            
+            other_end,pred = self._carbonBFS(end)
+            
+            # Walk back from the other end to reconstruct the chain
+            chain = []
+            node = other_end
+            while node is not None:
+                chain.append(node)
+                node = pred[node]
+            
+            if len(chain)>len(longest_chain):
+                longest_chain = chain
+        
+        return self._bestChain(longest_chain)
+    
+    def _bestChain(self,chain):
+        # Chooses between all chains as long as the given one
+        # Every longest chain of a tree passes through its center, which is the middle of any of them
+        # The chains are made of two arms going from the center into different branches
+        # The best arm of every branch is chosen while walking it, preferring arms with more substituents,
+        # which makes the substituents as simple as possible, and then lower atom ids
+        # Only the chosen chain is built, so this stays O(n) even if there are many longest chains
+        n = len(chain)
+        if n==1:
+            return chain
+        elif n%2==1:
+            # Center atom, both arms start at one of its neighbours
+            center = chain[n//2]
+            arms = [self._chainArm(neighbour,center) for neighbour in center.bindings if neighbour.symbol=="C"]
+            arms = [arm for arm in arms if len(arm[1])==n//2]
+            arms.sort(key=lambda arm:(-arm[0],arm[1][0].id))
+            best = list(reversed(arms[0][1]))+[center]+arms[1][1]
+        else:
+            # Center bond, one arm starts at each of its atoms
+            a,b = chain[n//2-1],chain[n//2]
+            best = list(reversed(self._centerArm(a,b,n//2)))+self._centerArm(b,a,n//2)
+        return self._chainKey(best)[1]
+    
+    def _centerArm(self,start,other,length):
+        # Returns the best arm of the given length that starts at start and does not go through other
+        if length==1:
+            return [start]
+        arms = [self._chainArm(neighbour,start) for neighbour in start.bindings if neighbour.symbol=="C" and neighbour!=other]
+        arms = [arm for arm in arms if len(arm[1])==length-1]
+        return [start]+min(arms,key=lambda arm:(-arm[0],arm[1][0].id))[1]
+    
+    def _chainArm(self,root,parent):
+        # Returns (score,arm) for the best of the longest arms that start at root and do not go through parent
+        # The score is the number of substituents the arm leaves
+        order = [root]
+        parents = {root:parent}
+        for node in order:
+            for neighbour in node.bindings:
+                # Compared by equality, compact structures create new atom views on every access
+                if neighbour.symbol=="C" and neighbour!=parents[node]:
+                    parents[neighbour]=node
+                    order.append(neighbour)
+        
+        # Map of atom:(height,score) of the best arm starting at that atom, calculated from the leaves upwards
+        best = {}
+        children = defaultdict(list)
+        for node in reversed(order):
+            heavy = sum(1 for neighbour in node.bindings if neighbour.symbol!="H")
+            if len(children[node])==0:
+                best[node] = 0,heavy-1
+            else:
+                height,score = max(best[child] for child in children[node])
+                best[node] = height+1,score+heavy-2
+            if node!=root:
+                children[parents[node]].append(node)
+        
+        # Walks down from the root, always to the best child, ties are broken by the atom ids
+        arm = [root]
+        node = root
+        while len(children[node])>0:
+            node = max(children[node],key=lambda child:(best[child],-child.id))
+            arm.append(node)
+        return best[root][1],arm
     
+    def _chainKey(self,chain):
+        # Returns (key,chain) with the chain in its preferred direction
+        # Chains with more substituents are preferred, then chains with lower locants of their substituents,
+        # then chains with lower locants of their hydroxyl groups, which are the principal group, and finally
+        # chains with lower atom ids
+        atoms = set(chain)
+        locants = []
+        hydroxyl = []
+        for i,atom in enumerate(chain):
+            for neighbour in atom.bindings:
+                if neighbour.symbol!="H" and neighbour not in atoms:
+                    locants.append(i+1)
+                    if neighbour.symbol=="O":
+                        hydroxyl.append(i+1)
+        n = len(chain)+1
+        return min(
+            ((-len(locants),locants,hydroxyl,[atom.id for atom in chain]),chain),
+            ((-len(locants),sorted(n-i for i in locants),sorted(n-i for i in hydroxyl),[atom.id for atom in reversed(chain)]),list(reversed(chain))),
+            )
+    
+    def _carbonBFS(self,start):
+        # Breadth-first search over all carbon atoms reachable from start
+        # Returns the last, thus farthest, carbon found and a dict of carbon:predecessor
+        pred = {start:None}
+        queue = deque([start])
+        node = start
+        while len(queue)>0:
+            node = queue.popleft()
+            for neighbour,n in node.bindings.items():
+                if n!=1:
+                    raise errors.UnsupportedBindingError("%s-Binds are currently not supported"%n)
+                elif neighbour.symbol!="C":
+                    continue
+                elif neighbour in pred:
+                    if neighbour is not pred[node]:
+                        # Reached an already found carbon through a second path
+                        raise errors.CyclicMoleculeError("Molecule is not acyclic")
+                    continue
+                pred[neighbour]=node
+                queue.append(neighbour)
+        return node,pred
+    
+    # Old version of the longest chain search, only used if legacy_backbone is set
+    # Builds a DAG from every dead end and searches the longest path in each of them
     def _longestChain(self,ends):
         max_c = self.countAtoms().get("C",0)
         
@@ -1252,18 +1498,23 @@ class StructuralNotation(BaseNotation):
             dags.append([end,dag])
         
         longest_chain = []
+        # The longest chain found from each endpoint, the best of them is chosen with _chainKey()
+        candidates = []
         
         # Go through each endpoint and find the longest path from it
         for end,dag in dags:
             l_chain = self._processDAG(ends,end,dag)
             if len(l_chain)>len(longest_chain):
                 longest_chain = l_chain
+                candidates = []
+            if len(l_chain)==len(longest_chain):
+                candidates.append(l_chain)
             if len(longest_chain)>=max_c:
                 # Stop if the found chain is longer than the amount of carbon atoms in the molecule, cannot get longer
                 # Also serves as an additional safety mechanism in case of cyclo molecules
                 break # cannot get any longer
         
-        return longest_chain
+        return min(self._chainKey(c) for c in candidates)[1]
     
     def _processDAG(self,ends,end,dag):
         # Convert the DAG consisting of a dict with node:list of adjacent to dict with node:set of adjacent
@@ -1275,13 +1526,14 @@ class StructuralNotation(BaseNotation):
         # Needed for longest_path() as it required a pred dict
         # Normally provided by networkx, but not used here so created manually
         # TODO: create this graph only once, not for every DAG
+        position = {node:i for i,node in enumerate(topodag)}
         pred = {}
         for node in dag:
             pred[node]={}
             for neighbour in node.bindings:
                 if neighbour.symbol!="C":
                     continue
-                if topodag.index(neighbour)<topodag.index(node):
+                if position[neighbour]<position[node]:
                     pred[node][neighbour]=None
         
         # Actually compute the longest path
@@ -1294,11 +1546,12 @@ class StructuralNotation(BaseNotation):
         for node in topodag:
             # pairs of dist,node for all incoming edges
             pairs = [(dist[v][0]+1,v) for v in pred[node]] 
+            # Ties are broken by the atom ids
             if pairs:
-                dist[node] = max(pairs)
+                dist[node] = max(pairs,key=lambda x:(x[0],x[1].id))
             else:
                 dist[node] = (0, node)
-        node,(length,_)  = max(dist.items(), key=lambda x:x[1])
+        node,(length,_)  = max(dist.items(), key=lambda x:(x[1][0],x[1][1].id))
         path = []
         while length > 0:
             path.append(node)
@@ -1317,7 +1570,7 @@ class StructuralNotation(BaseNotation):
             ordered = set(item for item,dep in data.items() if not dep)
             if not ordered:
                 break
-            out.extend(sorted(ordered))
+            out.extend(sorted(ordered,key=lambda atom:atom.id))
             data = {item: (dep - ordered) for item,dep in data.items()
                     if item not in ordered}
         
@@ -1326,3 +1579,21 @@ class StructuralNotation(BaseNotation):
         return out
     
     ## End Carbon-Backbone extraction algorithm
+    
+    # Comparison Methods
+    def canonicalKey(self):
+        # Returns a string that is the same for all structures of the same molecule
+        # Atom order, atom names and explicit or implicit hydrogen do not change the key
+        # See chemhelper.canonical for details
+        return canonical.canonicalKey(*canonical.getGraph(self.atoms))
+    
+    # Magic Methods
+    # Structures compare equal if they describe the same molecule
+    # Mutable structures are unhashable, since modifying them would change their hash
+    # Use freeze() to get a structure that can be used as a dict key and caches its canonical key
+    def __eq__(self,other):
+        return isinstance(other,StructuralNotation) and \
+               self.canonicalKey()==other.canonicalKey()
+    def __ne__(self,other):
+        return not self==other
+    __hash__ = None
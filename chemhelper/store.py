@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  store.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+# Persistent sqlite store for conversion results
+# Used by chemhelper.cache to keep results between processes and restarts
+#
+# Usage:
+#   chemhelper.cache.enable()
+#   chemhelper.cache.setStore(chemhelper.store.ConversionStore("conversions.db"))
+#
+# Each result is stored under (notation,input,target,options) together with the chemhelper version that created it
+# Results of other versions are ignored when reading and replaced when writing, use purge() to remove them
+# The database uses write-ahead logging, so several processes may read while another one writes
+
+import os
+import json
+import sqlite3
+import threading
+
+from .version import VERSION
+
+# Incremented whenever the layout of the database changes, older databases are re-created
+SCHEMA_VERSION = 2
+
+# Maximum amount of inputs per query when prefetching, sqlite limits the number of parameters
+PREFETCH_CHUNKSIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversions (
+    notation TEXT NOT NULL,
+    input TEXT NOT NULL,
+    target TEXT NOT NULL,
+    options TEXT NOT NULL,
+    version TEXT NOT NULL,
+    output TEXT NOT NULL,
+    PRIMARY KEY (notation,input,target,options)
+)
+"""
+
+def getNotationName(cls):
+    return "%s.%s"%(cls.__module__,cls.__name__)
+
+def getStoreKey(key):
+    # Turns a cache key (notation class,input,target,*options) into the key stored in the database
+    cls,data,target = key[:3]
+    return getNotationName(cls),data,target,json.dumps(key[3:])
+
+# Stores received from other processes, by (path,version,timeout)
+_received = {}
+
+def _receiveStore(path,version,timeout):
+    # Called when unpickling a store, e.g. in a worker process of chemhelper.batch
+    # Every store is only opened once per process
+    key = path,version,timeout
+    if key not in _received:
+        _received[key] = ConversionStore(path,version,timeout)
+    return _received[key]
+
+class ConversionStore(object):
+    # Stores conversion results as strings in an sqlite database at path
+    # Every thread and process uses its own connection
+    # timeout is the number of seconds to wait for a lock held by another process
+    def __init__(self,path,version=VERSION,timeout=30):
+        self.path = path
+        self.version = version
+        self.timeout = timeout
+        
+        self.local = threading.local()
+        
+        # Creates the database once, so that other processes can open it read-only
+        self.getConnection()
+    
+    def getConnection(self):
+        # Returns the connection of the current thread
+        # Connections are not shared with child processes, a forked process opens its own
+        conn = getattr(self.local,"conn",None)
+        if conn is not None and self.local.pid==os.getpid():
+            return conn
+        
+        conn = sqlite3.connect(self.path,timeout=self.timeout)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0]!=SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS conversions")
+                conn.execute(SCHEMA)
+                conn.execute("PRAGMA user_version=%d"%SCHEMA_VERSION)
+        
+        self.local.conn = conn
+        self.local.pid = os.getpid()
+        return conn
+    
+    def get(self,key):
+        # Returns the stored output for a cache key, or None if there is no current result
+        notation,data,target,options = getStoreKey(key)
+        row = self.getConnection().execute(
+            "SELECT output FROM conversions WHERE notation=? AND input=? AND target=? AND options=? AND version=?",
+            (notation,data,target,options,self.version),
+            ).fetchone()
+        return row[0] if row is not None else None
+    def put(self,key,output):
+        self.putMany([(key,output)])
+    def putMany(self,items):
+        # Stores all (key,output) pairs in a single transaction
+        rows = [getStoreKey(key)+(self.version,output) for key,output in items]
+        conn = self.getConnection()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO conversions VALUES (?,?,?,?,?,?)",rows)
+    
+    def prefetch(self,keys):
+        # Returns a dict of cache key:output for all given keys that have a current result
+        # Keys are grouped by notation, target and options and fetched with one query per group
+        groups = {}
+        for key in keys:
+            notation,data,target,options = getStoreKey(key)
+            groups.setdefault((notation,target,options),{})[data]=key
+        
+        out = {}
+        conn = self.getConnection()
+        for (notation,target,options),inputs in groups.items():
+            inputs = list(inputs.items())
+            for start in range(0,len(inputs),PREFETCH_CHUNKSIZE):
+                chunk = inputs[start:start+PREFETCH_CHUNKSIZE]
+                query = "SELECT input,output FROM conversions WHERE notation=? AND target=? AND options=? AND version=? AND input IN (%s)"%(",".join("?"*len(chunk)))
+                params = [notation,target,options,self.version]+[data for data,key in chunk]
+                chunk = dict(chunk)
+                for data,output in conn.execute(query,params):
+                    out[chunk[data]]=output
+        return out
+    
+    def purge(self):
+        # Removes all results created by other versions, returns the number of removed results
+        conn = self.getConnection()
+        with conn:
+            return conn.execute("DELETE FROM conversions WHERE version!=?",(self.version,)).rowcount
+    def clear(self):
+        conn = self.getConnection()
+        with conn:
+            conn.execute("DELETE FROM conversions")
+    
+    def close(self):
+        # Closes the connection of the current thread
+        conn = getattr(self.local,"conn",None)
+        if conn is not None and self.local.pid==os.getpid():
+            conn.close()
+        self.local.conn = None
+    
+    def __reduce__(self):
+        # Connections cannot be pickled, the receiving process opens its own
+        return _receiveStore,(self.path,self.version,self.timeout)
+    
+    def __len__(self):
+        # Number of current results
+        return self.getConnection().execute("SELECT COUNT(*) FROM conversions WHERE version=?",(self.version,)).fetchone()[0]
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  tracing.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+# Debug tracing of conversions through the standard logging module
+# All messages are logged below the "chemhelper" logger, which only has a NullHandler by default
+#
+# Every top-level conversion gets a trace id, which is added to its messages as the trace_id attribute
+# Nested conversions, e.g. the structure created while naming a condensed formula, share the id of the outer one
+#
+# Usage:
+#   logging.basicConfig(format="%(trace_id)s %(name)s: %(message)s")
+#   logging.getLogger("chemhelper").setLevel(logging.DEBUG)
+#
+# Or, to get the messages of a single conversion:
+#   with chemhelper.tracing.capture() as records:
+#       chemhelper.notations.iupac.IUPACNotation("2-Methylbutane").asStructuralFormula()
+#
+# Messages are only formatted if a handler accepts them
+# If DEBUG is not enabled for the "chemhelper" logger, conversions do not create trace ids
+
+import logging
+import itertools
+import threading
+
+ROOT_LOGGER = "chemhelper"
+
+logger = logging.getLogger(ROOT_LOGGER)
+logger.addHandler(logging.NullHandler())
+
+_local = threading.local()
+_ids = itertools.count(1)
+
+def getLogger(name):
+    # Returns the logger for a part of chemhelper, e.g. getLogger("condensed")
+    return logging.getLogger("%s.%s"%(ROOT_LOGGER,name))
+
+def getTraceId():
+    # Returns the trace id of the conversion running in this thread, or None
+    return getattr(_local,"trace_id",None)
+
+def debug(log,msg,*args):
+    # Logs a debug message with the current trace id
+    # Arguments are only formatted if the message is actually handled
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(msg,*args,extra={"trace_id":getTraceId()})
+
+class _NullConversion(object):
+    # Used instead of a Conversion while tracing is disabled
+    def __enter__(self):
+        return self
+    def __exit__(self,exc_type,exc,tb):
+        return False
+
+_NULL_CONVERSION = _NullConversion()
+
+class Conversion(object):
+    # Context manager that assigns a trace id to the conversion run inside it, if there is none yet
+    def __init__(self,log,kind,data):
+        self.log = log
+        self.kind = kind
+        self.data = data
+        self.outer = None
+    
+    def __enter__(self):
+        self.outer = getTraceId()
+        if self.outer is None:
+            _local.trace_id = next(_ids)
+        debug(self.log,"Converting %s %r",self.kind,self.data)
+        return self
+    def __exit__(self,exc_type,exc,tb):
+        if exc is not None:
+            debug(self.log,"Conversion %s %r failed with %s: %s",self.kind,self.data,exc_type.__name__,exc)
+        else:
+            debug(self.log,"Conversion %s %r finished",self.kind,self.data)
+        if self.outer is None:
+            _local.trace_id = None
+        return False
+
+def conversion(log,kind,data):
+    # Returns the context manager to run a conversion in
+    # kind describes the conversion, e.g. "iupac2structural", and data is the input
+    if not log.isEnabledFor(logging.DEBUG):
+        return _NULL_CONVERSION
+    return Conversion(log,kind,data)
+
+class _ThreadFilter(logging.Filter):
+    def __init__(self,thread):
+        super(_ThreadFilter,self).__init__()
+        self.thread = thread
+    def filter(self,record):
+        return record.thread==self.thread
+
+class capture(object):
+    # Context manager collecting all debug messages logged by this thread into a list of LogRecord objects
+    # Use getMessage() on the records for the formatted message
+    def __init__(self,level=logging.DEBUG):
+        self.level = level
+        self.records = []
+        self.handler = None
+        self.old_level = None
+    
+    def __enter__(self):
+        self.handler = logging.Handler(self.level)
+        self.handler.emit = self.records.append
+        self.handler.addFilter(_ThreadFilter(threading.get_ident()))
+        
+        self.old_level = logger.level
+        if logger.getEffectiveLevel()>self.level:
+            logger.setLevel(self.level)
+        logger.addHandler(self.handler)
+        return self.records
+    def __exit__(self,exc_type,exc,tb):
+        logger.removeHandler(self.handler)
+        logger.setLevel(self.old_level)
+        return False
@@ -35,13 +35,65 @@ def basic_alkane(n,do_hydrogen=True):
     for i in range(1,n+1):
         carbons.append(struct.addCarbon(name="C%s"%i))
     
-    for c in carbons:
-        if carbons.index(c)==0:
-            continue
-        c.bindToAtom(carbons[carbons.index(c)-1])
+    for prev,c in zip(carbons,carbons[1:]):
+        c.bindToAtom(prev)
     
     if do_hydrogen:
         struct.fillWithHydrogen()
+        
+        assert struct.checkValid()==[]
+    
+    return struct
+
+def branched_alkane(n):
+    # Alkane with a methyl group on every second carbon, e.g. 2,4,6-Trimethyloctane for n=8
+    struct = basic_alkane(n)
+    carbons = sorted([atom for atom in struct.atoms if atom.symbol=="C"],key=lambda atom:int(atom.name[1:]))
+    for c in carbons[1:-2:2]:
+        hydrogen = next(atom for atom in c.bindings if atom.symbol=="H")
+        hydrogen.erase()
+        struct.addCarbon().bindToAtom(c)
+    struct.fillWithHydrogen()
+    
+    assert struct.checkValid()==[]
+    
+    return struct
+
+def dendrimer(n):
+    # Tree of n carbons where every carbon has as many carbon neighbours as possible, filled layer by layer
+    # All leaves of the last layer are ends of a longest chain, so there are many equally long chains
+    struct = chemhelper.notations.structural.StructuralNotation()
+    root = struct.addCarbon(name="C1")
+    layer = [root]
+    count = 1
+    while count<n:
+        new = []
+        for atom in layer:
+            for i in range(4-len(atom.bindings)):
+                if count>=n:
+                    break
+                count+=1
+                carbon = struct.addCarbon(name="C%s"%count)
+                carbon.bindToAtom(atom)
+                new.append(carbon)
+        layer = new
+    struct.fillWithHydrogen()
+    
+    assert struct.checkValid()==[]
+    
+    return struct
+
+def star_alkane(n):
+    # Quaternary carbon with four equal chains, e.g. 3,3-Diethylpentane for n=2
+    struct = chemhelper.notations.structural.StructuralNotation()
+    center = struct.addCarbon(name="C0")
+    for i in range(4):
+        prev = center
+        for j in range(n):
+            carbon = struct.addCarbon()
+            carbon.bindToAtom(prev)
+            prev = carbon
+    struct.fillWithHydrogen()
     
     assert struct.checkValid()==[]
     
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  test_batch.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+
+import os
+import concurrent.futures
+
+import pytest
+
+import chemhelper
+
+test_names = [
+    ["Ethane","CC"],
+    ["4-Ethylheptane","CCCC(CC)CCC"],
+    ["Propan-2-ol","CC(O)C"],
+    ["1,4-Diaminobutane","C(N)CCC(N)"],
+    ["Ethene",None], # Fails, alkenes are not supported
+    ["Hectane","C"*100],
+    ]
+
+@pytest.mark.parametrize("workers",[0,2])
+def test_convert_ordered(workers):
+    results = chemhelper.batch.convertMany([n for n,s in test_names],"iupac","smiles",workers=workers,chunksize=2)
+    
+    assert [r.index for r in results]==list(range(len(test_names)))
+    for r,(name,smiles) in zip(results,test_names):
+        assert r.input==name
+        assert r.output==smiles
+        if smiles is None:
+            assert isinstance(r.error,chemhelper.errors.UnsupportedFormulaTypeError)
+        else:
+            assert r.error is None
+
+def test_convert_unordered():
+    smiles = [s for n,s in test_names if s is not None]*5
+    results = chemhelper.batch.convertMany(smiles,"smiles","iupac",workers=2,chunksize=3,ordered=False)
+    
+    assert sorted(r.index for r in results)==list(range(len(smiles)))
+    for r in results:
+        assert r.input==smiles[r.index]
+        assert r.error is None
+    assert set(r.output for r in results)==set(n for n,s in test_names if s is not None)
+
+def test_convert_structural():
+    results = chemhelper.batch.convertMany(["CH3(CH2)2CH3","CH3-(CH2)2-CH3"],"condensed","structural",workers=2)
+    
+    for r in results:
+        assert r.output.countAtoms()=={"C":4,"H":10}
+        assert r.output.asIUPACName().name=="Butane"
+
+def test_pool_reuse():
+    chemhelper.batch.convertMany(["CC"],"smiles","iupac",workers=2)
+    pool = chemhelper.batch.getPool(2)
+    chemhelper.batch.convertMany(["CCC"],"smiles","iupac",workers=2)
+    assert chemhelper.batch.getPool(2) is pool
+
+def test_pool_broken():
+    pool = chemhelper.batch.getPool(2)
+    with pytest.raises(concurrent.futures.process.BrokenProcessPool):
+        pool.submit(os._exit,1).result()
+    
+    # The broken pool is replaced
+    results = chemhelper.batch.convertMany(["CC","CCC"],"smiles","iupac",workers=2,chunksize=1)
+    assert [r.output for r in results]==["Ethane","Propane"]
+    assert chemhelper.batch.getPool(2) is not pool
+
+def test_pool_settings(tmp_path):
+    # Settings changed after the workers were started are used by them
+    chemhelper.batch.convertMany(["CC"],"smiles","iupac",workers=2)
+    store = chemhelper.store.ConversionStore(str(tmp_path/"conversions.db"))
+    chemhelper.cache.enable()
+    chemhelper.cache.setStore(store)
+    try:
+        chemhelper.batch.convertMany(["CC","CCC"],"smiles","iupac",workers=2,chunksize=1)
+        assert store.get(chemhelper.batch.getCacheKey("CCC","smiles","iupac"))=="Propane"
+    finally:
+        chemhelper.cache.setStore(None)
+        chemhelper.cache.disable()
+        chemhelper.cache.clear()
+        store.close()
+    
+    # Disabling the cache again also reaches the workers
+    store.clear()
+    chemhelper.batch.convertMany(["CC","CCC"],"smiles","iupac",workers=2,chunksize=1)
+    assert len(store)==0
+
+def test_invalid_format():
+    with pytest.raises(ValueError):
+        chemhelper.batch.convertMany(["CC"],"inchi","iupac")
+    with pytest.raises(ValueError):
+        chemhelper.batch.convertMany(["CC"],"smiles","inchi")
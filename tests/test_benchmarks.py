@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  test_benchmarks.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+import os
+import sys
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks import cases, compare, memory, rss, run
+
+def test_benchmark_cases():
+    names = [case.name for case in cases.getCases([4])]
+    assert "iupac2structural[4]" in names
+    assert "s2i_stage%s[4]"%cases.S2I_STAGES in names
+    assert "i2s_stage%s[4]"%cases.I2S_STAGES in names
+    assert len(names)==len(set(names))
+    
+    data = run.runBenchmarks([4],"smiles",repeat=2,min_time=0.001,max_time=0.01)
+    assert sorted(data["results"])==["smiles_dump[4]","smiles_parse[4]"]
+    assert data["results"]["smiles_dump[4]"]["min"]>0
+
+def test_benchmark_compare():
+    baseline = {"results":{"a":{"min":1.0},"b":{"min":1.0},"c":{"min":1.0},"d":{"min":1.0}}}
+    current = {"results":{"a":{"min":1.05},"b":{"min":1.5},"c":{"min":0.5},"e":{"min":1.0}}}
+    rows = compare.compareResults(baseline,current,threshold=0.1)
+    assert [(row[0],row[4]) for row in rows]==[("a","ok"),("b","regression"),("c","improvement"),("d","missing"),("e","new")]
+
+def test_benchmark_memory():
+    data = memory.runMemoryBenchmarks([4])
+    assert data["results"]["iupac2structural[4]"]["peak"]>=data["results"]["iupac2structural[4]"]["retained"]>0
+    assert data["results"]["footprint[4]"]["total"]>data["results"]["footprint_frozen[4]"]["total"]
+    
+    rows = compare.compareResults(data,data,stat="peak")
+    assert len(rows)==3
+
+def test_benchmark_rss():
+    data = rss.runRSSBenchmark(count=20,samples=2,disable_gc=True)
+    assert data["results"]["rss"]["cycles"]==0
+    assert [i for i,value in data["samples"]]==[0,10,20]
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  test_bond_metadata.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+import pytest
+
+import chemhelper
+
+StructuralNotation = chemhelper.notations.structural.StructuralNotation
+IUPACNotation = chemhelper.notations.iupac.IUPACNotation
+
+@pytest.fixture(params=chemhelper.notations.structural.BOND_METADATA_MODES)
+def mode(request,monkeypatch):
+    monkeypatch.setattr(StructuralNotation,"bond_metadata",request.param)
+    return request.param
+
+def getAtom(struct,symbol):
+    return next(atom for atom in struct.atoms if atom.symbol==symbol)
+
+def test_bond_metadata_modes(mode):
+    struct = IUPACNotation("2-Methylbutan-2-ol").asStructuralFormula(cache=False)
+    assert struct.bond_metadata==mode
+    assert struct.asIUPACName().name=="2-Methylbutan-2-ol"
+    
+    o = getAtom(struct,"O")
+    c = next(atom for atom in o.bindings if atom.symbol=="C")
+    sdata,odata = o.getBondData(c)
+    if mode=="off":
+        assert o.name==""
+        assert sdata=={}
+    else:
+        assert o.name=="O@2"
+        assert sdata=={"reason":"Hydroxyl Group generated from IUPAC Name"}
+        methyl = next(atom for atom in struct.atoms if atom.name=="C 2-methyl #1")
+        base = next(atom for atom in methyl.bindings if atom.symbol=="C")
+        assert methyl.getBondData(base)[0]=={"reason":"methyl Group generated from IUPAC Name"}
+    
+    if mode=="full":
+        # Every bond has its own modifiable data
+        sdata["foo"] = "bar"
+    else:
+        with pytest.raises(TypeError):
+            sdata["foo"] = "bar"
+    
+    struct = StructuralNotation.loadsFromSMILES("CC(C)C",cache=False)
+    names = sorted(atom.name for atom in struct.atoms if atom.symbol=="C")
+    assert names==([""]*4 if mode=="off" else ["C from char 1","C from char 2","C from char 4","C from char 6"])
+
+def test_bond_metadata_shared():
+    # Shared within a structure, but not between structures, so it is freed with the structure
+    s1 = StructuralNotation(bond_metadata="interned")
+    s2 = StructuralNotation(bond_metadata="interned")
+    assert s1.makeBondData("%s Group","methyl") is s1.makeBondData("%s Group","methyl")
+    assert s1.makeBondData("%s Group","methyl") is not s2.makeBondData("%s Group","methyl")
+    assert s1.makeBondData("%s Group","methyl")=={"reason":"methyl Group"}
+    s1.release()
+    assert s1.shared_bond_data is None
+    assert StructuralNotation(bond_metadata="full").makeBondData("%s Group","methyl")=={"reason":"methyl Group"}
+    
+    with pytest.raises(ValueError):
+        StructuralNotation(bond_metadata="foo")
+
+def test_lazy_label():
+    struct = StructuralNotation(bond_metadata="lazy")
+    c = struct.addCarbon(name=struct.makeLabel("C%s",1))
+    assert isinstance(c._name,chemhelper.elements.LazyLabel)
+    
+    # Formatted on first access and then stored
+    assert c.name=="C1"
+    assert c._name=="C1"
+    assert "name='C1'" in repr(c)
+    
+    c.name = "foo"
+    assert c.name=="foo"
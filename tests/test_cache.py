@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  test_cache.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+import pytest
+
+import chemhelper
+
+@pytest.fixture
+def cache():
+    chemhelper.cache.clear()
+    chemhelper.cache.enable()
+    yield chemhelper.cache
+    chemhelper.cache.disable()
+    chemhelper.cache.clear()
+    chemhelper.cache.getCache().resize(chemhelper.cache.DEFAULT_MAXSIZE)
+
+def test_cache_disabled():
+    assert not chemhelper.cache.isEnabled()
+    struct = chemhelper.notations.iupac.IUPACNotation("Butane").asStructuralFormula()
+    assert not isinstance(struct,chemhelper.notations.frozen.FrozenStructuralNotation)
+    assert chemhelper.cache.getStats().misses==0
+
+def test_cache_iupac(cache):
+    IUPACNotation = chemhelper.notations.iupac.IUPACNotation
+    
+    s1 = IUPACNotation("2-Methylbutane").asStructuralFormula()
+    s2 = IUPACNotation("2-methylbutane").asStructuralFormula()
+    assert s1 is s2
+    assert isinstance(s1,chemhelper.notations.frozen.FrozenStructuralNotation)
+    assert cache.getStats()==cache.CacheStats(1,1,0,1,cache.DEFAULT_MAXSIZE)
+    
+    # Implicit hydrogen is a different result
+    s3 = IUPACNotation("2-Methylbutane").asStructuralFormula(True)
+    assert s3 is not s1
+    assert s3==s1
+    
+    # Cached structures cannot be modified
+    with pytest.raises(chemhelper.errors.ImmutableStructureError):
+        s1.addCarbon()
+    thawed = s1.thaw()
+    thawed.addCarbon()
+    assert IUPACNotation("2-Methylbutane").asStructuralFormula().countAtoms()=={"C":5,"H":12}
+
+def test_cache_bypass(cache):
+    IUPACNotation = chemhelper.notations.iupac.IUPACNotation
+    StructuralNotation = chemhelper.notations.structural.StructuralNotation
+    
+    struct = IUPACNotation("Propane").asStructuralFormula(cache=False)
+    assert not isinstance(struct,chemhelper.notations.frozen.FrozenStructuralNotation)
+    struct = StructuralNotation.loadsFromSMILES("CCC",cache=False)
+    assert not isinstance(struct,chemhelper.notations.frozen.FrozenStructuralNotation)
+    assert cache.getStats().misses==0
+    
+    cache.disable()
+    struct = StructuralNotation.loadsFromSMILES("CCC",cache=True)
+    assert isinstance(struct,chemhelper.notations.frozen.FrozenStructuralNotation)
+    assert cache.getStats().misses==1
+
+def test_cache_smiles_condensed(cache):
+    StructuralNotation = chemhelper.notations.structural.StructuralNotation
+    CondensedMolecularNotation = chemhelper.notations.condensed.CondensedMolecularNotation
+    
+    assert StructuralNotation.loadsFromSMILES("CC(C)C") is StructuralNotation.loadsFromSMILES("CC(C)C")
+    assert CondensedMolecularNotation("CH3(CH2)3CH3").asStructuralFormula() is CondensedMolecularNotation("CH3(CH2)3CH3").asStructuralFormula()
+    
+    # Names and SMILES are cached as strings
+    assert CondensedMolecularNotation("CH3(CH2)3CH3").asIUPACName().name=="Pentane"
+    assert CondensedMolecularNotation("CH3(CH2)3CH3").asIUPACName().name=="Pentane"
+    assert cache.getStats().hits==3
+    assert cache.getCache().data[CondensedMolecularNotation("CH3(CH2)3CH3").getCacheKey("iupac")]=="Pentane"
+    
+    IUPACNotation = chemhelper.notations.iupac.IUPACNotation
+    assert IUPACNotation.loadsFromSMILES("CC(C)C")==IUPACNotation("2-Methylpropane")
+    assert IUPACNotation("2-Methylpropane").dumpAsSMILES()==IUPACNotation("2-methylpropane").dumpAsSMILES()
+    assert cache.getStats().hits==4
+
+def test_cache_eviction(cache):
+    cache.enable(maxsize=2)
+    IUPACNotation = chemhelper.notations.iupac.IUPACNotation
+    
+    for name in ["Ethane","Propane","Ethane","Butane","Propane"]:
+        IUPACNotation(name).asStructuralFormula()
+    
+    # Propane was evicted by Butane, since Ethane was used more recently
+    stats = cache.getStats()
+    assert (stats.hits,stats.misses,stats.evictions,stats.size)==(1,4,2,2)
+    
+    with pytest.raises(ValueError):
+        cache.LRUCache(0)
+
+def test_cache_errors(cache):
+    # Failed conversions are not cached
+    for i in range(2):
+        with pytest.raises(chemhelper.errors.UnsupportedFormulaTypeError):
+            chemhelper.notations.iupac.IUPACNotation("Benzene").asStructuralFormula()
+    assert cache.getStats().size==0
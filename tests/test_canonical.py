@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  test_canonical.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+import pytest
+
+import chemhelper
+
+from conftest import basic_alkane
+
+test_cases_equal = [
+    # Pairs of SMILES describing the same molecule
+    ["CC(O)C(C)CC","CCC(C)C(O)C"],
+    ["CCCC(CC)CCC","C(CC)(CCC)CCC"],
+    ["C(F)C(Cl)C","CC(Cl)CF"],
+    ["C(NO)CCC(NO)","ONCCCCNO"],
+    ]
+
+test_cases_different = [
+    ["CCCC","CC(C)C"],
+    ["CC(O)C","CCCO"],
+    ["CCNO","CCON"],
+    ]
+
+@pytest.mark.parametrize(("a","b"),test_cases_equal)
+def test_canonical_equal(a,b):
+    s1 = chemhelper.notations.structural.StructuralNotation.loadsFromSMILES(a)
+    s2 = chemhelper.notations.structural.StructuralNotation.loadsFromSMILES(b,implicit_hydrogen=True)
+    
+    assert s1.canonicalKey()==s2.canonicalKey()
+    assert s1==s2
+    assert hash(s1.freeze())==hash(s2.freeze())
+    assert s1.freeze()==s2.asCompact()
+    assert len({s1.freeze(),s2.freeze()})==1
+
+@pytest.mark.parametrize(("a","b"),test_cases_different)
+def test_canonical_different(a,b):
+    s1 = chemhelper.notations.structural.StructuralNotation.loadsFromSMILES(a)
+    s2 = chemhelper.notations.structural.StructuralNotation.loadsFromSMILES(b)
+    
+    assert s1.canonicalKey()!=s2.canonicalKey()
+    assert s1!=s2
+
+def test_canonical_unhashable():
+    # Only frozen structures can be used as dict keys
+    struct = basic_alkane(2)
+    with pytest.raises(TypeError):
+        hash(struct)
+    with pytest.raises(TypeError):
+        hash(struct.asCompact())
+    assert {struct.freeze():1}[basic_alkane(2).freeze()]==1
+
+def test_canonical_disconnected():
+    # Two methane molecules are not ethane
+    struct = basic_alkane(1)
+    struct.addCarbon().fillWithHydrogen()
+    
+    assert struct.canonicalKey()=="CH4.CH4"
+    assert struct!=basic_alkane(2)
+
+def test_canonical_iupac():
+    IUPACNotation = chemhelper.notations.iupac.IUPACNotation
+    
+    # Different spellings of the same molecule
+    assert IUPACNotation("1-Methylpropane")==IUPACNotation("Butane")
+    assert IUPACNotation("2-methylpropane")==IUPACNotation("2-Methylpropane")
+    assert IUPACNotation("Butane")!=IUPACNotation("2-Methylpropane")
+    
+    # Names that cannot be converted are compared by spelling
+    assert IUPACNotation("Benzene")==IUPACNotation("Benzene")
+    assert IUPACNotation("Benzene")!=IUPACNotation("Butane")
+    assert IUPACNotation("Benzene")!=IUPACNotation("benzene")
+    
+    # Names with a wrong multiplier are not equal to anything else
+    assert IUPACNotation("2-Dimethylpropane")!=IUPACNotation("Propane")
+    assert IUPACNotation("2-Dimethylpropane")==IUPACNotation("2-Dimethylpropane")
+    
+    # Names can be changed and are thus unhashable
+    with pytest.raises(TypeError):
+        hash(IUPACNotation("Butane"))
+    with pytest.raises(chemhelper.errors.ChemError):
+        IUPACNotation("Benzene").canonicalKey()
+
+def test_canonical_iupac_cached(monkeypatch):
+    IUPACNotation = chemhelper.notations.iupac.IUPACNotation
+    calls = []
+    convert = IUPACNotation.asStructuralFormula
+    monkeypatch.setattr(IUPACNotation,"asStructuralFormula",lambda self,*args:calls.append(self.name) or convert(self,*args))
+    
+    name = IUPACNotation("2-Methylbutane")
+    for i in range(3):
+        assert name==IUPACNotation("2-methylbutane")
+    assert calls.count("2-Methylbutane")==1
+    
+    # Changing the name invalidates the key
+    name.name = "Butane"
+    assert name.canonicalKey()==IUPACNotation("Butane").canonicalKey()
+
+def ring(n,start):
+    struct = chemhelper.notations.structural.StructuralNotation()
+    carbons = [struct.addCarbon() for i in range(n)]
+    for i in range(n):
+        carbons[(start+i)%n].bindToAtom(carbons[(start+i+1)%n])
+    struct.fillWithHydrogen()
+    return struct
+
+def test_canonical_cyclic():
+    # Cyclic molecules use the colour refinement fallback
+    assert ring(6,0)==ring(6,3)
+    assert ring(6,0)!=ring(5,0)
+    
+    # Methylcyclohexane, built from two different atoms of the ring
+    s1 = ring(6,0)
+    s2 = ring(6,0)
+    for struct,i in [[s1,0],[s2,4]]:
+        c = [a for a in struct.atoms if a.symbol=="C"][i]
+        h = [a for a in c.bindings if a.symbol=="H"][0]
+        h.erase()
+        c.bindToAtom(struct.addCarbon())
+        struct.fillWithHydrogen()
+    assert s1==s2
+    assert s1!=ring(7,0)
+
+def test_canonical_symmetric():
+    # The rings cannot be told apart by colour refinement alone, every atom has the same colour
+    def rings(sizes):
+        struct = chemhelper.notations.structural.StructuralNotation()
+        for n in sizes:
+            carbons = [struct.addCarbon() for i in range(n)]
+            for i in range(n):
+                carbons[i].bindToAtom(carbons[(i+1)%n])
+        struct.fillWithHydrogen()
+        return struct
+    
+    assert rings([3,6]).canonicalKey()==rings([6,3]).canonicalKey()
+    assert rings([4,4]).canonicalKey()!=rings([8]).canonicalKey()
+    assert len(set(ring(8,i).canonicalKey() for i in range(8)))==1
+
+def test_canonical_long_chain():
+    struct = chemhelper.notations.structural.StructuralNotation.loadsFromSMILES("C"*2000)
+    assert struct.canonicalKey()==basic_alkane(2000).canonicalKey()
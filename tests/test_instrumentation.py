@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  test_instrumentation.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+import json
+
+import pytest
+
+import chemhelper
+
+from conftest import basic_alkane
+
+instrumentation = chemhelper.instrumentation
+
+@pytest.fixture
+def instrumented():
+    instrumentation.reset()
+    instrumentation.enable()
+    yield instrumentation
+    instrumentation.disable()
+    instrumentation.reset()
+
+def test_instrumentation_disabled():
+    instrumentation.reset()
+    chemhelper.notations.iupac.IUPACNotation("Butane").asStructuralFormula()
+    assert instrumentation.getSnapshot()=={}
+
+def test_instrumentation_stages(instrumented):
+    basic_alkane(4).asIUPACName()
+    chemhelper.notations.iupac.IUPACNotation("Butane").asStructuralFormula()
+    chemhelper.notations.iupac.IUPACNotation("Propane").asStructuralFormula()
+    
+    snapshot = instrumented.getSnapshot()
+    assert snapshot["s2i"]["calls"]==1
+    assert snapshot["i2s"]["calls"]==2
+    for i in range(1,chemhelper.notations.structural.S2I_STAGES+1):
+        assert snapshot["s2i_stage%s"%i]["calls"]==1
+    for i in range(1,chemhelper.notations.iupac.I2S_STAGES+1):
+        assert snapshot["i2s_stage%s"%i]["calls"]==2
+        assert snapshot["i2s_stage%s"%i]["errors"]=={}
+    
+    # The pipeline takes at least as long as its stages
+    assert snapshot["i2s"]["time"]>=sum(snapshot["i2s_stage%s"%i]["time"] for i in range(1,7))
+    
+    assert json.loads(instrumented.dumpSnapshot())==snapshot
+
+def test_instrumentation_errors(instrumented):
+    for i in range(2):
+        with pytest.raises(chemhelper.errors.InvalidPrefixError):
+            chemhelper.notations.iupac.IUPACNotation("2-Fooylbutane").asStructuralFormula()
+    
+    snapshot = instrumented.getSnapshot()
+    assert snapshot["i2s"]["errors"]=={"InvalidPrefixError":2}
+    assert snapshot["i2s_stage2"]["errors"]=={"InvalidPrefixError":2}
+    assert "i2s_stage3" not in snapshot
+
+def test_instrumentation_callback(instrumented):
+    calls = []
+    callback = lambda name,elapsed,error:calls.append(name)
+    instrumented.addCallback(callback)
+    try:
+        chemhelper.notations.iupac.IUPACNotation("Butane").asStructuralFormula()
+    finally:
+        instrumented.removeCallback(callback)
+    assert calls==["i2s_stage%s"%i for i in range(1,7)]+["i2s"]
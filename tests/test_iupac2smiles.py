@@ -86,6 +86,25 @@ test_cases_s2i_special = [
     ["CCCCC(C) C(C) CC\n","3,4-Dimethyloctane"], # Space/Newline ignored
     ]
 
+test_cases_smiles_errors = [
+    # SMILES, exception, message
+    ["CC@C",     chemhelper.errors.UnsupportedSMILESFeatureError, "SMILES Feature at 2 is not yet supported"],
+    ["CC=",      chemhelper.errors.SMILESSyntaxError, "Dangling binding type at the end of input"],
+    ["C(C=)C",   chemhelper.errors.SMILESSyntaxError, "Tried to specify binding type at the end of a group"],
+    ["CC=#C",    chemhelper.errors.SMILESSyntaxError, "Multiple binding specification at char 4"],
+    ["=CC",      chemhelper.errors.SMILESSyntaxError, "Binding type at char 1 is not preceded by an atom"],
+    [" -CC",     chemhelper.errors.SMILESSyntaxError, "Binding type at char 2 is not preceded by an atom"],
+    ["(CC)",     chemhelper.errors.SMILESSyntaxError, "Cannot start branch at the beginning of the molecule"],
+    ["CC)",      chemhelper.errors.SMILESSyntaxError, "Found closing parenthesis outside of a branch"],
+    ["CC[C",     chemhelper.errors.SMILESSyntaxError, "Missing closing bracket for bracket starting at char 2"],
+    ["C[C[C]]",  chemhelper.errors.SMILESSyntaxError, "Doubly-opened bracket at 3 for start bracket 1"],
+    ["C[Qq]",    chemhelper.errors.SMILESSyntaxError, "Unknown element with Symbol 'Qq' at char 3"],
+    ["C[Xe]",    chemhelper.errors.UnsupportedElementError, "Unsupported element Xe"],
+    ["CC]",      chemhelper.errors.SMILESSyntaxError, "Extraneous closing bracket at char 3"],
+    ["CCx",      chemhelper.errors.SMILESSyntaxError, "Invalid token at char 3"],
+    ["[C][C]C@", chemhelper.errors.UnsupportedSMILESFeatureError, "SMILES Feature at 7 is not yet supported"],
+    ]
+
 @pytest.mark.parametrize(("name","smiles"),test_cases_i2s_branched_alkane)
 def test_i2s_branched_alkane(name,smiles):
     iupacname = chemhelper.notations.iupac.IUPACNotation(name)
@@ -99,13 +118,110 @@ def test_i2s_branched_alkane(name,smiles):
     # Check conversion from smiles to name
     assert iupacname.loadsFromSMILES(smiles) == iupacname
 
+@pytest.mark.parametrize(("name","smiles"),test_cases_i2s_branched_alkane)
+def test_i2s_implicit_hydrogen(name,smiles):
+    iupacname = chemhelper.notations.iupac.IUPACNotation(name)
+    struct = iupacname.asStructuralFormula(implicit_hydrogen=True)
+    
+    assert [a for a in struct.atoms if a.symbol=="H"]==[]
+    assert struct.countAtoms()==iupacname.asStructuralFormula().countAtoms()
+    
+    assert struct.dumpAsSMILES()==smiles
+    assert struct.asIUPACName()==iupacname
+    
+    struct = chemhelper.notations.structural.StructuralNotation.loadsFromSMILES(smiles,implicit_hydrogen=True)
+    assert [a for a in struct.atoms if a.symbol=="H"]==[]
+    assert struct.asIUPACName()==iupacname
+
 @pytest.mark.parametrize(("smiles","name"),test_cases_s2i_special)
 def test_s2i_special(smiles,name):
     assert name==chemhelper.notations.iupac.IUPACNotation.loadsFromSMILES(smiles).name
 
+@pytest.mark.parametrize(("smiles","exc","msg"),test_cases_smiles_errors)
+def test_smiles_errors(smiles,exc,msg):
+    with pytest.raises(exc) as excinfo:
+        chemhelper.notations.structural.StructuralNotation.loadsFromSMILES(smiles)
+    assert str(excinfo.value)==msg
+
+def test_smiles_long_chain():
+    struct = chemhelper.notations.structural.StructuralNotation.loadsFromSMILES("C"*5000)
+    assert struct.countAtoms()=={"C":5000,"H":10002}
+
+def test_smiles_bracket_elements():
+    # Two-letter symbols must not be mistaken for one-letter symbols
+    struct = chemhelper.notations.structural.StructuralNotation.loadsFromSMILES("CC([Cl])C([Br])C")
+    assert struct.countAtoms()=={"C":4,"H":8,"Br":1,"Cl":1}
+    
+    with pytest.raises(chemhelper.errors.UnsupportedElementError):
+        chemhelper.notations.structural.StructuralNotation.loadsFromSMILES("C[In]")
+
 def test_s2i_doubleletterelements():
     # Tests double-letter elements
     
     # Probably not a valid structure, but good for a testcase
     struct = chemhelper.notations.structural.StructuralNotation.loadsFromSMILES("CC(Br)C(Cl)C")
     assert struct.countAtoms()=={"C":4,"H":8,"Br":1,"Cl":1}
+
+def test_iupac_registry():
+    IUPACNotation = chemhelper.notations.iupac.IUPACNotation
+    
+    # The registries are shared and read-only
+    assert IUPACNotation("Propane").prefixes is IUPACNotation("Butane").prefixes
+    assert not hasattr(IUPACNotation("Propane"),"__dict__")
+    with pytest.raises(TypeError):
+        IUPACNotation.prefixes["cyano"]={"type":"notsupported","msg":"test"}
+    
+    class ExtendedNotation(IUPACNotation):
+        __slots__ = ()
+    ExtendedNotation.registerPrefix("iodido","simple",ftype="iodo")
+    ExtendedNotation.registerPrefix("cyano","notsupported",msg="Nitriles are currently not supported")
+    
+    assert ExtendedNotation("1-Iodidopropane").dumpAsSMILES()==IUPACNotation("1-Iodopropane").dumpAsSMILES()
+    with pytest.raises(chemhelper.errors.UnsupportedFeatureError):
+        ExtendedNotation("1-Cyanopropane").asStructuralFormula()
+    
+    # The base class is not affected
+    assert "iodido" not in IUPACNotation.prefixes
+    with pytest.raises(chemhelper.errors.InvalidPrefixError):
+        IUPACNotation("1-Iodidopropane").asStructuralFormula()
+
+def test_iupac_prefix_longest_match():
+    iupac = chemhelper.notations.iupac
+    trie = iupac.buildSuffixTrie(["yl","formyl","amino","hydroxyamino"])
+    assert iupac.matchSuffixTrie(trie,"dimethyl")=="yl"
+    assert iupac.matchSuffixTrie(trie,"diformyl")=="formyl"
+    assert iupac.matchSuffixTrie(trie,"dihydroxyamino")=="hydroxyamino"
+    assert iupac.matchSuffixTrie(trie,"hydroxy") is None
+    
+    class ExtendedNotation(iupac.IUPACNotation):
+        __slots__ = ()
+    # Registered after iodo, but still preferred since it is longer
+    ExtendedNotation.registerPrefix("bromoiodo","notsupported",msg="Test")
+    for i in range(300):
+        ExtendedNotation.registerPrefix("dummy%s"%i,"notsupported",msg="Test")
+    with pytest.raises(chemhelper.errors.UnsupportedFeatureError):
+        ExtendedNotation("1-Bromoiodopropane").asStructuralFormula()
+    assert ExtendedNotation("2-Iodopropane").dumpAsSMILES()=="CC(I)C"
+    
+    ExtendedNotation.unregisterPrefix("bromoiodo")
+    with pytest.raises(chemhelper.errors.InvalidPrefixError):
+        ExtendedNotation("1-Bromoiodopropane").asStructuralFormula()
+
+def test_iupac_tokenize(capsys):
+    NameToken = chemhelper.notations.iupac.NameToken
+    tokens = chemhelper.notations.iupac.IUPACNotation("2,2-Dimethyl-4,5-dihydroxyheptan-6-ol").tokenize()
+    assert tokens==[
+        NameToken("prefix",(2,2),"dimeth","yl",None),
+        NameToken("prefix",(4,5),"di","hydroxy",None),
+        NameToken("parent",None,"","hept",7),
+        NameToken("suffix",(6,),"","ol",None),
+        ]
+    
+    # Conversion must not write to stdout
+    chemhelper.notations.iupac.IUPACNotation("2-Methylpropane").asStructuralFormula()
+    assert capsys.readouterr().out==""
+    
+    with pytest.raises(chemhelper.errors.InvalidPrefixError):
+        chemhelper.notations.iupac.IUPACNotation("2-Propane").asStructuralFormula()
+    with pytest.raises(chemhelper.errors.InvalidPrefixError):
+        chemhelper.notations.iupac.IUPACNotation("2x-Methylpropane").asStructuralFormula()
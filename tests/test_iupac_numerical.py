@@ -114,6 +114,36 @@ def test_reverse_alkane_name2n_prefixed(n,name):
 def test_reverse_general_name2n_prefixed(n,name):
     assert n==chemhelper.notations.iupac.parseNumericalPrefix("abcdef"+name,True)[0]
 
+# Tests of the precomputed tables
+
+def test_table_roundtrip():
+    iupac = chemhelper.notations.iupac
+    for n in range(1,iupac.MAX_NUMERICAL_PREFIX+1):
+        assert iupac.getNumericalPrefix(n)==iupac.buildNumericalPrefix(n)
+        assert iupac.parseNumericalPrefix(iupac.getNumericalPrefix(n))==n
+        assert iupac.parseAlkanePrefix(iupac.getAlkanePrefix(n))==n
+        assert iupac.parseNumericalPrefix("dimethyl"+iupac.getNumericalPrefix(n),True)==(n,"dimethyl")
+
+def test_table_limits():
+    iupac = chemhelper.notations.iupac
+    with pytest.raises(NotImplementedError):
+        iupac.getNumericalPrefix(10000)
+    with pytest.raises(chemhelper.errors.InvalidPrefixError):
+        iupac.parseNumericalPrefix("")
+    with pytest.raises(chemhelper.errors.InvalidPrefixError):
+        iupac.parseNumericalPrefix("xyzpenta")
+    assert iupac.parseNumericalPrefix("xyz",True)==(0,"xyz")
+
+@pytest.mark.parametrize(("n", "n2", "expected"), [
+    [1,5,""],
+    [2,5,"di"],
+    [3,10,"tris"],
+    [6,5,"hexa"],
+    [3,12,"tri"],
+    ])
+def test_alkyl_multiplier(n,n2,expected):
+    assert expected==chemhelper.notations.iupac.getAlkylMultiplierPrefix(n,n2)
+
 # TODO: clean this up and make it an external tool
 def main(args):
     global SUFFIX
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  test_memory.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+import pytest
+
+import chemhelper
+
+from conftest import basic_alkane
+
+def test_memory_report():
+    small = chemhelper.memory.memoryReport(basic_alkane(4))
+    large = chemhelper.memory.memoryReport(basic_alkane(40))
+    
+    components = ["structure","atom_set","counters","atoms","bindings","bonddata","names"]
+    assert sorted(small)==sorted(components+["total"])
+    assert small["total"]==sum(small[component] for component in components)
+    for component in ["atom_set","atoms","bindings","bonddata","names"]:
+        assert large[component]>small[component]>0
+
+def test_memory_report_compact():
+    struct = basic_alkane(10)
+    report = chemhelper.memory.memoryReport(struct.asCompact())
+    assert report["arrays"]>0
+    assert report["total"]<chemhelper.memory.memoryReport(struct)["total"]
+    
+    frozen = struct.freeze()
+    frozen.asIUPACName()
+    assert chemhelper.memory.memoryReport(frozen)["cache"]>0
+    
+    with pytest.raises(TypeError):
+        chemhelper.memory.memoryReport("CCCC")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  test_scaling.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+import gc
+import math
+import time
+
+import pytest
+
+import chemhelper
+
+from conftest import basic_alkane, branched_alkane, dendrimer, star_alkane
+
+# Checks that conversions scale at most linearly with the size of the molecule
+# Each operation is timed for all sizes and a growth exponent k is fitted to time ~ n**k
+# Small sizes are dominated by constant overhead, so the slope between the two largest sizes is checked as well
+
+SIZES = [10,100,1000,10000]
+
+# Allows for some noise and n*log(n) behaviour, quadratic code has an exponent of about 2
+MAX_EXPONENT = 1.3
+
+# Total number of calls to time per size, at least 3
+CALLS = 1000
+
+def branched(n):
+    # Branched alkane with about n carbons in total
+    return branched_alkane(max(4,n*2//3))
+
+def star(n):
+    # Symmetric alkane with about n carbons in total, two of its four chains form the backbone
+    return star_alkane(max(1,n//4))
+
+def getName(n):
+    return branched(n).asIUPACName().name
+def getSMILES(n):
+    return branched(n).dumpAsSMILES()
+
+# name: (setup,run)
+# setup is called once per call and not timed
+OPERATIONS = {
+    "backbone":(branched,lambda struct:struct.getCarbonBackbone()),
+    "naming":(branched,lambda struct:struct.asIUPACName()),
+    # Symmetric inputs have many equally long chains to choose from
+    "backbone_symmetric":(dendrimer,lambda struct:struct.getCarbonBackbone()),
+    "naming_symmetric":(star,lambda struct:struct.asIUPACName()),
+    "smiles_parse":(getSMILES,lambda smiles:chemhelper.notations.structural.StructuralNotation.loadsFromSMILES(smiles,cache=False)),
+    "hydrogen_fill":(lambda n:basic_alkane(n,False),lambda struct:struct.fillWithHydrogen()),
+    "iupac2structural":(getName,lambda name:chemhelper.notations.iupac.IUPACNotation(name).asStructuralFormula(cache=False)),
+    "condensed2structural":(lambda n:"CH3(CH2)%sCH3"%(n-2),lambda formula:chemhelper.notations.condensed.CondensedMolecularNotation(formula).asStructuralFormula(cache=False)),
+    }
+
+def timeOperation(setup,run,n):
+    # Returns the minimum time of a single call
+    times = []
+    for i in range(max(3,CALLS//n)):
+        state = setup(n)
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            run(state)
+            times.append(time.perf_counter()-start)
+        finally:
+            gc.enable()
+    return min(times)
+
+def fitExponent(sizes,times):
+    # Least squares fit of log(time) against log(n)
+    xs = [math.log(n) for n in sizes]
+    ys = [math.log(t) for t in times]
+    mx = sum(xs)/len(xs)
+    my = sum(ys)/len(ys)
+    return sum((x-mx)*(y-my) for x,y in zip(xs,ys))/sum((x-mx)**2 for x in xs)
+
+def test_fit_exponent():
+    assert fitExponent(SIZES,[n*1e-6 for n in SIZES])==pytest.approx(1)
+    assert fitExponent(SIZES,[n**2*1e-9 for n in SIZES])==pytest.approx(2)
+
+@pytest.mark.parametrize("operation",sorted(OPERATIONS))
+def test_scaling(operation):
+    setup,run = OPERATIONS[operation]
+    times = [timeOperation(setup,run,n) for n in SIZES]
+    
+    exponent = fitExponent(SIZES,times)
+    last = fitExponent(SIZES[-2:],times[-2:])
+    if max(exponent,last)>MAX_EXPONENT:
+        # Measures again to rule out a slowdown caused by other processes, keeping the faster time of each size
+        times = [min(t,timeOperation(setup,run,n)) for t,n in zip(times,SIZES)]
+        exponent = fitExponent(SIZES,times)
+        last = fitExponent(SIZES[-2:],times[-2:])
+    info = ", ".join("n=%s: %.6fs"%(n,t) for n,t in zip(SIZES,times))
+    assert exponent<=MAX_EXPONENT, "%s grows with n**%.2f (%s)"%(operation,exponent,info)
+    assert last<=MAX_EXPONENT, "%s grows with n**%.2f for large n (%s)"%(operation,last,info)
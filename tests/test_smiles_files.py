@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  test_smiles_files.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+
+import io
+import types
+
+import pytest
+
+import chemhelper
+
+test_records = [
+    # SMILES, name
+    ["CC","Ethane"],
+    ["CCC(C)C(C)CCCC","3,4-Dimethyloctane"],
+    ["C(O)C","Ethanol"],
+    ["C(F)C(Cl)C","2-Chloro-1-fluoropropane"],
+    ]
+
+SMI_FILE = """CC Ethane
+CCC(C)C(C)CCCC\t3,4-Dimethyloctane
+
+C(O)C   Ethanol
+C(F)C(Cl)C 2-Chloro-1-fluoropropane
+"""
+
+def test_iter_fileobj():
+    it = chemhelper.notations.structural.StructuralNotation.iterFromSMILES(io.StringIO(SMI_FILE))
+    assert isinstance(it,types.GeneratorType)
+    
+    records = list(it)
+    assert [name for name,struct in records]==[name for smiles,name in test_records]
+    for (name,struct),(smiles,exp_name) in zip(records,test_records):
+        assert isinstance(struct,chemhelper.notations.structural.StructuralNotation)
+        assert struct.dumpAsSMILES()==smiles
+        assert struct.asIUPACName().name==name
+
+def test_iter_iupac():
+    records = chemhelper.notations.iupac.IUPACNotation.iterFromSMILES(io.StringIO(SMI_FILE))
+    for name,iupacname in records:
+        assert iupacname.name==name
+
+def test_iter_unnamed():
+    records = list(chemhelper.notations.structural.StructuralNotation.iterFromSMILES(io.StringIO("CC\nCCC\n")))
+    assert [name for name,struct in records]==["",""]
+
+def test_roundtrip_path(tmpdir):
+    fname = str(tmpdir.join("out.smi"))
+    
+    notations = [(name,chemhelper.notations.iupac.IUPACNotation(name)) for smiles,name in test_records]
+    count = chemhelper.notations.BaseNotation.saveManyAsSMILES(fname,iter(notations),buffer_size=3)
+    assert count==len(test_records)
+    
+    with open(fname) as f:
+        assert f.read()=="".join("%s %s\n"%(smiles,name) for smiles,name in test_records)
+    
+    records = list(chemhelper.notations.structural.StructuralNotation.iterFromSMILES(fname))
+    assert [(struct.dumpAsSMILES(),name) for name,struct in records]==[tuple(r) for r in test_records]
+
+def test_write_fileobj():
+    f = io.StringIO()
+    notations = [chemhelper.notations.iupac.IUPACNotation(name) for smiles,name in test_records]
+    chemhelper.notations.BaseNotation.saveManyAsSMILES(f,notations)
+    
+    # Opened file objects are not closed
+    assert f.getvalue()=="".join("%s\n"%smiles for smiles,name in test_records)
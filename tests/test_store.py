@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  test_store.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+import multiprocessing
+
+import pytest
+
+import chemhelper
+
+IUPACNotation = chemhelper.notations.iupac.IUPACNotation
+StructuralNotation = chemhelper.notations.structural.StructuralNotation
+
+@pytest.fixture
+def store(tmp_path):
+    store = chemhelper.store.ConversionStore(str(tmp_path/"conversions.db"))
+    chemhelper.cache.clear()
+    chemhelper.cache.enable()
+    chemhelper.cache.setStore(store)
+    yield store
+    chemhelper.cache.setStore(None)
+    chemhelper.cache.disable()
+    chemhelper.cache.clear()
+    store.close()
+
+def test_store_basic(store):
+    key = IUPACNotation("Butane").getCacheKey()
+    assert store.get(key) is None
+    store.put(key,"CCCC")
+    assert store.get(key)=="CCCC"
+    assert store.get(IUPACNotation("Butane").getCacheKey(True)) is None
+    assert len(store)==1
+    
+    store.clear()
+    assert len(store)==0
+
+def test_store_cache(store,monkeypatch):
+    s1 = IUPACNotation("2-Methylbutane").asStructuralFormula()
+    assert store.get(IUPACNotation("2-Methylbutane").getCacheKey()) is not None
+    
+    # Names and SMILES are stored directly
+    assert IUPACNotation("2-Methylbutane").dumpAsSMILES()==s1.dumpAsSMILES()
+    assert store.get(IUPACNotation("2-Methylbutane").getCacheKey(target="smiles"))==s1.dumpAsSMILES()
+    assert IUPACNotation.loadsFromSMILES("CC(C)CC").name=="2-Methylbutane"
+    assert store.get(StructuralNotation.getSMILESCacheKey("CC(C)CC",target="iupac"))=="2-Methylbutane"
+    
+    # Simulates a restart, the result is now loaded from the store without parsing
+    chemhelper.cache.clear()
+    monkeypatch.setattr(IUPACNotation,"asStructuralFormula",None)
+    assert IUPACNotation("2-Methylbutane").dumpAsSMILES()==s1.dumpAsSMILES()
+    monkeypatch.undo()
+    
+    monkeypatch.setattr(IUPACNotation,"i2s_stage1",None)
+    s2 = IUPACNotation("2-Methylbutane").asStructuralFormula()
+    assert s2 is not s1
+    assert s2==s1
+    assert isinstance(s2,chemhelper.notations.frozen.FrozenStructuralNotation)
+    assert s2.asIUPACName().name=="2-Methylbutane"
+    
+    s3 = StructuralNotation.loadsFromSMILES("CC(O)C",True)
+    chemhelper.cache.clear()
+    s4 = StructuralNotation.loadsFromSMILES("CC(O)C",True)
+    assert s4.countAtoms()==s3.countAtoms()
+    assert s4.implicit_hydrogen
+
+def test_store_version(store,tmp_path):
+    key = IUPACNotation("Butane").getCacheKey()
+    store.put(key,"CCCC")
+    
+    # Results of older versions are ignored
+    newer = chemhelper.store.ConversionStore(store.path,version="999.0.0")
+    assert newer.get(key) is None
+    assert len(newer)==0
+    newer.put(key,"C")
+    assert newer.get(key)=="C"
+    assert store.get(key) is None
+    
+    store.put(IUPACNotation("Propane").getCacheKey(),"CCC")
+    assert newer.purge()==1
+    assert len(newer)==1
+    newer.close()
+
+def test_store_prefetch(store):
+    names = ["Methane","Ethane","Propane","Butane"]
+    for name in names[:3]:
+        IUPACNotation(name).dumpAsSMILES()
+    chemhelper.cache.clear()
+    
+    keys = [IUPACNotation(name).getCacheKey(target="smiles") for name in names]
+    assert store.prefetch(keys)=={keys[0]:"C",keys[1]:"CC",keys[2]:"CCC"}
+    
+    assert chemhelper.cache.prefetch(keys)==3
+    IUPACNotation("Propane").dumpAsSMILES()
+    assert chemhelper.cache.getStats().hits==1
+    
+    results = chemhelper.batch.convertMany(names+["Pentane"],"iupac","smiles",workers=0,chunksize=2)
+    assert [result.output for result in results]==["C","CC","CCC","CCCC","CCCCC"]
+    assert len(store)==5
+    
+    # Names are stored for SMILES inputs
+    results = chemhelper.batch.convertMany(["CC(C)C"],"smiles","iupac",workers=0)
+    assert results[0].output=="2-Methylpropane"
+    assert store.get(chemhelper.batch.getCacheKey("CC(C)C","smiles","iupac"))=="2-Methylpropane"
+    assert len(store)==6
+
+def _readStore(path,queue):
+    store = chemhelper.store.ConversionStore(path)
+    queue.put(store.get(IUPACNotation("Butane").getCacheKey()))
+
+def test_store_processes(store):
+    store.put(IUPACNotation("Butane").getCacheKey(),"CCCC")
+    
+    queue = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_readStore,args=(store.path,queue)) for i in range(3)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    assert [queue.get() for proc in procs]==["CCCC"]*3
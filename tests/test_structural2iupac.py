@@ -200,3 +200,39 @@ def test_autocorrect(orig,exp,sum_formula):
     
     exp_sum = exp_s.getSumFormula(ELEMENT_STR)
     assert exp_sum == sum_formula
+
+@pytest.mark.parametrize(("smiles","name","formula"),[
+    ["CC(O)C(C)CC","3-Methylpentan-2-ol","C[6]H[14]O"],
+    ["CCCC(CC)CCC","4-Ethylheptane","C[9]H[20]"],
+    ["C(F)C(Cl)C","2-Chloro-1-fluoropropane","C[3]H[6]ClF"],
+    ["C(NO)CCC(NO)","1,4-Dihydroxyaminobutane","C[4]H[12]N[2]O[2]"],
+    ])
+def test_convert(smiles,name,formula,monkeypatch):
+    struct = chemhelper.notations.structural.StructuralNotation.loadsFromSMILES(smiles,cache=False)
+    
+    # The backbone is only searched once for all outputs
+    calls = []
+    getCarbonBackbone = struct.getCarbonBackbone
+    monkeypatch.setattr(struct,"getCarbonBackbone",lambda *args:calls.append(args) or getCarbonBackbone(*args))
+    
+    out = struct.convert(("iupac","smiles","formula"))
+    assert len(calls)==1
+    assert out["iupac"]==name
+    assert out["smiles"]==smiles
+    assert out["formula"]==struct.getSumFormula()
+    assert struct.getSumFormula(ELEMENT_STR)==formula
+    
+    with pytest.raises(ValueError):
+        struct.convert(("inchi",))
+
+@pytest.mark.parametrize(("smiles","name"),[
+    # Equal locant sums, the hydroxyl group gets the lowest locant
+    ["C(Br)CCCCCC(O)","7-Bromoheptanol"],
+    ["C(Cl)C(C(N)C(O))C","2-Amino-4-chloro-3-methylbutanol"],
+    ])
+def test_s2i_locant_tie(smiles,name):
+    struct = chemhelper.notations.structural.StructuralNotation.loadsFromSMILES(smiles,cache=False)
+    
+    iupacname = struct.asIUPACName()
+    assert iupacname.name==name
+    assert iupacname.asStructuralFormula().canonicalKey()==struct.canonicalKey()
@@ -143,6 +143,84 @@ def test_branched_alkane_2():
     assert backbone == [c7,c6,c5,c4,c3,c8,c9,c10] or \
            backbone == [c10,c9,c8,c3,c4,c5,c6,c7]
 
+@pytest.mark.parametrize(("n", "expected"), test_cases_simple_alkane+test_cases_long_alkane)
+def test_legacy_alkane_chainlen(n,expected):
+    struct = basic_alkane(n)
+    
+    assert expected==len(struct.getCarbonBackbone(legacy=True))
+    assert struct.getCarbonBackbone(legacy=True)==struct.getCarbonBackbone() or \
+           struct.getCarbonBackbone(legacy=True)==list(reversed(struct.getCarbonBackbone()))
+
+@pytest.mark.parametrize("name", [
+    "4-Ethylheptane",
+    "3,4-Dimethyloctane",
+    "4,5-Diethyl-3,4-dimethyloctane",
+    "12,13,14-Trisdecyltriacontane",
+    "3-Ethyl-2-methylhexane",
+    "3-Ethyl-2-methylpentane",
+    "3-Ethyl-2,4-dimethylhexane",
+    ])
+def test_legacy_backbone_compare(name):
+    struct = chemhelper.notations.iupac.IUPACNotation(name).asStructuralFormula()
+    
+    # Both algorithms find chains of the same length
+    # The legacy algorithm only follows one path per endpoint, so it may pick another one of several equal chains
+    backbone = struct.getCarbonBackbone()
+    backbone_legacy = struct.getCarbonBackbone(legacy=True)
+    
+    assert len(backbone) == len(backbone_legacy)
+
+@pytest.mark.parametrize(("name", "expected", "expected_smiles"), [
+    # Several longest chains, only the ones with the most substituents can be named
+    ("3-Ethyl-2-methylhexane",6,"CC(C)C(CC)CCC"),
+    ("3-Ethyl-2-methylpentane",5,"CC(C)C(CC)CC"),
+    ("3-Ethyl-2,4-dimethylhexane",6,"CC(C)C(CC)C(C)CC"),
+    ])
+@pytest.mark.parametrize("legacy", [False,True])
+def test_backbone_tie(name,expected,expected_smiles,legacy):
+    struct = chemhelper.notations.iupac.IUPACNotation(name).asStructuralFormula()
+    struct.legacy_backbone = legacy
+    
+    assert len(struct.getCarbonBackbone())==expected
+    if not legacy:
+        assert [c.id for c in struct.asCompact().getCarbonBackbone()]==[c.id for c in struct.getCarbonBackbone()]
+    assert struct.dumpAsSMILES()==expected_smiles
+    
+    # The chosen chain leaves no branched substituents
+    out = struct.asIUPACName().asStructuralFormula()
+    assert out.canonicalKey()==struct.canonicalKey()
+
+def test_cyclic_backbone():
+    # C-C-C
+    # |   |
+    # C---C
+    # with an extra carbon to create two dead ends
+    #
+    # Numbering:
+    # 1-2-3
+    # |   |
+    # 5---4-6
+    # 7 is bound to 1
+    
+    struct = chemhelper.notations.structural.StructuralNotation()
+    
+    carbons = []
+    for i in range(1,8):
+        carbons.append(struct.addCarbon(name="C%s"%i))
+    
+    c1,c2,c3,c4,c5,c6,c7 = carbons
+    
+    c1.bindToAtom(c2)
+    c2.bindToAtom(c3)
+    c3.bindToAtom(c4)
+    c4.bindToAtom(c5)
+    c5.bindToAtom(c1)
+    c4.bindToAtom(c6)
+    c1.bindToAtom(c7)
+    
+    with pytest.raises(chemhelper.errors.CyclicMoleculeError):
+        struct.getCarbonBackbone()
+
 def main(args):
     struct = chemhelper.notations.structural.StructuralNotation()
     
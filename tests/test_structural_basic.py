@@ -22,6 +22,10 @@
 #  
 #  
 
+import gc
+import copy
+import pickle
+
 import pytest
 
 import chemhelper
@@ -57,6 +61,181 @@ def test_empty_count():
     
     assert struct.countAtoms()=={}
 
+@pytest.mark.parametrize(("n", "expected_h"), [
+    (   1,   4),
+    (   2,   6),
+    (  10,  22),
+    (1000,2002),
+])
+def test_implicit_count(n,expected_h):
+    struct = chemhelper.notations.structural.StructuralNotation(implicit_hydrogen=True)
+    
+    carbons = []
+    for i in range(n):
+        carbons.append(struct.addCarbon())
+    for prev,c in zip(carbons,carbons[1:]):
+        c.bindToAtom(prev)
+    
+    assert len(struct.checkValid())==n
+    
+    struct.fillWithHydrogen()
+    
+    assert struct.checkValid()==[]
+    assert struct.countAtoms()=={"C":n,"H":expected_h}
+    assert len(struct.atoms)==n # No Hydrogen objects have been created
+    
+    struct.makeHydrogenExplicit()
+    
+    assert struct.checkValid()==[]
+    assert struct.countAtoms()=={"C":n,"H":expected_h}
+    assert len(struct.atoms)==n+expected_h
+
+def test_implicit_binding():
+    struct = chemhelper.notations.structural.StructuralNotation(implicit_hydrogen=True)
+    
+    c1 = struct.addCarbon()
+    c2 = struct.addCarbon()
+    c1.fillWithHydrogen()
+    
+    # Implicit hydrogen also uses up bindings
+    with pytest.raises(chemhelper.errors.NotEnoughBindingsError):
+        c1.bindToAtom(c2)
+
+def test_incremental_counters():
+    struct = chemhelper.notations.structural.StructuralNotation()
+    
+    c1 = struct.addCarbon()
+    c2 = struct.addCarbon()
+    o = struct.addOxygen()
+    c1.bindToAtom(c2)
+    c2.bindToAtom(o)
+    assert struct.countAtoms()=={"C":2,"O":1}
+    assert sorted(r for a,r in struct.checkValid())==["<","<","<"]
+    
+    struct.fillWithHydrogen()
+    assert struct.checkValid()==[]
+    assert struct.countAtoms()=={"C":2,"H":6,"O":1}
+    assert struct.getSumFormula("{element}{count}")=="C2H6O"
+    
+    # Erasing also removes the hydrogen and leaves c2 with an open binding
+    o.erase()
+    assert struct.countAtoms()=={"C":2,"H":5}
+    assert struct.checkValid()==[(c2,"<")]
+    
+    c1.unbindFromAtom(c2)
+    assert len(struct.checkValid())==2
+    
+    # Adding an atom twice does not count it twice
+    struct.addAtom(c1)
+    assert struct.countAtoms()=={"C":2,"H":5}
+
+def test_atom_slots():
+    struct = basic_alkane(3)
+    for atom in struct.atoms:
+        assert not hasattr(atom,"__dict__")
+        with pytest.raises(AttributeError):
+            atom.foo = 1
+    
+    # Class constants can still be read from instances
+    c = struct.addCarbon(name="C4")
+    assert (c.symbol,c.max_bindings,c.erase_hydrogen)==("C",4,True)
+    
+    # Slotted structures can still be copied and pickled
+    copied = pickle.loads(pickle.dumps(struct))
+    assert copied.countAtoms()==struct.countAtoms()
+    assert copy.deepcopy(basic_alkane(3)).asIUPACName().name=="Propane"
+
+def test_release():
+    struct = basic_alkane(3)
+    atoms = list(struct.atoms)
+    struct.release()
+    assert len(struct.atoms)==0
+    assert struct.countAtoms()=={}
+    for atom in atoms:
+        assert atom.structure is None
+        assert atom.bindings=={}
+        assert atom.num_bindings==0
+    with pytest.raises(chemhelper.errors.DetachedAtomError):
+        atoms[0].erase()
+    with pytest.raises(chemhelper.errors.DetachedAtomError):
+        atoms[0].fillWithHydrogen()
+
+def test_release_explicit():
+    # Dropping a structure does not change the atoms that are still referenced
+    backbone = chemhelper.notations.iupac.IUPACNotation("2-Methylbutane").asStructuralFormula(cache=False).getCarbonBackbone()
+    gc.collect()
+    assert backbone[0].structure is not None
+    assert backbone[0].num_bindings==4
+    backbone[0].erase()
+    assert backbone[0] not in backbone[1].bindings
+    
+    atom = pickle.loads(pickle.dumps(basic_alkane(2).getCarbonBackbone()[0]))
+    gc.collect()
+    assert atom.structure.countAtoms()=={"C":2,"H":6}
+
+def test_release_refcount():
+    # Released molecules are freed without the cyclic garbage collector
+    gc.collect()
+    gc.disable()
+    try:
+        for i in range(10):
+            struct = chemhelper.notations.iupac.IUPACNotation("2-Methylbutan-2-ol").asStructuralFormula(cache=False)
+            struct.asIUPACName()
+            struct.release()
+        del struct
+        assert gc.collect()==0
+    finally:
+        gc.enable()
+
+@pytest.mark.parametrize("convert",[
+    lambda:chemhelper.notations.iupac.IUPACNotation.loadsFromSMILES("CC(C)(O)CC"),
+    lambda:chemhelper.notations.iupac.IUPACNotation("2-Methylbutan-2-ol").dumpAsSMILES(),
+    lambda:chemhelper.notations.iupac.IUPACNotation("2-Methylbutan-2-ol")==chemhelper.notations.iupac.IUPACNotation("2-Methylbutanol"),
+    lambda:chemhelper.notations.condensed.CondensedMolecularNotation("CH3(CH2)3CH3").asIUPACName(),
+    lambda:chemhelper.notations.condensed.CondensedMolecularNotation("CH3(CH2)3CH3").dumpAsSMILES(),
+    ])
+@pytest.mark.parametrize("cache",[False,True])
+def test_release_temporary(convert,cache):
+    # Conversions between other notations release the structures they create on the way
+    if cache:
+        chemhelper.cache.enable()
+    gc.collect()
+    gc.disable()
+    try:
+        for i in range(3):
+            convert()
+        assert gc.collect()==0
+    finally:
+        gc.enable()
+        chemhelper.cache.disable()
+        chemhelper.cache.clear()
+
+def test_atom_ids():
+    # Atoms get dense ids and are stored in the order they were added
+    struct = basic_alkane(4)
+    atoms = list(struct.atoms)
+    assert [atom.id for atom in atoms]==list(range(len(atoms)))
+    assert sorted(reversed(atoms))==atoms
+    assert [atom.symbol for atom in atoms[:4]]==["C"]*4
+    
+    struct.removeAtom(atoms[0])
+    assert list(struct.atoms)==atoms[1:]
+    struct.release()
+    assert struct.addCarbon().id==0
+
+@pytest.mark.parametrize("legacy", [False,True])
+def test_atom_ids_deterministic(legacy,monkeypatch):
+    # Without names, ties are broken by the atom ids, independent of the memory layout
+    monkeypatch.setattr(chemhelper.notations.structural.StructuralNotation,"bond_metadata","off")
+    def backbone():
+        struct = chemhelper.notations.structural.StructuralNotation.loadsFromSMILES("CC(C)(C)CC(C)C",cache=False)
+        struct.legacy_backbone = legacy
+        assert struct.checkConnected()
+        return [atom.id for atom in struct.getCarbonBackbone()]
+    expected = backbone()
+    for i in range(5):
+        assert backbone()==expected
+
 # Interactive mode
 
 def main(args):
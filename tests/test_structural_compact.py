@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  test_structural_compact.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+
+import pytest
+
+import chemhelper
+
+from conftest import basic_alkane
+
+test_cases_compact = [
+    # name, SMILES
+    ["Ethane","CC"],
+    ["4-Ethylheptane","CCCC(CC)CCC"],
+    ["3-Ethyl-3-methylhexane","CCC(C)(CC)CCC"],
+    ["Propan-2-ol","CC(O)C"],
+    ["2-Chloro-1-fluoropropane","C(F)C(Cl)C"],
+    ["1,4-Dihydroxyaminobutane","C(NO)CCC(NO)"],
+    ["Hexan-1,2-diol","C(O)C(O)CCCC"],
+    ]
+
+@pytest.mark.parametrize(("name","smiles"),test_cases_compact)
+def test_compact_conversion(name,smiles):
+    struct = chemhelper.notations.iupac.IUPACNotation(name).asStructuralFormula()
+    comp = struct.asCompact()
+    
+    assert comp.countAtoms()==struct.countAtoms()
+    assert comp.checkValid()==[]
+    assert comp.checkConnected()
+    assert len(comp.atoms)==len(struct.atoms)
+    
+    assert comp.asIUPACName().name==name
+    assert comp.dumpAsSMILES()==smiles
+    assert comp.getSumFormula()==struct.getSumFormula()
+
+@pytest.mark.parametrize("n",[1,2,3,10,100])
+def test_compact_alkane_backbone(n):
+    comp = basic_alkane(n).asCompact()
+    
+    backbone = comp.getCarbonBackbone()
+    assert len(backbone)==n
+    assert [c.name for c in backbone]==[c.name for c in comp.getCarbonBackbone(legacy=True)] or \
+           [c.name for c in backbone]==list(reversed([c.name for c in comp.getCarbonBackbone(legacy=True)]))
+
+def test_compact_views():
+    comp = chemhelper.notations.structural.StructuralNotation.loadsFromSMILES("CC(O)C").asCompact()
+    
+    oxygen = [a for a in comp.atoms if a.symbol=="O"][0]
+    assert oxygen.max_bindings==2
+    assert oxygen.num_bindings==2
+    assert sorted(a.symbol for a in oxygen.bindings)==["C","H"]
+    
+    carbon = [a for a in oxygen.bindings if a.symbol=="C"][0]
+    assert oxygen in carbon.bindings
+    assert carbon.bindings[oxygen]==1
+    assert oxygen==comp.atom(oxygen.index)
+
+def test_compact_disconnected():
+    struct = chemhelper.notations.structural.StructuralNotation()
+    
+    c1 = struct.addCarbon()
+    c2 = struct.addCarbon()
+    c3 = struct.addCarbon()
+    c4 = struct.addCarbon()
+    
+    c1.bindToAtom(c2)
+    c2.bindToAtom(c3)
+    
+    comp = struct.asCompact()
+    assert not comp.checkConnected()
+    with pytest.raises(chemhelper.errors.MultipleMoleculesError):
+        comp.checkConnected(True)
+    assert len(comp.checkValid())==4
+
+def test_compact_immutable():
+    comp = basic_alkane(3).asCompact()
+    
+    with pytest.raises(chemhelper.errors.ImmutableStructureError):
+        comp.addCarbon()
+    with pytest.raises(chemhelper.errors.ImmutableStructureError):
+        comp.removeAtom(comp.atom(0))
+    with pytest.raises(chemhelper.errors.ImmutableStructureError):
+        comp.addHydrogenTo(comp.atom(0))
+    
+    # Like fillWithHydrogen(), only fails if something would change
+    comp.makeHydrogenExplicit()
+    implicit = chemhelper.notations.structural.StructuralNotation.loadsFromSMILES("CCC",True,cache=False).asCompact()
+    with pytest.raises(chemhelper.errors.ImmutableStructureError):
+        implicit.makeHydrogenExplicit()
+    assert implicit.countAtoms()=={"C":3,"H":8}
+
+def test_compact_thaw():
+    struct = chemhelper.notations.iupac.IUPACNotation("4-Ethylheptane").asStructuralFormula()
+    thawed = struct.asCompact().thaw()
+    
+    assert isinstance(thawed,chemhelper.notations.structural.StructuralNotation)
+    assert thawed.countAtoms()==struct.countAtoms()
+    assert thawed.checkValid()==[]
+    assert thawed.asIUPACName().name=="4-Ethylheptane"
+    
+    # Thawed structures can be modified again
+    thawed.addCarbon()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  test_structural_frozen.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+import pickle
+import threading
+
+import pytest
+
+import chemhelper
+
+from conftest import basic_alkane
+
+test_cases_frozen = [
+    # name, SMILES
+    ["Ethane","CC"],
+    ["4-Ethylheptane","CCCC(CC)CCC"],
+    ["Propan-2-ol","CC(O)C"],
+    ["2-Chloro-1-fluoropropane","C(F)C(Cl)C"],
+    ["1,4-Dihydroxyaminobutane","C(NO)CCC(NO)"],
+    ]
+
+@pytest.mark.parametrize(("name","smiles"),test_cases_frozen)
+def test_frozen_conversion(name,smiles):
+    struct = chemhelper.notations.iupac.IUPACNotation(name).asStructuralFormula()
+    frozen = struct.freeze()
+    
+    # Repeated calls return the cached results
+    for i in range(2):
+        assert frozen.asIUPACName().name==name
+        assert frozen.dumpAsSMILES()==smiles
+        assert frozen.getSumFormula()==struct.getSumFormula()
+        assert frozen.countAtoms()==struct.countAtoms()
+        assert frozen.checkValid()==[]
+        assert frozen.checkConnected()
+    
+    assert frozen.asCompact().freeze() is frozen
+
+def test_frozen_groups():
+    frozen = chemhelper.notations.structural.StructuralNotation.loadsFromSMILES("CC(O)C(C)CC").freeze()
+    assert len(frozen.getCarbonBackbone())==5
+    # Positions follow the backbone, which may be numbered from either end
+    assert sorted(frozen.getFunctionalGroups()) in [[(2,"hydroxyl"),(3,"alkyl")],[(3,"alkyl"),(4,"hydroxyl")]]
+    
+    # Returned lists may be modified without affecting the cache
+    frozen.getFunctionalGroups().clear()
+    frozen.countAtoms().clear()
+    assert len(frozen.getFunctionalGroups())==2
+    assert frozen.countAtoms()=={"C":6,"H":14,"O":1}
+
+def test_frozen_immutable():
+    frozen = basic_alkane(3).freeze()
+    
+    with pytest.raises(chemhelper.errors.ImmutableStructureError):
+        frozen.addCarbon()
+    with pytest.raises(chemhelper.errors.ImmutableStructureError):
+        frozen.names = None
+    with pytest.raises(TypeError):
+        frozen.element_codes[0] = 0
+
+def test_frozen_hashable():
+    struct = basic_alkane(4)
+    frozen = struct.freeze()
+    
+    copy = pickle.loads(pickle.dumps(frozen))
+    assert copy==frozen
+    assert {frozen:"Butane"}[copy]=="Butane"
+    assert copy.asIUPACName().name=="Butane"
+    
+    assert frozen!=basic_alkane(5).freeze()
+
+def test_frozen_threads():
+    frozen = chemhelper.notations.iupac.IUPACNotation("3-Ethyl-3-methylhexane").asStructuralFormula().freeze()
+    
+    results = []
+    def f():
+        results.append((frozen.asIUPACName().name,frozen.dumpAsSMILES()))
+    threads = [threading.Thread(target=f) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    assert results==[("3-Ethyl-3-methylhexane","CCC(C)(CC)CCC")]*8
+
+def test_frozen_convert(monkeypatch):
+    FrozenStructuralNotation = chemhelper.notations.frozen.FrozenStructuralNotation
+    frozen = chemhelper.notations.structural.StructuralNotation.loadsFromSMILES("CC(O)C(C)CC").freeze()
+    
+    out = frozen.convert(("iupac","smiles"))
+    assert out=={"iupac":"3-Methylpentan-2-ol","smiles":"CC(O)C(C)CC"}
+    
+    # Cached outputs do not need a new analysis
+    def analyze(self):
+        raise AssertionError("analyze() should not be called")
+    monkeypatch.setattr(FrozenStructuralNotation,"analyze",analyze)
+    assert frozen.convert(("smiles","iupac"))==out
+    assert frozen.convert(("formula",))=={"formula":frozen.getSumFormula()}
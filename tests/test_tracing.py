@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  test_tracing.py
+#  
+#  Copyright 2017 notna <notna@apparat.org>
+#  
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#  
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#  
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#  
+#  
+import logging
+
+import pytest
+
+import chemhelper
+
+tracing = chemhelper.tracing
+
+def test_tracing_disabled():
+    # No trace ids are created while debug logging is off
+    assert not logging.getLogger("chemhelper").isEnabledFor(logging.DEBUG)
+    assert isinstance(tracing.conversion(tracing.getLogger("iupac"),"iupac2structural","Butane"),tracing._NullConversion)
+    chemhelper.notations.iupac.IUPACNotation("Butane").asStructuralFormula()
+    assert tracing.getTraceId() is None
+
+def test_tracing_capture():
+    with tracing.capture() as records:
+        chemhelper.notations.condensed.CondensedMolecularNotation("CH3(CH2)3CH3").asIUPACName()
+        chemhelper.notations.iupac.IUPACNotation("Butane").asStructuralFormula()
+    assert not logging.getLogger("chemhelper").isEnabledFor(logging.DEBUG)
+    assert tracing.getTraceId() is None
+    
+    messages = [record.getMessage() for record in records]
+    assert messages[0]=="Converting condensed2iupac 'CH3(CH2)3CH3'"
+    assert "Converting condensed2structural 'CH3(CH2)3CH3'" in messages
+    assert "Simple formula 'CH3(CH2)3CH3', chain length '3'" in messages
+    assert messages[-1]=="Conversion iupac2structural 'Butane' finished"
+    
+    # Nested conversions share the trace id of the outer conversion
+    ids = [record.trace_id for record in records]
+    assert None not in ids
+    assert len(set(ids))==2
+    assert ids[0]==ids[messages.index("Conversion condensed2iupac 'CH3(CH2)3CH3' finished")]
+
+def test_tracing_failure():
+    with tracing.capture() as records:
+        results = chemhelper.batch.convertMany(["Butane","2-Fooylbutane"],"iupac","smiles",workers=0)
+    assert results[1].error is not None
+    
+    failed = [record for record in records if record.trace_id==records[-1].trace_id]
+    assert failed[0].getMessage()=="Converting iupac2smiles '2-Fooylbutane'"
+    assert failed[-1].getMessage().startswith("Conversion iupac2smiles '2-Fooylbutane' failed with InvalidPrefixError")
+    assert failed[-1].name=="chemhelper.batch"